@@ -8,10 +8,14 @@ Torrent Maker v1.6.0 核心功能测试
 
 import os
 import sys
+import json
 import tempfile
+import time
 import shutil
+import threading
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -50,6 +54,16 @@ class TestConfigManager(unittest.TestCase):
         self.assertIn('file_search_tolerance', settings)
         self.assertEqual(settings['file_search_tolerance'], 60)
 
+    def test_default_ignore_rules_not_shared(self):
+        """修改配置里的排除规则不会改动内置默认值"""
+        settings = self.config._load_settings()
+        settings['scan_ignore_patterns'].append('*.part')
+        settings['scan_ignore_regexes'].clear()
+        self.assertNotIn('*.part', ConfigManager.DEFAULT_SETTINGS['scan_ignore_patterns'])
+        self.assertNotIn('*.part', torrent_maker.ScanIgnoreRules.DEFAULT_PATTERNS)
+        self.assertTrue(ConfigManager.DEFAULT_SETTINGS['scan_ignore_regexes'])
+        self.assertTrue(torrent_maker.ScanIgnoreRules.DEFAULT_REGEXES)
+
     def test_save_and_load_settings(self):
         """测试设置保存和加载"""
         # 修改设置
@@ -126,6 +140,378 @@ class TestFileMatcher(unittest.TestCase):
         results = self.matcher.fuzzy_search("Breaking")
         self.assertTrue(len(results) > 0)
 
+    def test_partial_word_search(self):
+        """不完整的词通过三元组索引命中"""
+        results = self.matcher.fuzzy_search("Thron")
+        self.assertTrue(results)
+        self.assertIn("Game of Thrones S01", results[0][0])
+
+        # 中文子串
+        results = self.matcher.fuzzy_search("仇者联")
+        self.assertTrue(any("复仇者联盟" in path for path, _ in results))
+
+    def test_typo_search(self):
+        """拼写错误的搜索词被纠正到词表中最近的词"""
+        results = self.matcher.fuzzy_search("Brekaing Bad")
+        self.assertTrue(results)
+        self.assertIn("Breaking Bad", results[0][0])
+
+        stats = self.matcher.get_performance_stats()['typo_correction']
+        self.assertGreaterEqual(stats['corrections'], 1)
+
+    def test_symspell_incremental(self):
+        """纠错词表增量同步"""
+        corrector = torrent_maker.SymSpellCorrector()
+        corrector.add_words(["breaking", "westworld"])
+        self.assertEqual(corrector.lookup("westwrold"), ["westworld"])
+
+        self.assertEqual(corrector.sync(["breaking", "sopranos"]), (1, 1))
+        self.assertEqual(corrector.lookup("westwrold"), [])
+        self.assertEqual(corrector.lookup("sopranso"), ["sopranos"])
+
+    def test_cjk_bigram_search(self):
+        """中文标题按二元组分词，倒排表可以预筛候选"""
+        tokenizer = torrent_maker.CJKTokenizer(pinyin=False)
+        self.assertEqual(tokenizer.tokenize("权力的游戏 s08"), ["权力", "力的", "的游", "游戏", "s08"])
+        self.assertEqual(tokenizer.tokenize("abc复"), ["abc", "复"])
+        self.assertEqual(self.matcher._normalize_string("权力的游戏S08【中字】"), "权力的游戏 s08 中字")
+
+        results = self.matcher.fuzzy_search("权力的游戏第一季")
+        self.assertIn("权力的游戏 第一季", results[0][0])
+        candidates = self.matcher.smart_index.get_candidate_folders({"复仇者"})
+        self.assertEqual(len(candidates), 1)
+
+    @unittest.skipIf(torrent_maker.lazy_pinyin is None, "需要 pypinyin")
+    def test_pinyin_search(self):
+        """安装 pypinyin 时可以用拼音搜索中文标题"""
+        results = self.matcher.fuzzy_search("fuchouzhelianmeng")
+        self.assertTrue(results)
+        self.assertIn("复仇者联盟", results[0][0])
+
+    def test_prefix_search(self):
+        """输入即搜索：逐字输入时复用上一次的候选集"""
+        self.assertIn("Game of Thrones S01", self.matcher.prefix_search("game thr")[0])
+        self.assertIn("权力的游戏 第一季", self.matcher.prefix_search("权")[0])
+        self.assertEqual(self.matcher.prefix_search("xyz"), [])
+
+        index = self.matcher.smart_index.get_prefix_index()
+        session = torrent_maker.PrefixSearchSession()
+        for query in ["b", "br", "bre", "breaking b"]:
+            folder_ids, more = index.search(query.split(), 10, session)
+            self.assertEqual(len(folder_ids), 1)
+            self.assertFalse(more)
+        self.assertEqual(session.reused, 3)
+
+        # 查询变宽时不能复用更窄的候选集
+        folder_ids, _ = index.search(["the"], 10, session)
+        self.assertEqual(len(folder_ids), 1)
+        self.assertEqual(session.reused, 3)
+
+    def test_stateless_prefix_search_is_isolated(self):
+        """不传会话的调用各用新会话，并发请求不会串用候选集"""
+        from concurrent.futures import ThreadPoolExecutor
+        queries = ["game thr", "权", "breaking b", "the", "xyz"] * 20
+        expected = {query: self.matcher.prefix_search(query) for query in set(queries)}
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(self.matcher.prefix_search, queries))
+        self.assertEqual(results, [expected[query] for query in queries])
+
+        prefix_index = torrent_maker.PrefixSearchIndex
+        with patch.object(prefix_index, 'search', autospec=True,
+                          side_effect=prefix_index.search) as search:
+            self.matcher.prefix_search("b")
+            self.matcher.prefix_search("br")
+        sessions = [call.args[3] for call in search.call_args_list]
+        self.assertIsNot(sessions[0], sessions[1])
+
+    @unittest.skipIf(torrent_maker.np is None, "需要 NumPy")
+    def test_prefix_index_vectorized_build(self):
+        """NumPy 与纯 Python 构建的前缀索引一致"""
+        self.matcher.prefix_search("game")
+        index = self.matcher.smart_index
+        vectorized = index.get_prefix_index()
+        with patch.object(torrent_maker, 'np', None):
+            plain = torrent_maker.PrefixSearchIndex(index._word_index, index.ranker)
+        for name in ['order', 'term_offsets', 'postings', 'folder_offsets', 'folder_terms']:
+            self.assertEqual(getattr(vectorized, name), getattr(plain, name))
+
+    def test_release_name_parser(self):
+        """发布名解析：季范围、分辨率、编码、来源、发布组、中文季集"""
+        parser = torrent_maker.ReleaseNameParser()
+        info = parser.parse("Breaking.Bad.S01-S05.1080p.BluRay.x265-GROUP")
+        self.assertEqual(info.title, "Breaking Bad")
+        self.assertEqual((info.season_start, info.season_end), (1, 5))
+        self.assertEqual((info.resolution, info.source, info.codec, info.group),
+                         ("1080p", "bluray", "x265", "GROUP"))
+        self.assertEqual(parser.parse("Show.2019.WEB-DL.HEVC").facets(),
+                         {'year': 2019, 'source': 'web', 'codec': 'x265'})
+        info = parser.parse("进击的巨人 第三季第12集")
+        self.assertEqual((info.season_start, info.episode), (3, 12))
+        self.assertEqual(self.matcher.parse_episode_from_filename("show.1x03.mkv")['episode'], 3)
+        self.assertIsNone(self.matcher.parse_episode_from_filename("movie.1080p.mkv"))
+
+    def test_facet_search(self):
+        """查询中的季、分辨率等作为分面筛选；纯分面查询直接查倒排表"""
+        (Path(self.temp_dir) / "Breaking Bad S06 720p").mkdir()
+        (Path(self.temp_dir) / "Other Show S02 1080p x265").mkdir()
+
+        names = [os.path.basename(path) for path, _ in self.matcher.fuzzy_search("Breaking Bad S02")]
+        self.assertEqual(names[0], "Breaking Bad S01-S05")
+        self.assertNotIn("Breaking Bad S06 720p", names)
+
+        names = [os.path.basename(path) for path, _ in self.matcher.fuzzy_search("S02 1080p x265")]
+        self.assertEqual(names, ["Other Show S02 1080p x265"])
+
+    def test_season_summary_from_folder_info(self):
+        """统计文件夹时解析的剧集直接用于季摘要，不再遍历目录"""
+        folder = Path(self.temp_dir) / "Game of Thrones S01"
+        for episode in (1, 2, 3):
+            (folder / f"Game.of.Thrones.S01E{episode:02d}.mkv").touch()
+
+        with patch.object(self.matcher, 'extract_episode_info_simple') as walk:
+            info = self.matcher._describe_folder(str(folder))
+        walk.assert_not_called()
+        self.assertEqual(info['episodes'], "S01E01-E03")
+        self.assertEqual(info['video_count'], 3)
+
+    def test_batch_search(self):
+        """批量搜索与逐个搜索结果一致，同一文件夹只统计一次信息"""
+        queries = ["Game of Thrones", "Brekaing Bad", "复仇者", "Game of Thrones", "", "zzzz"]
+        batch = self.matcher.batch_search(queries)
+        for query, results in zip(queries, batch):
+            expected = self.matcher.fuzzy_search(query, 5) if query else []
+            self.assertEqual([path for path, _ in results], [path for path, _ in expected])
+
+        with patch.object(self.matcher, 'get_folder_info', wraps=self.matcher.get_folder_info) as info:
+            matched = self.matcher.batch_match(queries)
+        self.assertEqual(len(matched), len(queries))
+        self.assertEqual(matched[0]['matches'], matched[3]['matches'])
+        paths = {entry['path'] for item in matched for entry in item['matches']}
+        self.assertEqual(info.call_count, len(paths))
+
+    def test_batch_search_cli_jsonl(self):
+        """批量搜索文件输出 JSON Lines"""
+        import json
+        from types import SimpleNamespace
+
+        input_path = os.path.join(self.temp_dir, "titles.txt")
+        output_path = os.path.join(self.temp_dir, "results.jsonl")
+        with open(input_path, 'w', encoding='utf-8') as f:
+            f.write("# 待查找\nBreaking Bad\n\n复仇者联盟\n")
+
+        app = SimpleNamespace(matcher=self.matcher, queue_manager=None)
+        self.assertEqual(torrent_maker.run_batch_search(app, input_path, output_path), 0)
+        with open(output_path, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line['query'] for line in lines], ["Breaking Bad", "复仇者联盟"])
+        self.assertIn("Breaking Bad S01-S05", lines[0]['matches'][0]['path'])
+
+        # 没有队列时不能加入队列
+        self.assertEqual(torrent_maker.run_batch_search(app, input_path, output_path, enqueue=True), 1)
+
+    def test_bm25_exact_match_and_top_k(self):
+        """完全匹配直接得 1.0；前 k 结果按得分、再按路径长度排序"""
+        results = self.matcher.fuzzy_search("breaking bad s01-s05")
+        self.assertEqual(results[0][1], 1.0)
+        self.assertIn("Breaking Bad S01-S05", results[0][0])
+
+    def test_year_only_title(self):
+        """片名本身是年份的文件夹（1917、2012）保留年份，可以搜到"""
+        for folder in ("1917", "2012.2009.1080p.BluRay"):
+            (Path(self.temp_dir) / folder).mkdir()
+        self.matcher = FileMatcher(self.temp_dir, enable_cache=False)
+        self.assertEqual(self.matcher._normalize_string("The Avengers (2012)"), "the avengers")
+        self.assertEqual(self.matcher._normalize_string("2012.2009.1080p.BluRay"), "2012 2009")
+
+        self.assertEqual(os.path.basename(self.matcher.fuzzy_search("1917")[0][0]), "1917")
+        self.assertEqual(os.path.basename(self.matcher.fuzzy_search("2012")[0][0]),
+                         "2012.2009.1080p.BluRay")
+
+        names = ["Breaking", "Breaking Bad", "Breaking Bad Extras", "Breaking Point", "Bad Boys"]
+        table = torrent_maker.FolderTable.from_paths([os.path.join(self.temp_dir, n) for n in names])
+        index = self.matcher.smart_index
+        index.build_index(table, self.matcher._normalize_string)
+
+        ids, scores = index.rank("breaking bad")
+        ranked = dict(zip(list(ids), list(scores)))
+        self.assertGreater(ranked[1], ranked[2])  # 短名称得分更高
+        self.assertGreater(ranked[1], ranked[3])  # 短语命中加分
+        self.assertLess(max(ranked.values()), 1.0)
+
+        exact_ids = index.ranker.exact_ids("breaking bad")
+        count, top = index.ranker.top_k([(ids, scores, 1.0)], exact_ids, 0.3, 2)
+        self.assertEqual([folder_id for folder_id, _ in top], [1, 2])
+        self.assertEqual(top[0][1], 1.0)
+        self.assertGreaterEqual(count, 3)
+
+    def test_bm25_short_name_not_rewarded(self):
+        """只命中部分查询词的短名称不因长度短而加分，达不到最低得分"""
+        names = ["Bad", "Breaking Bad S01 1080p WEB", "Game of Thrones S01 Complete Pack",
+                 "The Avengers Age of Ultron Extended"]
+        table = torrent_maker.FolderTable.from_paths([os.path.join(self.temp_dir, n) for n in names])
+        index = self.matcher.smart_index
+        index.build_index(table, self.matcher._normalize_string)
+
+        ranked = dict(zip(*(list(values) for values in index.rank("breaking bad"))))
+        self.assertLess(ranked[0], 0.5)
+        self.assertLess(ranked[0], self.matcher.min_score)
+        self.assertGreater(ranked[1], 0.9)
+
+    def test_search_index_persistence(self):
+        """索引保存后可在新实例中加载，元信息不符时拒绝加载"""
+        names = ["Game of Thrones S01", "Breaking Bad S01-S05"]
+        table = torrent_maker.FolderTable.from_paths([os.path.join(self.temp_dir, n) for n in names])
+        index = self.matcher.smart_index
+        index.build_index(table, self.matcher._normalize_string)
+        index_path = os.path.join(self.temp_dir, "index.pkl")
+        meta = {'base_directory': self.temp_dir, 'max_depth': 3}
+        self.assertTrue(index.save(index_path, meta))
+
+        loaded = torrent_maker.SmartIndexCache()
+        self.assertFalse(loaded.load(index_path, {'base_directory': "other", 'max_depth': 3}))
+        self.assertTrue(loaded.load(index_path, meta))
+        self.assertEqual(len(loaded.table), 2)
+        self.assertEqual(loaded.table.find(os.path.join(self.temp_dir, names[1])), 1)
+        normalized = self.matcher._normalize_string(names[1])
+        self.assertEqual(loaded.ranker.exact_ids(normalized), [1])
+        self.assertEqual(loaded.correct_words({"thrnoes"}), {"thrnoes": "thrones"})
+
+    def test_search_index_saved_in_background(self):
+        """完整扫描后的索引在后台线程写盘，搜索不等待写盘完成"""
+        index_dir = os.path.join(self.temp_dir, "index")
+        release = threading.Event()
+        write = torrent_maker.SmartIndexCache.write_snapshot
+
+        def slow_write(path, state):
+            release.wait(5)
+            return write(path, state)
+
+        with patch.object(FileMatcher, '_search_index_dir', return_value=index_dir), \
+                patch.object(torrent_maker.SmartIndexCache, 'write_snapshot', side_effect=slow_write):
+            matcher = FileMatcher(self.temp_dir)
+            try:
+                self.assertTrue(matcher.fuzzy_search("Game of Thrones", verbose=False))
+                self.assertFalse(matcher._index_save_future.done())
+                release.set()
+                self.assertTrue(matcher._index_save_future.result(timeout=5))
+                self.assertEqual(len(os.listdir(index_dir)), 1)
+                # 清空索引前先等写盘结束，不会留下刚写出的文件
+                self.assertEqual(matcher.clear_search_index(), 1)
+            finally:
+                matcher.shutdown()
+
+    def test_folder_table_survives_cache_eviction(self):
+        """文件夹表不随缓存淘汰：不会重新加载磁盘索引，索引代数不变"""
+        index_dir = os.path.join(self.temp_dir, "index")
+        with patch.object(FileMatcher, '_search_index_dir', return_value=index_dir):
+            matcher = FileMatcher(self.temp_dir)
+            try:
+                matcher.fuzzy_search("Game of Thrones", verbose=False)
+                matcher._wait_for_index_save()
+                table = matcher.get_folder_table()
+                generation = matcher.smart_index.generation
+
+                matcher.cache.shrink(0.0)
+                with patch.object(matcher, '_load_search_index') as load:
+                    self.assertIs(matcher.get_folder_table(), table)
+                    matcher.fuzzy_search("Breaking Bad", verbose=False)
+                load.assert_not_called()
+                self.assertEqual(matcher.smart_index.generation, generation)
+            finally:
+                matcher.shutdown()
+
+    def test_result_cache_generation_invalidation(self):
+        """索引换代后，只有结果中的文件夹消失或新增文件夹与查询相关时缓存才失效"""
+        paths = [os.path.join(self.temp_dir, n)
+                 for n in ["Game of Thrones S01", "Breaking Bad S01-S05", "The Avengers"]]
+        index = self.matcher.smart_index
+        index.build_index(torrent_maker.FolderTable.from_paths(paths), self.matcher._normalize_string)
+        generation = index.generation
+
+        new_path = os.path.join(self.temp_dir, "Game of Thrones S02")
+        table = torrent_maker.FolderTable.from_paths(paths[:2] + [new_path])
+        index.build_index(table, self.matcher._normalize_string)
+        added, removed = index.changes_since(generation)
+        self.assertEqual([table.path_str(i) for i in added], [new_path])
+        self.assertEqual(removed, {paths[2]})
+
+        def valid(query, path):
+            prepared = self.matcher._prepare_query(query)
+            return self.matcher._cached_results_valid((generation, 1, [(path, 1.0)]), prepared)
+
+        self.assertTrue(valid("Breaking Bad", paths[1]))
+        self.assertFalse(valid("Avengers", paths[2]))
+        self.assertFalse(valid("Game of Thrones", paths[0]))
+
+        index.clear()
+        self.assertIsNone(index.changes_since(generation))
+
+    def test_scoring_pool_matches_inline(self):
+        """分片进程并行打分与当前进程打分结果一致；续建追加的文件夹在当前进程补打分"""
+        names = [f"Breaking Bad S{i:02d}" for i in range(1, 8)] + ["Breaking Point", "Game of Thrones S01"]
+        table = torrent_maker.FolderTable.from_paths([os.path.join(self.temp_dir, n) for n in names])
+        index = self.matcher.smart_index
+        index.build_index(table, self.matcher._normalize_string)
+        jobs = [("breaking bad", None, [], {}), ("breakng", "breaking", [], {}),
+                ("game thrones", None, [], {'season': (1, 1)})]
+
+        pool = torrent_maker.ScoringPool(max_workers=3)
+        with patch.object(torrent_maker.ScoringPool, 'MIN_FOLDERS', 0), \
+                patch.object(torrent_maker.ScoringPool, 'MIN_POSTINGS', 0), \
+                patch.object(torrent_maker.ScoringPool, 'REBUILD_GROWTH', 1.0):
+            try:
+                self.assertTrue(pool.prepare(index, timeout=60))
+                self.assertEqual(pool.score(index, jobs, 0.3, 4, 0.85, 0.95),
+                                 index.score_jobs(jobs, 0.3, 4, 0.85, 0.95))
+
+                table.add(os.path.join(self.temp_dir, "Breaking Bad S08"))
+                index.build_index(table, self.matcher._normalize_string)
+                self.assertEqual(pool.score(index, jobs, 0.3, 4, 0.85, 0.95),
+                                 index.score_jobs(jobs, 0.3, 4, 0.85, 0.95))
+                stats = pool.get_stats()
+                self.assertEqual((stats['parallel_batches'], stats['starts']), (2, 1))
+            finally:
+                pool.shutdown()
+
+    @unittest.skipIf(torrent_maker.np is None, "需要 NumPy")
+    def test_bm25_numpy_matches_python(self):
+        """NumPy 与纯 Python 路径的 BM25 得分一致"""
+        names = ["Game of Thrones S01", "Breaking Bad S01-S05", "Breaking", "The Avengers", "复仇者联盟"]
+        table = torrent_maker.FolderTable.from_paths([os.path.join(self.temp_dir, n) for n in names])
+        index = self.matcher.smart_index
+        index.build_index(table, self.matcher._normalize_string)
+
+        for query in ["Breaking Bad", "Game of Thrones", "复仇者联盟", "avengers the"]:
+            normalized = self.matcher._normalize_string(query)
+            ids, scores = index.rank(normalized)
+            expected = dict(zip(ids.tolist(), scores.tolist()))
+            with patch.object(torrent_maker, 'np', None):
+                py_ids, py_scores = index.rank(normalized)
+            self.assertEqual(set(py_ids), set(expected))
+            for folder_id, score in zip(py_ids, py_scores):
+                self.assertAlmostEqual(score, expected[folder_id])
+
+    def test_index_time_normalization(self):
+        """建索引时一次性标准化，同名文件夹共享分析结果，查询缓存不受影响"""
+        self.assertEqual(self.matcher._normalize_string("Game.of.Thrones.2011.1080p.BluRay.x264"),
+                         "game of thrones")
+        self.assertEqual(self.matcher._normalize_string("The_Best-of (HDTV) AAC [Part] One"),
+                         "best part one")
+        self.assertEqual(self.matcher._normalize_string("权力的游戏s08 4K"), "权力的游戏 s08")
+
+        names = [f"Show {c}/Season 01" for c in "ABCDE"] + ["Show A"]
+        table = torrent_maker.FolderTable.from_paths([os.path.join(self.temp_dir, n) for n in names])
+        index = self.matcher.smart_index
+        memo_size = self.matcher._normalize_memo.cache_info().currsize
+        with patch.object(self.matcher, '_normalize_uncached',
+                          wraps=self.matcher._normalize_uncached) as normalize:
+            index.build_index(table, normalize)
+        # 名称第二次出现时才记下分析结果：五个 Season 01 只标准化两次
+        self.assertEqual(normalize.call_count, 3)
+        self.assertEqual(index.ranker.names[:5], ["season 01"] * 5)
+        self.assertIs(index.ranker.names[0], index.ranker.names[4])
+        self.assertEqual(self.matcher._normalize_memo.cache_info().currsize, memo_size)
+
     def test_similarity_calculation(self):
         """测试相似度计算"""
         similarity = self.matcher.similarity("Game of Thrones", "Game of Thrones S01")
@@ -136,6 +522,808 @@ class TestFileMatcher(unittest.TestCase):
         self.assertGreater(similarity, 0.05)  # 调整为更合理的期望值
 
 
+class TestMultiRootMatcher(unittest.TestCase):
+    """测试多资源根目录搜索"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.roots = []
+        for name, folders in [("array1", ["Breaking Bad S01", "Game of Thrones S01"]),
+                              ("array2", ["Breaking Bad S02", "The Avengers"])]:
+            root = os.path.join(self.temp_dir, name)
+            for folder in folders:
+                os.makedirs(os.path.join(root, folder))
+            self.roots.append({'name': name, 'path': root})
+        self.roots.append({'name': "offline", 'path': os.path.join(self.temp_dir, "missing")})
+        self.matcher = torrent_maker.MultiRootMatcher(self.roots, enable_cache=False, search_timeout=2)
+
+    def tearDown(self):
+        self.matcher.shutdown()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_fan_out_and_merge(self):
+        """结果来自所有可用根目录，未挂载的根目录标记为 unavailable"""
+        names = [os.path.basename(path) for path, _ in self.matcher.fuzzy_search("Breaking Bad")]
+        self.assertEqual(sorted(names[:2]), ["Breaking Bad S01", "Breaking Bad S02"])
+
+        matches = self.matcher.match_folders("Avengers")
+        self.assertEqual(matches[0]['root'], "array2")
+        status = {item['name']: item['status'] for item in self.matcher.get_root_status()}
+        self.assertEqual(status, {'array1': 'ok', 'array2': 'ok', 'offline': 'unavailable'})
+
+        batch = self.matcher.batch_search(["Game of Thrones", "Avengers"])
+        self.assertEqual([os.path.basename(results[0][0]) for results in batch],
+                         ["Game of Thrones S01", "The Avengers"])
+        self.assertTrue(self.matcher.prefix_search("brea"))
+
+    def test_slow_root_is_skipped(self):
+        """超时的根目录不阻塞其他根目录，搜索结束前不再派发，并报告被跳过"""
+        import threading
+        release = threading.Event()
+        slow = self.matcher.shards[1].matcher
+        original = slow.fuzzy_search
+
+        def blocked(*args, **kwargs):
+            release.wait(5)
+            return original(*args, **kwargs)
+
+        # 首次搜索建索引，不受超时限制
+        self.matcher.fuzzy_search("Avengers", verbose=False)
+        self.assertEqual(self.matcher.last_skipped_roots, ["offline"])
+        self.matcher.search_timeout = 0.2
+        with patch.object(slow, 'fuzzy_search', side_effect=blocked) as search:
+            names = [os.path.basename(path) for path, _ in self.matcher.fuzzy_search("Breaking Bad")]
+            self.assertEqual(names, ["Breaking Bad S01"])
+            self.assertEqual(self.matcher.shards[1].status, 'slow')
+            self.assertEqual(sorted(self.matcher.last_skipped_roots), ["array2", "offline"])
+            self.matcher.fuzzy_search("Breaking Bad")
+            self.assertEqual(search.call_count, 1)
+            release.set()
+
+    def test_batch_waits_for_slow_root(self):
+        """批量搜索不套用交互超时；仍有根目录缺席时逐行报告并以非零退出码结束"""
+        from types import SimpleNamespace
+
+        slow = self.matcher.shards[1].matcher
+        original = slow.batch_search
+
+        def delayed(*args, **kwargs):
+            time.sleep(0.5)
+            return original(*args, **kwargs)
+
+        self.matcher.fuzzy_search("Avengers", verbose=False)
+        self.matcher.search_timeout = 0.1
+        input_path = os.path.join(self.temp_dir, "titles.txt")
+        output_path = os.path.join(self.temp_dir, "results.jsonl")
+        with open(input_path, 'w', encoding='utf-8') as f:
+            f.write("Avengers\nGame of Thrones\n")
+
+        app = SimpleNamespace(matcher=self.matcher, queue_manager=None)
+        with patch.object(slow, 'batch_search', side_effect=delayed):
+            self.assertEqual(torrent_maker.run_batch_search(app, input_path, output_path), 2)
+        with open(output_path, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(lines[0]['matches'][0]['name'], "The Avengers")
+        self.assertEqual([line['skipped_roots'] for line in lines], [["offline"], ["offline"]])
+
+        # 全部根目录都有结果时退出码为 0
+        self.matcher.shards.pop().matcher.shutdown()
+        self.assertEqual(torrent_maker.run_batch_search(app, input_path, output_path), 0)
+        with open(output_path, encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)['skipped_roots'] for line in f], [[], []])
+
+    def test_config_roots(self):
+        """resource_folder 为第一个根目录，路径重复的配置合并"""
+        config = ConfigManager.__new__(ConfigManager)
+        config.settings = dict(ConfigManager.DEFAULT_SETTINGS, resource_folder=self.roots[0]['path'],
+                               resource_roots=[{'path': self.roots[0]['path'], 'name': "主阵列"},
+                                               {'path': self.roots[1]['path'], 'scan_interval': 7200},
+                                               {'name': "无效"}])
+        config._validate_config()
+        roots = config.get_resource_roots()
+        self.assertEqual([root['name'] for root in roots], ["主阵列", "array2"])
+        self.assertEqual(roots[1]['scan_interval'], 7200)
+
+    def test_caches_and_stats_cover_all_roots(self):
+        """缓存清理与统计逐个分片执行，而不只落在第一个根目录上"""
+        index_dir = os.path.join(self.temp_dir, "index")
+        with patch.object(torrent_maker.FileMatcher, '_search_index_dir', return_value=index_dir):
+            matcher = torrent_maker.MultiRootMatcher(self.roots[:2], search_timeout=2)
+            try:
+                matcher.fuzzy_search("Breaking Bad", verbose=False)
+                matcher.fuzzy_search("Avengers", verbose=False)
+                shard_items = [shard.matcher.get_cache_stats()['total_items'] for shard in matcher.shards]
+                self.assertTrue(all(shard_items))
+                self.assertEqual(matcher.get_cache_stats()['total_items'], sum(shard_items))
+                self.assertEqual(matcher.get_timing_stats()['fuzzy_search']['count'], 4)
+                self.assertEqual(matcher.get_performance_stats()['search_performance']['total_searches'], 4)
+                self.assertFalse(hasattr(matcher, 'smart_index'))
+
+                # 另加每个分片常驻的文件夹表
+                self.assertEqual(matcher.clear_caches(), sum(shard_items) + len(matcher.shards))
+                self.assertEqual(matcher.get_cache_stats()['total_items'], 0)
+            finally:
+                matcher.shutdown()
+
+    def test_replace_matcher_shuts_down_old(self):
+        """重建匹配器时关闭旧匹配器的分发线程池与各分片"""
+        app = torrent_maker.TorrentMakerApp.__new__(torrent_maker.TorrentMakerApp)
+        app.config = ConfigManager.__new__(ConfigManager)
+        app.config.settings = dict(ConfigManager.DEFAULT_SETTINGS, resource_folder=self.roots[0]['path'],
+                                   resource_roots=self.roots[:2])
+        app.config._validate_config()
+        app.search_history = None
+        old = app.matcher = self.matcher
+        with patch.object(torrent_maker.FileMatcher, 'shutdown', autospec=True) as shutdown:
+            app._replace_matcher(enable_cache=False)
+        self.matcher = app.matcher
+        self.assertIsNot(self.matcher, old)
+        self.assertEqual([call.args[0] for call in shutdown.call_args_list],
+                         [shard.matcher for shard in old.shards])
+        self.assertTrue(old._executor._shutdown)
+
+
+class TestSelectionHotCache(unittest.TestCase):
+    """测试历史选择热缓存"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for name in ["Game of Thrones S01", "Game of Thrones S02", "Breaking Bad"]:
+            (Path(self.temp_dir) / name).mkdir()
+        self.matcher = FileMatcher(self.temp_dir, enable_cache=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_hot_path_and_invalidation(self):
+        """近似重复的查询直接返回上次的选择，目录变化后回退到完整搜索"""
+        results = self.matcher.match_folders("Game of Thrones")
+        self.assertGreaterEqual(len(results), 2)
+        self.assertFalse(results[0]['hot'])
+        selected = results[1]
+        self.assertTrue(self.matcher.record_selection("Game of Thrones", [selected]))
+
+        hot = self.matcher.match_folders("game.of.thrones.1080p")
+        self.assertEqual([(r['path'], r['hot']) for r in hot], [(selected['path'], True)])
+        self.assertIsNotNone(self.matcher._refine_future)
+        full = self.matcher.match_folders("game.of.thrones.1080p", use_hot=False)
+        self.assertGreaterEqual(len(full), 2)
+        self.assertIsNone(self.matcher._refine_future)
+
+        mtime_ns = os.stat(selected['path']).st_mtime_ns
+        os.utime(selected['path'], ns=(mtime_ns, mtime_ns + 10 ** 9))
+        self.assertFalse(self.matcher.match_folders("Game of Thrones")[0]['hot'])
+        stats = self.matcher.hot_results.get_stats()
+        self.assertEqual((stats['hits'], stats['stale'], stats['queries']), (1, 1, 0))
+
+    def test_history_roundtrip(self):
+        """选择写入搜索历史，重新启动后载入热缓存"""
+        path = os.path.join(self.temp_dir, "Breaking Bad")
+        history = torrent_maker.SearchHistory(config_dir=self.temp_dir)
+        history.add_search("Breaking Bad", 1)
+        selections = self.matcher.record_selection("Breaking Bad", [{'path': path, 'score': 90}])
+        self.assertTrue(history.record_selection("Breaking Bad", selections))
+
+        reloaded = torrent_maker.SearchHistory(config_dir=self.temp_dir)
+        cache = torrent_maker.SelectionHotCache(self.matcher._normalize_string)
+        self.assertEqual(cache.load(reloaded.get_selections()), 1)
+        self.assertEqual(cache.lookup("breaking.bad"), [(path, 0.9)])
+        self.assertIsNone(cache.lookup("Game of Thrones"))
+
+
+class TestStreamingScan(unittest.TestCase):
+    """测试流式可恢复文件夹扫描"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for i in range(10):
+            for j in range(3):
+                (Path(self.temp_dir) / f"show{i}" / f"s{j}").mkdir(parents=True, exist_ok=True)
+        self.matcher = FileMatcher(self.temp_dir, enable_cache=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_cursor_resumes_without_duplicates(self):
+        """取消后使用游标继续扫描，结果完整且无重复"""
+        token = torrent_maker.ScanCancelToken()
+        cursor = torrent_maker.FolderScanCursor(Path(self.temp_dir), 3)
+        first = []
+        for folder in self.matcher.iter_folders(3, token, cursor):
+            first.append(folder)
+            if len(first) == 5:
+                token.cancel()
+        self.assertFalse(cursor.exhausted)
+
+        rest = list(self.matcher.iter_folders(3, None, cursor))
+        self.assertTrue(cursor.exhausted)
+        self.assertEqual(len(first) + len(rest), 40)
+        self.assertEqual(len(set(first + rest)), 40)
+
+    def test_deadline_token(self):
+        """截止时间到达后令牌自动取消"""
+        token = torrent_maker.ScanCancelToken(timeout=0)
+        self.assertTrue(token.cancelled)
+        self.assertEqual(token.reason, "deadline")
+        self.assertEqual(list(self.matcher.iter_folders(3, token)), [])
+
+
+class TestFolderTable(unittest.TestCase):
+    """测试紧凑文件夹表"""
+
+    def test_paths_roundtrip(self):
+        """父指针拼接出的路径与原路径一致，名称片段只驻留一份"""
+        root = os.path.join(os.sep, "media")
+        paths = [os.path.join(root, "Show"),
+                 os.path.join(root, "Show", "Season 1"),
+                 os.path.join(root, "Other", "Season 1")]
+        table = torrent_maker.FolderTable.from_paths(paths)
+
+        self.assertEqual(len(table), 3)
+        self.assertEqual([table.path_str(i) for i in range(3)], paths)
+        self.assertEqual(table.parent_id(1), 0)
+        self.assertIsNone(table.parent_id(2))
+        self.assertIs(table.name(1), table.name(2))
+        self.assertEqual(table.find(paths[2]), 2)
+        self.assertEqual(table.path_length(1), len(paths[1]))
+
+
+class TestSearchCache(unittest.TestCase):
+    """测试有界缓存"""
+
+    def test_lru_budget_and_ttl(self):
+        """超出命名空间预算时淘汰最久未使用的条目，过期条目读取时移除"""
+        cache = torrent_maker.SearchCache(cache_duration=60, namespace_budgets={'small': 2000})
+        for i in range(10):
+            cache.set(f"k{i}", "x" * 300, 'small')
+            cache.get("k0", 'small')  # k0 一直被访问，不应被淘汰
+        stats = cache.get_stats()['namespaces']['small']
+        self.assertLessEqual(stats['bytes'], 2000)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertIsNotNone(cache.get("k0", 'small'))
+        self.assertIsNone(cache.get("k1", 'small'))
+
+        # 其他命名空间不受影响
+        cache.set("other", "value")
+        self.assertEqual(cache.get("other"), "value")
+
+        cache.cache_duration = 0
+        self.assertIsNone(cache.get("other"))
+        self.assertEqual(cache.get_stats()['namespaces']['default']['expirations'], 1)
+
+    def test_memory_manager_shrinks_caches(self):
+        """内存清理时收缩已登记的缓存"""
+        cache = torrent_maker.SearchCache()
+        for i in range(100):
+            cache.set(f"k{i:03d}", "x" * 100)
+        size_cache = torrent_maker.DirectorySizeCache(max_cache_size=10, persistent=False)
+        for i in range(20):
+            size_cache._add_to_cache(f"/p{i}", time.time(), i, 0.0)
+        self.assertEqual(list(size_cache._cache), [f"/p{i}" for i in range(10, 20)])
+
+        manager = torrent_maker.MemoryManager()
+        manager.register_cache(cache)
+        manager.register_cache(size_cache)
+        cleaned = manager.cleanup_memory()
+        self.assertGreater(cleaned['cache_bytes_freed'], 0)
+        self.assertEqual(cache.get_stats()['total_items'], 50)
+        self.assertEqual(list(size_cache._cache), [f"/p{i}" for i in range(15, 20)])
+
+
+class TestAdaptiveScan(unittest.TestCase):
+    """测试网络文件系统感知扫描"""
+
+    def test_aimd_concurrency(self):
+        """低延迟时并发线性增长，延迟飙升时成倍回退"""
+        controller = torrent_maker.AIMDConcurrencyController(initial=4, max_limit=32)
+        for _ in range(160):
+            controller.record(0.005)
+        grown = controller.limit
+        self.assertGreater(grown, 4)
+
+        for _ in range(32):
+            controller.record(0.5)
+        self.assertLess(controller.limit, grown)
+        self.assertGreaterEqual(controller.limit, 1)
+
+    def test_walker_measure(self):
+        """自适应遍历统计的文件数和大小正确"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for i in range(3):
+                sub = Path(temp_dir) / f"dir{i}"
+                sub.mkdir()
+                (sub / "a.bin").write_bytes(b"x" * 10)
+
+            monitor = torrent_maker.ScanIOMonitor(local_workers=3)
+            result = torrent_maker.AdaptiveDirectoryWalker(monitor).measure(temp_dir)
+            self.assertEqual(result['files'], 3)
+            self.assertEqual(result['dirs'], 3)
+            self.assertEqual(result['size'], 30)
+
+            # 同一挂载点的遍历共用一个线程池，不再每次新建线程
+            executor = monitor.executor_for(monitor.mount_for(temp_dir))
+            walker = torrent_maker.AdaptiveDirectoryWalker(monitor)
+            for _ in range(5):
+                self.assertEqual(walker.measure(temp_dir)['size'], 30)
+            self.assertIs(monitor.executor_for(monitor.mount_for(temp_dir)), executor)
+            self.assertLessEqual(len(executor._threads), 3)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+class TestScanIgnoreRules(unittest.TestCase):
+    """测试扫描排除规则"""
+
+    def test_glob_and_regex_rules(self):
+        """通配符与正则合并为一个匹配器，支持目录限定、锚定与重新包含"""
+        rules = torrent_maker.ScanIgnoreRules(
+            ['@eaDir/', '/build/', '*.tmp', '!keep.tmp'], [r'(?i)(^|/)samples?/$'])
+
+        self.assertTrue(rules.is_ignored('Show/@eaDir', True))
+        self.assertFalse(rules.is_ignored('Show/@eaDir', False))
+        self.assertTrue(rules.is_ignored('build', True))
+        self.assertFalse(rules.is_ignored('Show/build', True))
+        self.assertTrue(rules.is_ignored('a/b.tmp', False))
+        self.assertFalse(rules.is_ignored('keep.tmp', False))
+        self.assertTrue(rules.is_ignored('Show/SAMPLE', True))
+        self.assertFalse(rules.is_ignored('Show/Season 1', True))
+
+    def test_rules_prune_folder_scan_only(self):
+        """排除规则只剪枝文件夹扫描；大小统计计入全部文件（制种包含它们）"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            (Path(temp_dir) / "Show").mkdir()
+            (Path(temp_dir) / "Show" / "e1.mkv").write_bytes(b"x" * 10)
+            (Path(temp_dir) / "@eaDir").mkdir()
+            (Path(temp_dir) / "@eaDir" / "thumb.jpg").write_bytes(b"x" * 100)
+
+            rules = torrent_maker.ScanIgnoreRules(['@eaDir/'], [])
+            walker = torrent_maker.AdaptiveDirectoryWalker(ignore_rules=rules)
+            self.assertEqual(walker.measure(temp_dir)['size'], 110)
+            with patch.object(torrent_maker, 'get_scan_ignore_rules', return_value=rules):
+                self.assertEqual(torrent_maker.DirectorySizeCache(persistent=False)
+                                 ._scan_directory_simple(Path(temp_dir)), 110)
+            self.assertEqual(rules.get_stats()['pruned_dirs'], 0)
+
+            folders = []
+            walker.walk(temp_dir, lambda entry, depth, mount: folders.append(entry.name) or True)
+            self.assertNotIn("@eaDir", folders)
+            self.assertEqual(rules.get_stats()['pruned_dirs'], 1)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+class TestPersistentDirectoryStore(unittest.TestCase):
+    """测试目录统计磁盘缓存"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.data_dir = Path(self.temp_dir) / "data"
+        self.data_dir.mkdir()
+        (self.data_dir / "a.bin").write_bytes(b"x" * 10)
+        self.db_path = os.path.join(self.temp_dir, "cache.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_survives_new_instance(self):
+        """新的缓存实例（模拟进程重启）直接命中磁盘缓存"""
+        first = torrent_maker.DirectorySizeCache(
+            store=torrent_maker.PersistentDirectoryStore(self.db_path))
+        self.assertEqual(first.get_directory_size(self.data_dir), 10)
+        first.store.close()
+
+        second = torrent_maker.DirectorySizeCache(
+            store=torrent_maker.PersistentDirectoryStore(self.db_path))
+        self.assertEqual(second.get_directory_size(self.data_dir), 10)
+        self.assertEqual(second.get_cache_stats()['disk_hits'], 1)
+        second.store.close()
+
+    def test_child_count_invalidates(self):
+        """子项数量变化后磁盘条目失效"""
+        store = torrent_maker.PersistentDirectoryStore(self.db_path)
+        signature = store.signature(self.data_dir)
+        store.put('size', str(self.data_dir), signature, 10)
+        self.assertEqual(store.get('size', str(self.data_dir), signature), 10)
+
+        stale_signature = (signature[0], signature[1] + 1)
+        self.assertIsNone(store.get('size', str(self.data_dir), stale_signature))
+        self.assertIsNone(store.get('size', str(self.data_dir), signature))
+        store.close()
+
+    def test_reuse_capped_by_cache_duration(self):
+        """签名看不到子目录里的变化，磁盘条目最多复用 cache_duration 秒"""
+        (self.data_dir / "season").mkdir()
+        first = torrent_maker.DirectorySizeCache(
+            cache_duration=60, store=torrent_maker.PersistentDirectoryStore(self.db_path))
+        self.assertEqual(first.get_directory_size(self.data_dir), 10)
+        first.store.close()
+        (self.data_dir / "season" / "e01.bin").write_bytes(b"x" * 5)
+
+        written = time.time()
+        second = torrent_maker.DirectorySizeCache(
+            cache_duration=60, store=torrent_maker.PersistentDirectoryStore(self.db_path))
+        with patch('time.time', return_value=written + 30):
+            self.assertEqual(second.get_directory_size(self.data_dir), 10)
+        second._cache.clear()
+        with patch('time.time', return_value=written + 61):
+            self.assertEqual(second.get_directory_size(self.data_dir), 15)
+        second.store.close()
+
+
+class TestQueueManager(unittest.TestCase):
+    """测试队列管理器"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.queue = torrent_maker.QueueManager(max_concurrent=1,
+                                                save_file=os.path.join(self.temp_dir, "queue.json"))
+
+    def tearDown(self):
+        self.queue.executor.shutdown(wait=False)
+        self.queue.store.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _reopen(self):
+        self.queue.executor.shutdown(wait=False)
+        self.queue.store.close()
+        self.queue = torrent_maker.QueueManager(max_concurrent=1, save_file=self.queue.save_file)
+
+    def test_indexed_heap_matches_sorted_order(self):
+        """随机插入、删除、改优先级后弹出顺序与排序结果一致"""
+        import random
+        rng = random.Random(7)
+        heap = torrent_maker.IndexedTaskHeap()
+        live = {}
+        priorities = list(torrent_maker.TaskPriority)
+        for i in range(2000):
+            op = rng.random()
+            if op < 0.5 or not live:
+                task = torrent_maker.QueueTask(id=f"t{i}", name="", path="",
+                                               priority=rng.choice(priorities), created_time=float(i))
+                live[task.id] = task
+                heap.push(task)
+            elif op < 0.75:
+                task_id = rng.choice(list(live))
+                self.assertIs(heap.remove(task_id), live.pop(task_id))
+            else:
+                task = live[rng.choice(list(live))]
+                task.priority = rng.choice(priorities)
+                self.assertTrue(heap.update(task))
+        self.assertIsNone(heap.remove("missing"))
+        popped = [heap.pop() for _ in range(len(heap))]
+        self.assertEqual(popped, sorted(live.values()))
+        self.assertIsNone(heap.pop())
+
+    def test_reprioritize_pause_and_remove(self):
+        """改优先级、暂停、移除后等待队列按新顺序出队"""
+        ids = [self.queue.add_task(f"task{i}", os.path.join(self.temp_dir, f"missing{i}"))
+               for i in range(4)]
+        self.assertTrue(self.queue.set_task_priority(ids[3], torrent_maker.TaskPriority.URGENT))
+        self.assertTrue(self.queue.pause_task(ids[0]))
+        self.assertTrue(self.queue.remove_task(ids[1]))
+        self.assertEqual(len(self.queue.priority_queue), 2)
+        self.assertTrue(self.queue.resume_task(ids[0]))
+
+        order = [self.queue.priority_queue.pop().id for _ in range(3)]
+        self.assertEqual(order, [ids[3], ids[0], ids[2]])
+
+    def test_throughput_model(self):
+        """按挂载点与预设学习速度，未见过的预设回退到同一挂载点的平均速度"""
+        model = torrent_maker.ThroughputModel()
+        path = os.path.join(self.temp_dir, "show")
+        mb = 1024 * 1024
+        done = torrent_maker.QueueTask(id="a", name="", path=path, file_size=1000 * mb, actual_duration=12.0)
+        self.assertTrue(model.observe(done))
+        pending = torrent_maker.QueueTask(id="b", name="", path=path, file_size=500 * mb)
+        self.assertAlmostEqual(model.estimate(pending), 2.0 + 5.0)
+        pending.preset = "fast"
+        self.assertAlmostEqual(model.rate_for(pending), 100.0)
+
+    def test_scheduling_policies(self):
+        """最短作业优先、按大小公平分享与截止时间策略的出队顺序"""
+        model = torrent_maker.ThroughputModel()
+        gb = 1024 ** 3
+
+        created = iter(range(10 ** 6))
+
+        def make(task_id, size, deadline=None):
+            task = torrent_maker.QueueTask(id=task_id, name="", path="", file_size=size,
+                                           created_time=float(next(created)), deadline=deadline)
+            task.estimated_duration = model.estimate(task)
+            return task
+
+        def drain(policy_name, tasks):
+            policy = torrent_maker.SCHEDULING_POLICIES[policy_name](model)
+            heap = torrent_maker.IndexedTaskHeap(policy.key)
+            for task in tasks:
+                heap.push(task)
+            order = []
+            while len(heap):
+                task = heap.pop()
+                policy.on_dispatch(task)
+                order.append(task.id)
+            return order
+
+        pack = make("L", 300 * gb)
+        singles = [make(f"s{i}", gb // 5) for i in range(1000)]
+        self.assertEqual(drain('fifo', [pack] + singles)[0], "L")
+        self.assertEqual(drain('sjf', [pack] + singles)[-1], "L")
+        # 公平分享：大包既不会饿死，也不会挡住全部单集
+        position = drain('fair_share', [pack] + singles).index("L")
+        self.assertTrue(0 < position < 1000)
+
+        urgent = make("d1", 300 * gb, deadline=time.time() + 3600)
+        self.assertEqual(drain('deadline', singles[:3] + [urgent])[0], "d1")
+
+    def test_policies_with_aging(self):
+        """开启老化后，同一级内仍按策略排序，不会退化为先来先服务"""
+        model = torrent_maker.ThroughputModel()
+        gb = 1024 ** 3
+        now = time.time()
+
+        def make(task_id, size, created, deadline=None):
+            task = torrent_maker.QueueTask(id=task_id, name="", path="", file_size=size,
+                                           created_time=created, deadline=deadline)
+            task.estimated_duration = model.estimate(task)
+            return task
+
+        def first(policy_name, tasks):
+            policy = torrent_maker.SCHEDULING_POLICIES[policy_name](model, 1800)
+            policy.clock = now
+            heap = torrent_maker.IndexedTaskHeap(policy.key)
+            for task in tasks:
+                heap.push(task)
+            return heap.pop().id
+
+        # 300 GB 大包只早提交 1 秒
+        pack = make("L", 300 * gb, now - 101)
+        small = make("s", 200 * 1024 ** 2, now - 100, deadline=now + 600)
+        self.assertEqual(first('sjf', [pack, small]), "s")
+        self.assertEqual(first('deadline', [pack, small]), "s")
+        self.assertEqual(first('fifo', [pack, small]), "L")
+
+        # 等满一个间隔的普通任务与刚提交的高优先级任务同级，按作业长短排；
+        # 等满两个间隔后升到紧急，排在前面
+        waited = make("w", 300 * gb, now - 1800)
+        high = make("h", 200 * 1024 ** 2, now)
+        high.priority = torrent_maker.TaskPriority.HIGH
+        self.assertEqual(first('sjf', [waited, high]), "h")
+        waited.created_time = now - 3600
+        self.assertEqual(first('sjf', [waited, high]), "w")
+
+    def test_priority_aging(self):
+        """优先级老化：持续涌入的紧急任务不会让低优先级任务无限等待"""
+        model = torrent_maker.ThroughputModel()
+        low = torrent_maker.QueueTask(id="low", name="", path="", created_time=0.0,
+                                      priority=torrent_maker.TaskPriority.LOW)
+        urgent = [torrent_maker.QueueTask(id=f"u{t}", name="", path="", created_time=float(t),
+                                          priority=torrent_maker.TaskPriority.URGENT)
+                  for t in range(10, 600, 10)]
+
+        def order(aging_interval, clock):
+            policy = torrent_maker.SchedulingPolicy(model, aging_interval)
+            policy.clock = clock
+            heap = torrent_maker.IndexedTaskHeap(policy.key)
+            for task in [low] + urgent:
+                heap.push(task)
+            return [heap.pop().id for _ in range(len(heap))]
+
+        self.assertEqual(order(0, 600.0)[-1], "low")
+        # 每等待 60 秒提升一整级：等了 150 秒的低优先级任务升到高（1 级），仍排在紧急任务后面
+        self.assertEqual(order(60, 150.0)[-1], "low")
+        # 等满 180 秒升到紧急，同级内按提交时间排在最前
+        self.assertEqual(order(60, 600.0)[0], "low")
+
+        # 老化时钟推进后才重算排序键
+        policy = torrent_maker.SchedulingPolicy(model, 1800)
+        self.assertFalse(policy.refresh(policy.clock + 1))
+        self.assertTrue(policy.refresh(policy.clock + policy.AGING_REFRESH))
+
+        for i in range(3):
+            self.queue.add_task(f"/tmp/wait{i}", f"/tmp/out{i}")
+        for task in self.queue.priority_queue.tasks():
+            task.created_time -= 100
+        waiting = self.queue.get_queue_status()['waiting_time']
+        self.assertGreaterEqual(waiting['p95'], waiting['p50'])
+        self.assertGreaterEqual(waiting['max'], 100)
+
+    def test_json_migration_and_lazy_history(self):
+        """旧 JSON 队列迁移到 SQLite；重启后只载入未结束的任务，历史按需读取"""
+        self.queue.store.close()
+        json_path = os.path.join(self.temp_dir, "torrent_queue.json")
+        tasks = {}
+        for i, status in enumerate(["waiting", "running", "completed", "failed"]):
+            task = torrent_maker.QueueTask(id=f"t{i}", name=f"task{i}", path="",
+                                           status=torrent_maker.TaskStatus(status))
+            tasks[task.id] = task.to_dict()
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({'tasks': tasks, 'stats': {'completed_tasks': 1}}, f)
+
+        self.queue = torrent_maker.QueueManager(max_concurrent=1, save_file=json_path)
+        self.assertTrue(os.path.exists(json_path + ".migrated"))
+        self.assertFalse(os.path.exists(json_path))
+        self.assertEqual(sorted(self.queue.tasks), ["t0", "t1"])
+        self.assertEqual(self.queue.get_task("t2").status, torrent_maker.TaskStatus.COMPLETED)
+        self.assertEqual(len(self.queue.get_all_tasks()), 4)
+        status = self.queue.get_queue_status()
+        self.assertEqual((status['waiting_tasks'], status['status_counts']['failed']), (2, 1))
+        self.assertEqual(self.queue.stats['completed_tasks'], 1)
+
+        with self.queue.batch():
+            for i in range(50):
+                self.queue.add_task(f"batch{i}", "")
+            self.assertEqual(self.queue.store.count_by_status().get('waiting'), 2)
+        self.assertTrue(self.queue.retry_task("t3"))
+        self.assertEqual(self.queue.clear_completed_tasks(), 1)
+
+        self._reopen()
+        self.assertEqual(len(self.queue.priority_queue), 53)
+        self.assertEqual(self.queue.get_tasks_by_status(torrent_maker.TaskStatus.COMPLETED), [])
+
+
+class TestTorrentQueueManager(unittest.TestCase):
+    """测试制种队列：配置快照与工作进程"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        # 用一个只写出参数的假 mktorrent 代替真实程序
+        bin_dir = os.path.join(self.temp_dir, "bin")
+        os.makedirs(bin_dir)
+        fake = os.path.join(bin_dir, "mktorrent")
+        with open(fake, 'w', encoding='utf-8') as f:
+            f.write(f"#!{sys.executable}\n"
+                    "import sys\n"
+                    "import os, time\n"
+                    "args = ' '.join(sys.argv[1:])\n"
+                    "with open(sys.argv[sys.argv.index('-o') + 1], 'w') as f:\n"
+                    "    f.write('d')\n"
+                    "    f.flush()\n"
+                    "    time.sleep(float(os.environ.get('FAKE_MKTORRENT_SECONDS', '0')))\n"
+                    "    f.write('4:args%d:%se' % (len(args), args))\n")
+        os.chmod(fake, 0o755)
+        self.env = patch.dict(os.environ, {'PATH': bin_dir + os.pathsep + os.environ.get('PATH', '')})
+        self.env.start()
+
+        self.source = os.path.join(self.temp_dir, "Show.S01")
+        os.makedirs(self.source)
+        Path(self.source, "e01.mkv").write_bytes(b"x" * 1024)
+        self.creator = TorrentCreator(["udp://tracker.example:80"], os.path.join(self.temp_dir, "default"),
+                                      config_manager=ConfigManager())
+        self.queue = torrent_maker.TorrentQueueManager(self.creator, max_concurrent=2,
+                                                       save_file=os.path.join(self.temp_dir, "queue.json"))
+
+    def tearDown(self):
+        self.queue.shutdown()
+        self.env.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_tasks_run_from_snapshots(self):
+        """并发任务各用自己的预设与输出目录，不改写共享配置"""
+        from concurrent.futures import ThreadPoolExecutor
+        config = self.creator.config_manager
+        settings_before = dict(config.settings)
+        outputs = {}
+        for preset in ("fast", "quality"):
+            outputs[preset] = os.path.join(self.temp_dir, preset)
+            self.queue.add_torrent_task(self.source, preset=preset, output_path=outputs[preset])
+        tasks = list(self.queue.tasks.values())
+        for task in tasks:
+            task.status = torrent_maker.TaskStatus.RUNNING
+
+        snapshot = torrent_maker.CreationSnapshot.for_task(tasks[0], self.creator)
+        self.assertEqual(snapshot.output_dir, outputs[tasks[0].preset])
+        self.assertEqual(torrent_maker.CreationSnapshot.parse_piece_size("2m"), 2048)
+        self.assertEqual(torrent_maker.CreationSnapshot.parse_piece_size("256k"), 256)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            self.assertEqual(list(pool.map(self.queue._execute_task, tasks)), [True, True])
+        self.assertIsNotNone(self.queue._process_pool)
+        for task in tasks:
+            written = os.listdir(outputs[task.preset])
+            self.assertEqual(len(written), 1)
+            piece_size = torrent_maker.CreationSnapshot.for_task(task, self.creator).piece_size
+            if isinstance(piece_size, int):
+                content = Path(outputs[task.preset], written[0]).read_text()
+                self.assertIn(f"-l {(piece_size * 1024).bit_length() - 1} ", content)
+        self.assertEqual(config.settings, settings_before)
+        self.assertEqual(self.creator.output_dir, Path(self.temp_dir, "default"))
+
+        # 关闭进程隔离时在当前进程中按快照执行
+        self.queue.use_processes = False
+        self.assertTrue(self.queue._execute_task(tasks[0]))
+        self.assertEqual(len(os.listdir(outputs[tasks[0].preset])), 2)
+
+    def _wait_for(self, condition, timeout=20):
+        deadline = time.time() + timeout
+        while not condition():
+            if time.time() > deadline:
+                self.fail("等待超时")
+            time.sleep(0.05)
+
+    @staticmethod
+    def _process_state(pid):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                return f.read().rsplit(')', 1)[1].split()[0]
+        except OSError:
+            return None
+
+    def test_timeout_excludes_suspended_time(self):
+        """mktorrent 被挂起的时间不计入超时"""
+        import signal
+        import subprocess
+        if not hasattr(signal, 'SIGSTOP'):
+            self.skipTest("需要 POSIX 信号")
+
+        def spawn(seconds):
+            return subprocess.Popen([sys.executable, "-c", f"import time; time.sleep({seconds})"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                    start_new_session=True)
+
+        # 挂起状态由调用方告知，不轮询进程状态
+        paused = threading.Event()
+
+        def resume():
+            paused.clear()
+            os.killpg(process.pid, signal.SIGCONT)
+
+        process = spawn(0.3)
+        paused.set()
+        os.killpg(process.pid, signal.SIGSTOP)
+        threading.Timer(1.5, resume).start()
+        self.creator._wait_mktorrent(process, timeout=1.0, poll_interval=0.1, is_paused=paused.is_set)
+        self.assertEqual(process.returncode, 0)
+
+        process = spawn(30)
+        with self.assertRaises(subprocess.TimeoutExpired):
+            self.creator._wait_mktorrent(process, timeout=0.5, poll_interval=0.1, is_paused=paused.is_set)
+        process.kill()
+        process.communicate()
+
+    def test_pause_resume_and_cancel_running_task(self):
+        """暂停挂起 mktorrent 并原地继续；取消终止它并删除未写完的种子"""
+        if not hasattr(torrent_maker.signal, 'SIGSTOP') or not os.path.isdir("/proc/self"):
+            self.skipTest("需要 POSIX 信号与 /proc")
+        os.environ['FAKE_MKTORRENT_SECONDS'] = "60"
+        output = os.path.join(self.temp_dir, "out")
+        task_id = self.queue.add_torrent_task(self.source, output_path=output)
+        self.queue.start_queue()
+        self._wait_for(lambda: self.queue._process_of(task_id))
+        first_pid = self.queue._process_of(task_id)
+        self._wait_for(lambda: os.listdir(output))
+
+        # 停止后重新开始：上一次执行被终止，新执行的进程仍可暂停与取消
+        self.queue.stop_queue()
+        self._wait_for(lambda: self._process_state(first_pid) in (None, 'Z') and not os.listdir(output))
+        self.queue.start_queue()
+        self._wait_for(lambda: self.queue._process_of(task_id) not in (None, first_pid))
+        pid = self.queue._process_of(task_id)
+        self._wait_for(lambda: os.listdir(output))
+        time.sleep(0.3)
+        self.assertEqual(self.queue._process_of(task_id), pid)
+
+        run_id = self.queue._task_runs[task_id]
+        self.assertTrue(self.queue.pause_task(task_id))
+        self._wait_for(lambda: self._process_state(pid) == 'T')
+        self.assertIn(task_id, self.queue.running_tasks)
+        # 工作进程经共享数组得知暂停，挂起时间不计入超时
+        self.assertIn(run_id, self.queue._paused_runs[:])
+        self.assertTrue(self.queue.resume_task(task_id))
+        self._wait_for(lambda: self._process_state(pid) not in ('T', None))
+        self.assertNotIn(run_id, self.queue._paused_runs[:])
+        self.assertEqual(self.queue.get_task(task_id).status, torrent_maker.TaskStatus.RUNNING)
+
+        self.assertTrue(self.queue.pause_task(task_id))
+        self.assertTrue(self.queue.cancel_task(task_id))
+        self._wait_for(lambda: self._process_state(pid) in (None, 'Z') and not os.listdir(output))
+        self._wait_for(lambda: not self.queue._run_processes)
+        task = self.queue.get_task(task_id)
+        self.assertEqual(task.status, torrent_maker.TaskStatus.CANCELLED)
+        self.assertEqual((task.error_message, self.queue.stats['failed_tasks']), ("", 0))
+
+
 class TestTorrentCreator(unittest.TestCase):
     """测试种子创建器"""
 
@@ -231,6 +1419,16 @@ def run_tests():
     test_classes = [
         TestConfigManager,
         TestFileMatcher,
+        TestMultiRootMatcher,
+        TestSelectionHotCache,
+        TestStreamingScan,
+        TestFolderTable,
+        TestSearchCache,
+        TestAdaptiveScan,
+        TestScanIgnoreRules,
+        TestPersistentDirectoryStore,
+        TestQueueManager,
+        TestTorrentQueueManager,
         TestTorrentCreator,
         TestIntegration
     ]
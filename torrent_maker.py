@@ -184,11 +184,21 @@ FULL_VERSION_INFO = f"Torrent Maker {VERSION} - {VERSION_NAME}"
 
 # ================== 队列管理模块 ==================
 import uuid
+import copy
+import heapq
+import signal
+import itertools
+import sqlite3
+import multiprocessing
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
 from enum import Enum
-from typing import Dict, List, Optional, Callable, Any
+from typing import Dict, List, Optional, Callable, Any, Iterator
 from dataclasses import dataclass, asdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from queue import Queue, PriorityQueue
+from concurrent.futures.process import BrokenProcessPool
+from queue import Queue
 
 class TaskStatus(Enum):
     """任务状态枚举"""
@@ -228,6 +238,7 @@ class QueueTask:
     actual_duration: float = 0.0
     retry_count: int = 0
     max_retries: int = 3
+    deadline: Optional[float] = None  # 期望完成时间（time.time()），截止时间策略使用
     
     def __post_init__(self):
         if self.created_time is None:
@@ -249,9 +260,9 @@ class QueueTask:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'QueueTask':
         """从字典创建任务对象"""
-        # 安全转换状态枚举
+        # 安全转换状态枚举（to_dict 保存的是值，如 "completed"；也接受名称）
         try:
-            if isinstance(data['status'], str):
+            if isinstance(data['status'], str) and data['status'] in TaskStatus.__members__:
                 data['status'] = TaskStatus[data['status']]
             else:
                 data['status'] = TaskStatus(data['status'])
@@ -355,6 +366,13 @@ class QueueStatusDisplay:
         
         # 基本状态
         self._display_standard_status(status)
+        policy = SCHEDULING_POLICIES.get(status.get('scheduling_policy'))
+        if policy is not None:
+            print(f"🧭 调度策略: {policy.label}")
+        waiting = status.get('waiting_time')
+        if waiting and waiting['max']:
+            print(f"⏳ 等待时间: p50 {waiting['p50']:.1f}秒, p95 {waiting['p95']:.1f}秒, "
+                  f"最长 {waiting['max']:.1f}秒")
         
         # 正在运行的任务
         running_tasks = [task for task in queue_manager.get_all_tasks() 
@@ -387,16 +405,540 @@ class QueueStatusDisplay:
         print("="*60)
 
 
+class QueueStore:
+    """队列的 SQLite 存储 - 每个任务一行，只写变更的行，批量提交
+
+    数据库与 JSON 队列文件同名，扩展名为 .db，使用 WAL 模式：写入中途
+    崩溃不会损坏已提交的数据。首次打开时数据库为空而 JSON 文件存在，
+    就把其中的任务导入一次，原文件改名为 *.json.migrated 保留。读取按
+    rowid 分页，已结束的历史任务不必一次性载入内存。
+    """
+
+    FINISHED_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED)
+    PAGE_SIZE = 500
+
+    def __init__(self, json_path: str):
+        self.json_path = json_path
+        root, ext = os.path.splitext(json_path)
+        self.db_path = (root if ext.lower() == '.json' else json_path) + '.db'
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disabled = False
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        with self._lock:
+            return self._connect() is not None
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """首次使用时才打开数据库"""
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    created_time REAL NOT NULL,
+                    payload TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.commit()
+            self._migrate_json(conn)
+            self._conn = conn
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"队列数据库不可用，队列仅保存在内存中: {e}")
+            self._disabled = True
+        return self._conn
+
+    @staticmethod
+    def _row(task: QueueTask) -> Tuple[str, str, int, float, str]:
+        return (task.id, task.status.value, task.priority.value, task.created_time,
+                json.dumps(task.to_dict(), ensure_ascii=False))
+
+    @staticmethod
+    def _decode(payload: str) -> Optional[QueueTask]:
+        try:
+            return QueueTask.from_dict(json.loads(payload))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"跳过无法解析的队列任务: {e}")
+            return None
+
+    def _migrate_json(self, conn: sqlite3.Connection) -> None:
+        """数据库为空时导入旧的 JSON 队列文件"""
+        if not os.path.exists(self.json_path):
+            return
+        if conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchone() or \
+                conn.execute("SELECT 1 FROM meta LIMIT 1").fetchone():
+            return
+        try:
+            with open(self.json_path, 'r', encoding='utf-8') as f:
+                queue_data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"旧队列文件无法读取，跳过迁移: {e}")
+            return
+
+        rows = []
+        for task_id, task_data in queue_data.get('tasks', {}).items():
+            try:
+                rows.append(self._row(QueueTask.from_dict(task_data)))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"迁移任务失败: {task_id} - {e}")
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?)", rows)
+            for key in ('stats', 'settings'):
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                             (key, json.dumps(queue_data.get(key, {}))))
+        os.replace(self.json_path, self.json_path + '.migrated')
+        print(f"📦 队列已从 JSON 迁移到 SQLite: {len(rows)} 个任务")
+
+    def write(self, upserts: List[QueueTask], deletes: List[str],
+              meta: Optional[Dict[str, Any]] = None) -> bool:
+        """在一个事务内写入变更的任务、删除的任务与元数据"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return False
+            try:
+                with conn:
+                    if upserts:
+                        conn.executemany("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?)",
+                                         [self._row(task) for task in upserts])
+                    if deletes:
+                        conn.executemany("DELETE FROM tasks WHERE id = ?", [(task_id,) for task_id in deletes])
+                    for key, value in (meta or {}).items():
+                        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                     (key, json.dumps(value)))
+                return True
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logger.error(f"保存队列失败: {e}")
+                return False
+
+    def get(self, task_id: str) -> Optional[QueueTask]:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute("SELECT payload FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            except sqlite3.Error:
+                return None
+        return self._decode(row[0]) if row else None
+
+    def iter_tasks(self, statuses: Optional[Tuple[TaskStatus, ...]] = None) -> Iterator[QueueTask]:
+        """按写入顺序分页读取任务（可按状态过滤），不一次性载入全部"""
+        condition, params = "", ()
+        if statuses:
+            condition = f" AND status IN ({', '.join('?' * len(statuses))})"
+            params = tuple(status.value for status in statuses)
+        last_rowid = 0
+        while True:
+            with self._lock:
+                conn = self._connect()
+                if conn is None:
+                    return
+                try:
+                    rows = conn.execute(
+                        f"SELECT rowid, payload FROM tasks WHERE rowid > ?{condition} "
+                        f"ORDER BY rowid LIMIT {self.PAGE_SIZE}", (last_rowid,) + params).fetchall()
+                except sqlite3.Error as e:
+                    logger.error(f"读取队列失败: {e}")
+                    return
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            for _, payload in rows:
+                task = self._decode(payload)
+                if task is not None:
+                    yield task
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return {}
+            try:
+                return dict(conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+            except sqlite3.Error:
+                return {}
+
+    def delete_status(self, status: TaskStatus) -> int:
+        """删除某一状态的全部任务，返回删除的行数"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return 0
+            try:
+                with conn:
+                    return conn.execute("DELETE FROM tasks WHERE status = ?", (status.value,)).rowcount
+            except sqlite3.Error as e:
+                logger.error(f"清理队列任务失败: {e}")
+                return 0
+
+    def load_meta(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return {}
+            try:
+                return {key: json.loads(value)
+                        for key, value in conn.execute("SELECT key, value FROM meta").fetchall()}
+            except (sqlite3.Error, ValueError):
+                return {}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class IndexedTaskHeap:
+    """按任务 ID 索引的二叉堆 - 插入、删除、改优先级、弹出均为 O(log n)
+
+    堆中只放等待执行的任务。默认排序键与 QueueTask.__lt__ 一致（优先级，
+    创建时间），调度策略可以换成自己的键（见 SchedulingPolicy）。
+    _position 记录每个任务在堆数组中的下标，删除或改优先级时直接定位后
+    上浮/下沉，不必重建整个队列。
+    """
+
+    def __init__(self, key: Optional[Callable[[QueueTask], Tuple]] = None):
+        self._key = key or self.default_key
+        self._heap: List[Tuple[Tuple, QueueTask]] = []
+        self._position: Dict[str, int] = {}
+
+    @staticmethod
+    def default_key(task: QueueTask) -> Tuple[int, float]:
+        return (task.priority.value, task.created_time)
+
+    def rebuild(self, key: Optional[Callable[[QueueTask], Tuple]] = None) -> None:
+        """重新计算全部排序键（换策略或估算时长更新后），O(n)"""
+        if key is not None:
+            self._key = key
+        self._heap = [(self._key(task), task) for _, task in self._heap]
+        heapq.heapify(self._heap)
+        self._position = {task.id: index for index, (_, task) in enumerate(self._heap)}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._position
+
+    def empty(self) -> bool:
+        return not self._heap
+
+    def push(self, task: QueueTask) -> None:
+        """加入任务；已在堆中时按当前优先级调整位置"""
+        if task.id in self._position:
+            self.update(task)
+            return
+        self._heap.append((self._key(task), task))
+        self._position[task.id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def pop(self) -> Optional[QueueTask]:
+        """弹出优先级最高的任务，堆为空时返回 None"""
+        if not self._heap:
+            return None
+        return self._remove_at(0)
+
+    def peek(self) -> Optional[QueueTask]:
+        return self._heap[0][1] if self._heap else None
+
+    def remove(self, task_id: str) -> Optional[QueueTask]:
+        """移除任务，不在堆中时返回 None"""
+        index = self._position.get(task_id)
+        if index is None:
+            return None
+        return self._remove_at(index)
+
+    def update(self, task: QueueTask) -> bool:
+        """任务优先级变化后调整位置"""
+        index = self._position.get(task.id)
+        if index is None:
+            return False
+        old_key = self._heap[index][0]
+        self._heap[index] = (self._key(task), task)
+        if self._heap[index][0] < old_key:
+            self._sift_up(index)
+        else:
+            self._sift_down(index)
+        return True
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._position.clear()
+
+    def tasks(self) -> List[QueueTask]:
+        """堆中的全部任务（堆数组顺序，未排序）"""
+        return [task for _, task in self._heap]
+
+    def _remove_at(self, index: int) -> QueueTask:
+        _, task = self._heap[index]
+        last = self._heap.pop()
+        del self._position[task.id]
+        if index < len(self._heap):
+            self._heap[index] = last
+            self._position[last[1].id] = index
+            self._sift_up(index)
+            self._sift_down(self._position[last[1].id])
+        return task
+
+    def _sift_up(self, index: int) -> None:
+        heap, position = self._heap, self._position
+        item = heap[index]
+        while index > 0:
+            parent = (index - 1) >> 1
+            if not item[0] < heap[parent][0]:
+                break
+            heap[index] = heap[parent]
+            position[heap[index][1].id] = index
+            index = parent
+        heap[index] = item
+        position[item[1].id] = index
+
+    def _sift_down(self, index: int) -> None:
+        heap, position = self._heap, self._position
+        size = len(heap)
+        item = heap[index]
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1][0] < heap[child][0]:
+                child += 1
+            if not heap[child][0] < item[0]:
+                break
+            heap[index] = heap[child]
+            position[heap[index][1].id] = index
+            index = child
+        heap[index] = item
+        position[item[1].id] = index
+
+
+class ThroughputModel:
+    """按（挂载点, 预设）学习的制种吞吐量，用于估算任务时长
+
+    每个成功完成的任务更新一次对应组合的指数加权平均速度（MB/s）。
+    没有样本的组合依次回退到同一挂载点的平均速度、全部样本的平均
+    速度、DEFAULT_MBPS。估算时长 = 固定开销 + 大小 / 速度。
+    """
+
+    DEFAULT_MBPS = 80.0
+    ALPHA = 0.3
+    TASK_OVERHEAD = 2.0          # 每个任务的固定开销（秒）：启动、写种子文件
+    MIN_SAMPLE_SECONDS = 1.0     # 更短的任务计时噪声太大，不计入
+    SIGNIFICANT_CHANGE = 0.25    # 速度变化超过该比例时重新估算等待中的任务
+
+    def __init__(self, rates: Optional[Dict[str, Dict[str, float]]] = None):
+        # "挂载点|预设" -> {'mbps': 速度, 'samples': 样本数}
+        self.rates: Dict[str, Dict[str, float]] = dict(rates or {})
+        self._device_for = lru_cache(maxsize=4096)(self._lookup_device)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _lookup_device(directory: str) -> str:
+        return SCAN_IO_MONITOR.detector.get_mount(directory).mount_point
+
+    def _rate_key(self, task: QueueTask) -> Tuple[str, str]:
+        device = self._device_for(os.path.dirname(os.path.abspath(task.path or '.')))
+        return f"{device}|{task.preset}", device
+
+    def observe(self, task: QueueTask) -> bool:
+        """记录一个已完成任务的速度；返回该组合的速度是否明显变化"""
+        if task.file_size <= 0 or task.actual_duration < self.MIN_SAMPLE_SECONDS:
+            return False
+        seconds = max(task.actual_duration - self.TASK_OVERHEAD, task.actual_duration / 2)
+        mbps = task.file_size / (1024 * 1024) / seconds
+        key, _ = self._rate_key(task)
+        with self._lock:
+            entry = self.rates.get(key)
+            if entry is None:
+                self.rates[key] = {'mbps': mbps, 'samples': 1}
+                return True
+            old = entry['mbps']
+            entry['mbps'] = old + self.ALPHA * (mbps - old)
+            entry['samples'] += 1
+            return abs(entry['mbps'] - old) > old * self.SIGNIFICANT_CHANGE
+
+    def rate_for(self, task: QueueTask) -> float:
+        key, device = self._rate_key(task)
+        with self._lock:
+            entry = self.rates.get(key)
+            if entry is not None:
+                return entry['mbps']
+            same_device = [e['mbps'] for k, e in self.rates.items() if k.rsplit('|', 1)[0] == device]
+            fallback = same_device or [e['mbps'] for e in self.rates.values()]
+        return sum(fallback) / len(fallback) if fallback else self.DEFAULT_MBPS
+
+    def estimate(self, task: QueueTask) -> float:
+        """估算任务时长（秒）"""
+        return self.TASK_OVERHEAD + task.file_size / (1024 * 1024) / self.rate_for(task)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {key: dict(entry) for key, entry in self.rates.items()}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'combinations': len(self.rates),
+                'samples': sum(entry['samples'] for entry in self.rates.values()),
+                'rates': {key: round(entry['mbps'], 1) for key, entry in self.rates.items()}
+            }
+
+
+class SchedulingPolicy:
+    """调度策略 - 给等待中的任务计算排序键，越小越先执行
+
+    所有策略都先按优先级分级（见 tier），策略只决定同一级内的顺序。
+    本类为默认策略：先来先服务。
+    """
+
+    name = 'fifo'
+    label = '先来先服务'
+    # 老化时钟最长多久推进一次（推进后需重算全部排序键）
+    AGING_REFRESH = 60.0
+
+    def __init__(self, model: ThroughputModel, aging_interval: float = 0.0):
+        self.model = model
+        self.aging_interval = aging_interval
+        # 计算老化等待时间所用的"当前时间"，只在 refresh 时推进，
+        # 保证堆中所有排序键按同一时刻计算
+        self.clock = time.time()
+
+    def refresh(self, now: float) -> bool:
+        """推进老化时钟；返回 True 时调用方须重算全部排序键"""
+        if not self.aging_interval or now - self.clock < min(self.AGING_REFRESH, self.aging_interval / 10):
+            return False
+        self.clock = now
+        return True
+
+    def tier(self, task: QueueTask) -> int:
+        """老化后的优先级：每等待满 aging_interval 秒提升一整级，最高到紧急
+
+        按整级提升，同一级内的任务由各策略自己的规则排序（提交时间只差
+        几秒的任务不会因老化而变成先来先服务）。持续涌入的高优先级任务
+        也无法让低优先级任务无限等待：等待 3 个间隔后升到最高一级。
+        等待时间按 clock 计算，aging_interval 为 0 时不老化。
+        """
+        if not self.aging_interval:
+            return task.priority.value
+        wait = max(0.0, self.clock - task.created_time)
+        return max(TaskPriority.URGENT.value, task.priority.value - int(wait // self.aging_interval))
+
+    def key(self, task: QueueTask) -> Tuple:
+        return (self.tier(task), task.created_time)
+
+    def on_dispatch(self, task: QueueTask) -> None:
+        """任务出队开始执行"""
+
+    def forget(self, task_id: str) -> None:
+        """任务不经执行离开等待队列（暂停、取消、移除）"""
+
+
+class ShortestJobPolicy(SchedulingPolicy):
+    """最短作业优先 - 按估算时长排序，混合批次的平均完成时间最短"""
+
+    name = 'sjf'
+    label = '最短作业优先'
+
+    def key(self, task: QueueTask) -> Tuple:
+        return (self.tier(task), task.estimated_duration, task.created_time)
+
+
+class FairSharePolicy(SchedulingPolicy):
+    """按大小分组的公平分享 - 小任务组与大任务组按权重分享执行时间
+
+    开始时间公平排队：任务入队时按所在组打上虚拟完成标记
+    max(V, 该组上一个标记) + 估算时长 / 权重，按标记出队，V 为最近出队
+    任务的开始标记。大包不会被源源不断的单集饿死，单集也不必全部排在
+    大包后面。
+    """
+
+    name = 'fair_share'
+    label = '按大小公平分享'
+    LARGE_TASK_BYTES = 10 * 1024 ** 3
+    WEIGHTS = {'small': 1.0, 'large': 1.0}
+
+    def __init__(self, model: ThroughputModel, aging_interval: float = 0.0):
+        super().__init__(model, aging_interval)
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._tags: Dict[str, Tuple[float, float]] = {}
+
+    def key(self, task: QueueTask) -> Tuple:
+        tag = self._tags.get(task.id)
+        if tag is None:
+            group = 'large' if task.file_size >= self.LARGE_TASK_BYTES else 'small'
+            start = max(self._virtual_time, self._last_finish.get(group, 0.0))
+            finish = start + task.estimated_duration / self.WEIGHTS[group]
+            self._last_finish[group] = finish
+            tag = self._tags[task.id] = (start, finish)
+        return (self.tier(task), tag[1], task.created_time)
+
+    def on_dispatch(self, task: QueueTask) -> None:
+        tag = self._tags.pop(task.id, None)
+        if tag is not None:
+            self._virtual_time = max(self._virtual_time, tag[0])
+
+    def forget(self, task_id: str) -> None:
+        self._tags.pop(task_id, None)
+
+
+class DeadlinePolicy(SchedulingPolicy):
+    """截止时间优先 - 按最晚开始时间（截止时间 - 估算时长）排序
+
+    没有截止时间的任务排在有截止时间的任务之后，彼此按最短作业优先。
+    """
+
+    name = 'deadline'
+    label = '截止时间优先'
+
+    def key(self, task: QueueTask) -> Tuple:
+        if task.deadline:
+            return (self.tier(task), 0, task.deadline - task.estimated_duration, task.created_time)
+        return (self.tier(task), 1, task.estimated_duration, task.created_time)
+
+
+SCHEDULING_POLICIES = {policy.name: policy for policy in
+                       (SchedulingPolicy, ShortestJobPolicy, FairSharePolicy, DeadlinePolicy)}
+
+
 class QueueManager:
     """队列管理器"""
     
-    def __init__(self, max_concurrent: int = 4, save_file: Optional[str] = None):
+    # 统计等待时间分位数时最多抽样的等待任务数
+    WAIT_SAMPLE_LIMIT = 5000
+    
+    def __init__(self, max_concurrent: int = 4, save_file: Optional[str] = None,
+                 policy: str = 'fifo', aging_interval: float = 0.0):
         self.max_concurrent = max_concurrent
+        self.aging_interval = aging_interval
         self.save_file = save_file or os.path.expanduser("~/.torrent_maker/queue.json")
+        self._size_cache = None
         
-        # 任务存储
+        # 任务存储：内存中只有未结束的任务和本次运行中结束的任务，
+        # 历史任务留在数据库里按需读取
+        self.store = QueueStore(self.save_file)
         self.tasks: Dict[str, QueueTask] = {}
-        self.priority_queue = PriorityQueue()
+        self._dirty: Set[str] = set()
+        self._batch_depth = 0
+        # 调度：吞吐量模型估算时长，策略决定同一优先级内的出队顺序
+        self.throughput = ThroughputModel()
+        self.policy = SCHEDULING_POLICIES.get(policy, SchedulingPolicy)(self.throughput, aging_interval)
+        # 最近出队任务的等待时长（秒）
+        self._dispatch_waits: deque = deque(maxlen=1000)
+        # 等待中的任务（按 ID 索引的堆，改优先级、删除、暂停均为 O(log n)）
+        self.priority_queue = IndexedTaskHeap(self.policy.key)
         self.running_tasks: Dict[str, QueueTask] = {}
         
         # 线程管理
@@ -457,7 +999,8 @@ class QueueManager:
         return logger
     
     def add_task(self, name: str, path: str, priority: TaskPriority = TaskPriority.NORMAL, 
-                 preset: str = "standard", output_path: str = "") -> str:
+                 preset: str = "standard", output_path: str = "",
+                 deadline: Optional[float] = None) -> str:
         """添加任务到队列"""
         with self._lock:
             task_id = str(uuid.uuid4())
@@ -479,15 +1022,17 @@ class QueueManager:
                 priority=priority,
                 preset=preset,
                 output_path=output_path,
-                file_size=file_size
+                file_size=file_size,
+                deadline=deadline
             )
+            task.estimated_duration = self.throughput.estimate(task)
             
             self.tasks[task_id] = task
-            self.priority_queue.put(task)
+            self.priority_queue.push(task)
             self.stats['total_tasks'] += 1
             
             self.logger.info(f"任务已添加: {name} (ID: {task_id})")
-            self._save_queue()
+            self._save_queue(task_id)
             
             # 如果队列正在运行，尝试启动新任务
             if self._running:
@@ -496,64 +1041,38 @@ class QueueManager:
             return task_id
     
     def _calculate_directory_size(self, path: str) -> int:
-        """计算目录大小"""
-        total_size = 0
+        """计算目录大小（共享磁盘缓存，重启后同一目录无需重新遍历）"""
+        if self._size_cache is None:
+            self._size_cache = DirectorySizeCache()
         try:
-            for dirpath, dirnames, filenames in os.walk(path):
-                for filename in filenames:
-                    file_path = os.path.join(dirpath, filename)
-                    try:
-                        total_size += os.path.getsize(file_path)
-                    except OSError:
-                        continue
+            return self._size_cache.get_directory_size(Path(path))
         except OSError:
-            pass
-        return total_size
+            return 0
     
     def remove_task(self, task_id: str) -> bool:
         """移除任务"""
         with self._lock:
-            if task_id not in self.tasks:
+            task = self._load_task(task_id)
+            if task is None:
                 return False
             
-            task = self.tasks[task_id]
-            
-            # 如果任务正在运行，先取消它
-            if task.status == TaskStatus.RUNNING:
+            # 如果任务正在运行（或原地挂起），先取消它
+            if task_id in self.running_tasks:
                 self.cancel_task(task_id)
             
             # 从任务字典中移除
             del self.tasks[task_id]
             
-            # 从运行任务中移除
+            # 从运行任务与等待队列中移除
             if task_id in self.running_tasks:
                 del self.running_tasks[task_id]
-            
-            # 重建优先级队列（移除已删除的任务）
-            self._rebuild_priority_queue()
+            self.priority_queue.remove(task_id)
+            self.policy.forget(task_id)
             
             self.logger.info(f"任务已移除: {task.name} (ID: {task_id})")
-            self._save_queue()
+            self._save_queue(task_id)
             return True
     
-    def _rebuild_priority_queue(self):
-        """重建优先级队列，移除已删除的任务"""
-        # 创建新的优先级队列
-        new_queue = queue.PriorityQueue()
-        
-        # 将现有队列中的有效任务重新加入
-        while not self.priority_queue.empty():
-            try:
-                task = self.priority_queue.get_nowait()
-                # 只有在tasks字典中存在的任务才重新加入队列
-                if task.id in self.tasks:
-                    new_queue.put(task)
-            except queue.Empty:
-                break
-        
-        # 替换旧队列
-        self.priority_queue = new_queue
-    
     def pause_task(self, task_id: str) -> bool:
         """暂停任务"""
         with self._lock:
@@ -563,17 +1082,22 @@ class QueueManager:
             task = self.tasks[task_id]
             
             if task.status == TaskStatus.RUNNING:
-                # 取消正在运行的任务
-                self._cancel_running_task(task_id)
+                # 原地挂起：保留执行槽位与已有进度，恢复时从中断处继续
                 task.status = TaskStatus.PAUSED
+                if not self._suspend_running_task(task_id):
+                    task.status = TaskStatus.RUNNING
+                    self.logger.warning(f"无法挂起正在运行的任务: {task.name} (ID: {task_id})")
+                    return False
                 self.logger.info(f"任务已暂停: {task.name} (ID: {task_id})")
             elif task.status == TaskStatus.WAITING:
                 task.status = TaskStatus.PAUSED
+                self.priority_queue.remove(task_id)
+                self.policy.forget(task_id)
                 self.logger.info(f"等待中的任务已暂停: {task.name} (ID: {task_id})")
             else:
                 return False
             
-            self._save_queue()
+            self._save_queue(task_id)
             return True
     
     def resume_task(self, task_id: str) -> bool:
@@ -584,16 +1108,23 @@ class QueueManager:
             
             task = self.tasks[task_id]
             
+            if task.status == TaskStatus.PAUSED and task_id in self.running_tasks:
+                task.status = TaskStatus.RUNNING
+                self._resume_running_task(task_id)
+                self.logger.info(f"任务已继续执行: {task.name} (ID: {task_id})")
+                self._save_queue(task_id)
+                return True
+            
             if task.status == TaskStatus.PAUSED:
                 task.status = TaskStatus.WAITING
-                self.priority_queue.put(task)
+                self.priority_queue.push(task)
                 self.logger.info(f"任务已恢复: {task.name} (ID: {task_id})")
                 
                 # 如果队列正在运行，尝试启动任务
                 if self._running:
                     self._try_start_next_task()
                 
-                self._save_queue()
+                self._save_queue(task_id)
                 return True
             
             return False
@@ -605,19 +1136,38 @@ class QueueManager:
                 return False
             
             task = self.tasks[task_id]
-            
-            if task.status == TaskStatus.RUNNING:
-                self._cancel_running_task(task_id)
+            was_running = task_id in self.running_tasks
             
             task.status = TaskStatus.CANCELLED
             task.end_time = time.time()
+            if was_running:
+                self._cancel_running_task(task_id)
+            self.priority_queue.remove(task_id)
+            self.policy.forget(task_id)
             
             self.logger.info(f"任务已取消: {task.name} (ID: {task_id})")
-            self._save_queue()
+            self._save_queue(task_id)
+            if was_running and self._running:
+                self._try_start_next_task()
             return True
     
+    def _suspend_running_task(self, task_id: str) -> bool:
+        """挂起正在运行的任务，返回是否成功
+
+        默认为协作式挂起：_execute_task 看到 PAUSED 状态后原地等待。
+        子类可以改为挂起实际执行的子进程。
+        """
+        return True
+    
+    def _resume_running_task(self, task_id: str) -> None:
+        """继续执行原地挂起的任务（协作式挂起只需恢复状态）"""
+    
     def _cancel_running_task(self, task_id: str) -> None:
-        """取消正在运行的任务"""
+        """取消正在运行的任务
+
+        只是放弃这次执行：它的完成回调会被忽略（见 _task_completed）。
+        协作式执行看到状态变化后自行退出；子类负责终止实际的子进程。
+        """
         if task_id in self.worker_threads:
             future = self.worker_threads[task_id]
             future.cancel()
@@ -629,11 +1179,10 @@ class QueueManager:
     def retry_task(self, task_id: str) -> bool:
         """重试失败的任务"""
         with self._lock:
-            if task_id not in self.tasks:
+            task = self._load_task(task_id)
+            if task is None:
                 return False
             
-            task = self.tasks[task_id]
-            
             if task.status != TaskStatus.FAILED:
                 return False
             
@@ -649,7 +1198,7 @@ class QueueManager:
             task.start_time = None
             task.end_time = None
             
-            self.priority_queue.put(task)
+            self.priority_queue.push(task)
             
             self.logger.info(f"任务重试: {task.name} (ID: {task_id}, 第{task.retry_count}次重试)")
             
@@ -657,7 +1206,7 @@ class QueueManager:
             if self._running:
                 self._try_start_next_task()
             
-            self._save_queue()
+            self._save_queue(task_id)
             return True
     
     def set_task_priority(self, task_id: str, priority: TaskPriority) -> bool:
@@ -673,29 +1222,13 @@ class QueueManager:
             
             task.priority = priority
             
-            # 如果任务在等待队列中，需要重新排序
-            if task.status == TaskStatus.WAITING:
-                # 重建优先级队列
-                self._rebuild_priority_queue()
+            # 等待中的任务在堆中就地调整位置
+            self.priority_queue.update(task)
             
             self.logger.info(f"任务优先级已更新: {task.name} (ID: {task_id}, 优先级: {priority.name})")
-            self._save_queue()
+            self._save_queue(task_id)
             return True
     
-    def _rebuild_priority_queue(self) -> None:
-        """重建优先级队列"""
-        # 清空当前队列
-        while not self.priority_queue.empty():
-            try:
-                self.priority_queue.get_nowait()
-            except:
-                break
-        
-        # 重新添加等待中的任务
-        for task in self.tasks.values():
-            if task.status == TaskStatus.WAITING:
-                self.priority_queue.put(task)
-    
     def start_queue(self) -> None:
         """启动队列处理"""
         with self._lock:
@@ -720,14 +1253,15 @@ class QueueManager:
             self._running = False
             
             # 取消所有正在运行的任务
-            for task_id in list(self.running_tasks.keys()):
+            stopped = list(self.running_tasks.keys())
+            for task_id in stopped:
                 self._cancel_running_task(task_id)
                 task = self.tasks[task_id]
                 task.status = TaskStatus.WAITING
-                self.priority_queue.put(task)
+                self.priority_queue.push(task)
             
             self.logger.info("队列处理已停止")
-            self._save_queue()
+            self._save_queue(*stopped)
     
     def pause_queue(self) -> None:
         """暂停队列处理"""
@@ -765,22 +1299,21 @@ class QueueManager:
         if len(self.running_tasks) >= self.max_concurrent:
             return False
         
-        if self.priority_queue.empty():
+        # 老化时钟推进后按新的等待时间重排
+        if self.policy.refresh(time.time()):
+            self.priority_queue.rebuild()
+
+        # 堆中只有等待中的任务；状态不符的防御性跳过
+        task = self.priority_queue.pop()
+        while task is not None and task.status != TaskStatus.WAITING:
+            task = self.priority_queue.pop()
+        if task is None:
             return False
         
-        try:
-            task = self.priority_queue.get_nowait()
-            
-            # 检查任务状态
-            if task.status != TaskStatus.WAITING:
-                return self._try_start_next_task()
-            
-            # 启动任务
-            self._start_task(task)
-            return True
-            
-        except:
-            return False
+        self.policy.on_dispatch(task)
+        self._dispatch_waits.append(time.time() - task.created_time)
+        self._start_task(task)
+        return True
     
     def _start_task(self, task: QueueTask) -> None:
         """启动单个任务"""
@@ -812,6 +1345,8 @@ class QueueManager:
         try:
             # 模拟任务执行
             for i in range(100):
+                while task.status == TaskStatus.PAUSED:
+                    time.sleep(0.1)
                 if task.status != TaskStatus.RUNNING:
                     return False
                 
@@ -837,6 +1372,9 @@ class QueueManager:
         with self._lock:
             if task_id not in self.tasks:
                 return
+            # 已被取消或停止的执行（任务可能已重新开始）不再处理
+            if self.worker_threads.get(task_id) is not future:
+                return
             
             task = self.tasks[task_id]
             task.end_time = time.time()
@@ -852,10 +1390,12 @@ class QueueManager:
             try:
                 success = future.result()
                 
-                if success and task.status == TaskStatus.RUNNING:
+                if success and task.status in (TaskStatus.RUNNING, TaskStatus.PAUSED):
                     task.status = TaskStatus.COMPLETED
                     task.progress = 1.0
                     self.stats['completed_tasks'] += 1
+                    if self.throughput.observe(task):
+                        self._reestimate_waiting()
                     
                     self.logger.info(f"任务完成: {task.name} (ID: {task_id})")
                     
@@ -899,30 +1439,78 @@ class QueueManager:
                     self.stats['total_processing_time'] / self.stats['completed_tasks']
                 )
             
-            self._save_queue()
+            self._save_queue(task_id)
             
             # 尝试启动下一个任务
             if self._running:
                 self._try_start_next_task()
     
+    def _reestimate_waiting(self) -> None:
+        """吞吐量模型明显变化后重新估算等待中任务的时长并重排"""
+        for task in self.priority_queue.tasks():
+            task.estimated_duration = self.throughput.estimate(task)
+        self.priority_queue.rebuild()
+    
+    def set_policy(self, name: str) -> bool:
+        """切换调度策略，等待中的任务按新策略重排"""
+        policy_class = SCHEDULING_POLICIES.get(name)
+        if policy_class is None:
+            return False
+        with self._lock:
+            self.policy = policy_class(self.throughput, self.aging_interval)
+            # 按提交顺序计算排序键（公平分享策略的虚拟标记依赖入队顺序）
+            for task in sorted(self.priority_queue.tasks(), key=lambda t: t.created_time):
+                self.policy.key(task)
+            self.priority_queue.rebuild(self.policy.key)
+            self.logger.info(f"调度策略: {policy_class.label}")
+            return True
+    
     def get_task(self, task_id: str) -> Optional[QueueTask]:
-        """获取任务信息"""
-        return self.tasks.get(task_id)
+        """获取任务信息（历史任务从数据库读取）"""
+        return self.tasks.get(task_id) or self.store.get(task_id)
+    
+    def _load_task(self, task_id: str) -> Optional[QueueTask]:
+        """取得任务以便修改：历史任务从数据库载入内存"""
+        task = self.tasks.get(task_id)
+        if task is None:
+            task = self.store.get(task_id)
+            if task is not None:
+                self.tasks[task_id] = task
+        return task
+    
+    def _history_tasks(self, statuses: Tuple[TaskStatus, ...]) -> Iterator[QueueTask]:
+        """数据库中尚未载入内存的已结束任务"""
+        for task in self.store.iter_tasks(statuses):
+            if task.id not in self.tasks:
+                yield task
     
     def get_all_tasks(self) -> List[QueueTask]:
         """获取所有任务"""
-        return list(self.tasks.values())
+        with self._lock:
+            tasks = list(self.tasks.values())
+            tasks.extend(self._history_tasks(QueueStore.FINISHED_STATUSES))
+            return tasks
     
     def get_tasks_by_status(self, status: TaskStatus) -> List[QueueTask]:
         """根据状态获取任务"""
-        return [task for task in self.tasks.values() if task.status == status]
+        with self._lock:
+            tasks = [task for task in self.tasks.values() if task.status == status]
+            if status in QueueStore.FINISHED_STATUSES:
+                tasks.extend(self._history_tasks((status,)))
+            return tasks
     
     def get_queue_status(self) -> Dict[str, Any]:
         """获取队列状态"""
         with self._lock:
+            # 已结束任务的数量由数据库统计（内存中结束的任务也已写入）
+            stored_counts = self.store.count_by_status() if not self._dirty else {}
             status_counts = {}
             for status in TaskStatus:
-                status_counts[status.value] = len(self.get_tasks_by_status(status))
+                if stored_counts and status in QueueStore.FINISHED_STATUSES:
+                    status_counts[status.value] = stored_counts.get(status.value, 0)
+                else:
+                    status_counts[status.value] = sum(1 for task in self.tasks.values()
+                                                      if task.status == status)
             
             return {
                 'running': self._running,
@@ -930,96 +1518,122 @@ class QueueManager:
                 'max_concurrent': self.max_concurrent,
                 'current_running': len(self.running_tasks),
                 'waiting_tasks': status_counts[TaskStatus.WAITING.value],
-                'total_tasks': len(self.tasks),
+                'total_tasks': sum(status_counts.values()),
                 'status_counts': status_counts,
-                'statistics': self.stats.copy()
+                'statistics': self.stats.copy(),
+                'scheduling_policy': self.policy.name,
+                'priority_aging': self.aging_interval,
+                'waiting_time': self._waiting_time_stats(),
+                'throughput': self.throughput.get_stats()
             }
     
+    @staticmethod
+    def _percentile(ordered: List[float], pct: float) -> float:
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+    
+    def _waiting_time_stats(self) -> Dict[str, float]:
+        """等待时间（秒）：等待中任务已等待时长的分位数与最大值（大队列按步长
+        抽样），以及最近出队任务等待时长的 p95"""
+        now = time.time()
+        tasks = self.priority_queue.tasks()
+        step = max(1, len(tasks) // self.WAIT_SAMPLE_LIMIT)
+        waits = sorted(now - task.created_time for task in tasks[::step])
+        return {
+            'p50': self._percentile(waits, 50),
+            'p95': self._percentile(waits, 95),
+            'max': max((now - task.created_time for task in tasks), default=0.0),
+            'dispatched_p95': self._percentile(sorted(self._dispatch_waits), 95)
+        }
+    
+    def _clear_tasks_with_status(self, status: TaskStatus) -> int:
+        """从内存和数据库中删除某一状态的全部任务"""
+        removed = [task_id for task_id, task in self.tasks.items() if task.status == status]
+        # 批量修改中尚未写入数据库的任务不在 delete_status 的计数里
+        pending = self._dirty.intersection(removed)
+        stored = self.store.delete_status(status)
+        for task_id in removed:
+            del self.tasks[task_id]
+        self._save_queue(*removed)
+        return stored + len(pending) if self.store.available else len(removed)
+    
     def clear_completed_tasks(self) -> int:
         """清理已完成的任务"""
         with self._lock:
-            completed_tasks = self.get_tasks_by_status(TaskStatus.COMPLETED)
-            count = len(completed_tasks)
-            
-            for task in completed_tasks:
-                del self.tasks[task.id]
-            
+            count = self._clear_tasks_with_status(TaskStatus.COMPLETED)
             self.logger.info(f"已清理 {count} 个已完成的任务")
-            self._save_queue()
             return count
     
     def clear_failed_tasks(self) -> int:
         """清理失败的任务"""
         with self._lock:
-            failed_tasks = self.get_tasks_by_status(TaskStatus.FAILED)
-            count = len(failed_tasks)
-            
-            for task in failed_tasks:
-                del self.tasks[task.id]
-            
+            count = self._clear_tasks_with_status(TaskStatus.FAILED)
             self.logger.info(f"已清理 {count} 个失败的任务")
-            self._save_queue()
             return count
     
-    def _save_queue(self) -> None:
-        """保存队列到文件"""
+    @contextmanager
+    def batch(self):
+        """批量修改队列：期间的变更在结束时一个事务提交"""
+        with self._lock:
+            self._batch_depth += 1
         try:
-            os.makedirs(os.path.dirname(self.save_file), exist_ok=True)
-            
-            queue_data = {
-                'tasks': {task_id: task.to_dict() for task_id, task in self.tasks.items()},
-                'stats': self.stats,
-                'settings': {
-                    'max_concurrent': self.max_concurrent,
-                    'running': self._running,
-                    'paused': self._paused
-                },
-                'save_time': time.time()
-            }
-            
-            with open(self.save_file, 'w', encoding='utf-8') as f:
-                json.dump(queue_data, f, ensure_ascii=False, indent=2)
-                
-        except Exception as e:
-            self.logger.error(f"保存队列失败: {e}")
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._save_queue()
+    
+    def _save_queue(self, *task_ids: str) -> None:
+        """保存队列：只写入变更的任务（已不在队列中的删除）以及统计与设置"""
+        with self._lock:
+            self._dirty.update(task_ids)
+            if self._batch_depth:
+                return
+            dirty, self._dirty = self._dirty, set()
+            self.store.write(
+                [self.tasks[task_id] for task_id in dirty if task_id in self.tasks],
+                [task_id for task_id in dirty if task_id not in self.tasks],
+                {
+                    'stats': self.stats,
+                    'throughput': self.throughput.to_dict(),
+                    'settings': {
+                        'max_concurrent': self.max_concurrent,
+                        'running': self._running,
+                        'paused': self._paused
+                    }
+                })
     
     def _load_queue(self) -> None:
-        """从文件加载队列"""
+        """从数据库加载未结束的任务（首次使用时自动迁移 JSON 队列文件）"""
         try:
-            if not os.path.exists(self.save_file):
-                return
-            
-            with open(self.save_file, 'r', encoding='utf-8') as f:
-                queue_data = json.load(f)
-            
-            # 恢复任务
-            tasks_data = queue_data.get('tasks', {})
-            for task_id, task_data in tasks_data.items():
-                try:
-                    task = QueueTask.from_dict(task_data)
-                    self.tasks[task_id] = task
-                    
-                    # 将等待中的任务重新加入队列
-                    if task.status == TaskStatus.WAITING:
-                        self.priority_queue.put(task)
-                    # 将运行中的任务重置为等待状态
-                    elif task.status == TaskStatus.RUNNING:
-                        task.status = TaskStatus.WAITING
-                        task.start_time = None
-                        task.progress = 0.0
-                        self.priority_queue.put(task)
-                        
-                except Exception as e:
-                    self.logger.error(f"恢复任务失败: {task_id} - {e}")
+            meta = self.store.load_meta()
+            self.throughput.rates.update(meta.get('throughput', {}))
+            reset = []
+            for task in self.store.iter_tasks((TaskStatus.WAITING, TaskStatus.RUNNING, TaskStatus.PAUSED)):
+                task.estimated_duration = self.throughput.estimate(task)
+                self.tasks[task.id] = task
+                # 将运行中的任务重置为等待状态
+                if task.status == TaskStatus.RUNNING:
+                    task.status = TaskStatus.WAITING
+                    task.start_time = None
+                    task.progress = 0.0
+                    reset.append(task.id)
+                # 将等待中的任务重新加入队列
+                if task.status == TaskStatus.WAITING:
+                    self.priority_queue.push(task)
             
             # 恢复统计信息
-            self.stats.update(queue_data.get('stats', {}))
+            self.stats.update(meta.get('stats', {}))
             
             # 恢复设置
-            settings = queue_data.get('settings', {})
+            settings = meta.get('settings', {})
             self.max_concurrent = settings.get('max_concurrent', self.max_concurrent)
             
-            self.logger.info(f"队列已恢复: {len(self.tasks)} 个任务")
+            if reset:
+                self._save_queue(*reset)
+            self.logger.info(f"队列已恢复: {len(self.tasks)} 个未完成的任务")
             
         except Exception as e:
             self.logger.error(f"加载队列失败: {e}")
@@ -1029,49 +1643,299 @@ class QueueManager:
         self.stop_queue()
         self.executor.shutdown(wait=True)
         self._save_queue()
+        self.store.close()
         self.logger.info("队列管理器已关闭")
 
 
+# 制种工作进程：每个任务带着不可变的配置快照在进程池中执行
+# 工作进程把进度等事件发回主进程的队列（由进程池 initializer 设置）
+_QUEUE_WORKER_EVENTS = None
+# 主进程维护的共享数组：当前被暂停的执行编号（空位为 0）
+_QUEUE_WORKER_PAUSED = None
+
+
+@dataclass(frozen=True)
+class CreationSnapshot:
+    """单个制种任务的配置快照 - 任务开始时从当前配置与任务预设生成，此后不可变
+
+    快照只读取配置，不像 ConfigManager.apply_preset 那样改写共享设置，
+    并发执行的任务之间互不影响。快照可以序列化，传给工作进程重建创建器。
+    """
+    tracker_links: Tuple[str, ...]
+    output_dir: str
+    piece_size: Union[str, int] = "auto"
+    private: bool = False
+    comment: Optional[str] = None
+    preset: str = "standard"
+
+    @staticmethod
+    def parse_piece_size(value: Any) -> Union[str, int]:
+        """预设中的 piece 大小（"256k"、"2m"、"auto" 或 KB 整数）转换为 TorrentCreator 的取值"""
+        if isinstance(value, int):
+            return value
+        text = str(value).strip().lower()
+        units = {'k': 1, 'm': 1024}
+        if text[-1:] in units and text[:-1].isdigit():
+            return int(text[:-1]) * units[text[-1]]
+        return int(text) if text.isdigit() else "auto"
+
+    @classmethod
+    def for_task(cls, task: QueueTask, creator) -> 'CreationSnapshot':
+        """根据创建器当前的设置和任务的预设、输出路径生成快照"""
+        config_manager = getattr(creator, 'config_manager', None)
+        piece_size = creator.piece_size
+        output_dir = task.output_path
+        if config_manager is not None:
+            preset_settings = config_manager.get_preset_info(task.preset).get('settings', {})
+            if 'piece_size' in preset_settings:
+                piece_size = cls.parse_piece_size(preset_settings['piece_size'])
+            output_dir = output_dir or config_manager.get_output_folder()
+        return cls(
+            tracker_links=tuple(creator.tracker_links),
+            output_dir=str(output_dir or creator.output_dir),
+            piece_size=piece_size,
+            private=creator.private,
+            comment=creator.comment,
+            preset=task.preset
+        )
+
+    def build_creator(self, base=None):
+        """按快照构造创建器；给定 base 时浅拷贝它（共享缓存），只替换快照中的字段"""
+        if base is None:
+            return TorrentCreator(list(self.tracker_links), self.output_dir, self.piece_size,
+                                  self.private, self.comment, max_workers=1)
+        creator = copy.copy(base)
+        creator.tracker_links = list(self.tracker_links)
+        creator.output_dir = Path(self.output_dir)
+        creator.piece_size = self.piece_size
+        creator.private = self.private
+        creator.comment = self.comment or base.comment
+        return creator
+
+
+def _init_queue_worker(events, paused_runs) -> None:
+    global _QUEUE_WORKER_EVENTS, _QUEUE_WORKER_PAUSED
+    _QUEUE_WORKER_EVENTS = events
+    _QUEUE_WORKER_PAUSED = paused_runs
+
+
+@lru_cache(maxsize=8)
+def _worker_creator(snapshot: CreationSnapshot):
+    """工作进程内按快照复用创建器（目录大小缓存等随之复用）"""
+    return snapshot.build_creator()
+
+
+def _run_queue_task(task_id: str, run_id: int, source_path: str,
+                    snapshot: CreationSnapshot) -> Optional[str]:
+    """在工作进程中执行一个制种任务，进度与 mktorrent 进程号经事件队列发回主进程"""
+    def report(kind):
+        def send(payload):
+            if _QUEUE_WORKER_EVENTS is not None:
+                _QUEUE_WORKER_EVENTS.put((kind, task_id, run_id, payload))
+        return send
+
+    def is_paused():
+        return _QUEUE_WORKER_PAUSED is not None and run_id in _QUEUE_WORKER_PAUSED[:]
+
+    return _worker_creator(snapshot).create_torrent(source_path, progress_callback=report('progress'),
+                                                    process_callback=report('process'),
+                                                    is_paused=is_paused)
+
+
 class TorrentQueueManager(QueueManager):
-    """Torrent制种队列管理器"""
-    
-    def __init__(self, torrent_creator, max_concurrent: int = 4, save_file: Optional[str] = None):
-        super().__init__(max_concurrent, save_file)
+    """Torrent制种队列管理器
+
+    每个任务开始时生成 CreationSnapshot，在工作进程池（spawn 启动，
+    大小与并发数相同）中按快照执行，一个任务崩溃不会拖垮主进程，
+    目录统计、校验等 Python 部分也能真正并行。use_processes 为 False
+    或进程池不可用时，在队列线程中按快照拷贝出的创建器执行。
+
+    任务持有自己的 mktorrent 子进程（独立进程组）：取消时终止它，
+    由创建器删除未写完的种子文件；暂停时用 SIGSTOP 原地挂起、
+    SIGCONT 继续，挂起期间不再占用磁盘 I/O。暂停状态同时告知创建器
+    （工作进程经共享数组读取），挂起的时间不计入制种超时。
+    """
+    
+    def __init__(self, torrent_creator, max_concurrent: int = 4, save_file: Optional[str] = None,
+                 policy: str = 'fifo', aging_interval: float = 0.0, use_processes: bool = True):
+        super().__init__(max_concurrent, save_file, policy, aging_interval)
         self.torrent_creator = torrent_creator
+        self.use_processes = use_processes
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._worker_events = None
+        self._paused_runs = None
+        self._event_thread: Optional[threading.Thread] = None
+        self._pool_lock = threading.Lock()
+        # 每次执行有自己的编号：任务 -> 当前执行，执行 -> mktorrent 进程号
+        # （子进程尚未启动时为 None）。停止后重新开始的任务不会与上一次
+        # 被放弃的执行混淆。
+        self._run_ids = itertools.count(1)
+        self._task_runs: Dict[str, int] = {}
+        self._run_processes: Dict[int, Optional[int]] = {}
+    
+    def _ensure_process_pool(self) -> ProcessPoolExecutor:
+        """启动（或在工作进程崩溃后重启）进程池与事件监听线程"""
+        with self._pool_lock:
+            if self._process_pool is None:
+                context = multiprocessing.get_context('spawn')
+                events = context.SimpleQueue()
+                # 每个工作进程同时只执行一次制种，留出余量给刚放弃、尚未结束的执行
+                paused_runs = context.Array('q', self.max_concurrent * 2)
+                self._process_pool = ProcessPoolExecutor(max_workers=self.max_concurrent,
+                                                         mp_context=context,
+                                                         initializer=_init_queue_worker,
+                                                         initargs=(events, paused_runs))
+                self._worker_events = events
+                self._paused_runs = paused_runs
+                self._event_thread = threading.Thread(target=self._drain_worker_events, args=(events,),
+                                                      name='queue-worker-events', daemon=True)
+                self._event_thread.start()
+            return self._process_pool
+    
+    def _shutdown_process_pool(self) -> None:
+        with self._pool_lock:
+            pool, events = self._process_pool, self._worker_events
+            self._process_pool = None
+            self._worker_events = None
+            self._paused_runs = None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+            events.put(None)
+    
+    def _drain_worker_events(self, events) -> None:
+        """把工作进程发来的事件转给对应任务，收到 None 时退出"""
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            kind, task_id, run_id, payload = event
+            if kind == 'process':
+                self._attach_process(task_id, run_id, payload)
+                continue
+            task = self.tasks.get(task_id)
+            if task is not None and kind == 'progress' and self._task_runs.get(task_id) == run_id:
+                self._update_task_progress(task, payload)
     
-    def _execute_task(self, task: QueueTask) -> bool:
-        """执行Torrent制种任务"""
+    @staticmethod
+    def _signal_process(pid: int, sig: int) -> bool:
+        """向 mktorrent 进程组发送信号（不支持进程组的平台只发给进程本身）"""
         try:
-            # 应用预设配置
-            if hasattr(self.torrent_creator, 'config_manager'):
-                config_manager = self.torrent_creator.config_manager
-                if hasattr(config_manager, 'apply_preset'):
-                    config_manager.apply_preset(task.preset)
-            
-            # 设置输出路径
-            output_path = task.output_path or self.torrent_creator.config_manager.get_output_folder()
-            
-            # 更新TorrentCreator的输出目录
-            from pathlib import Path
-            self.torrent_creator.output_dir = Path(output_path)
-            
-            # 执行制种
-            success = self.torrent_creator.create_torrent(
-                task.path,
+            if hasattr(os, 'killpg'):
+                os.killpg(pid, sig)
+            else:
+                os.kill(pid, sig)
+            return True
+        except (ProcessLookupError, PermissionError, OSError):
+            return False
+    
+    def _attach_process(self, task_id: str, run_id: int, pid: int) -> None:
+        """记录一次执行的 mktorrent 进程；启动前已被暂停或放弃的执行立即补发信号"""
+        with self._lock:
+            if run_id not in self._run_processes:
+                return  # 这次执行已经结束
+            self._run_processes[run_id] = pid
+            task = self.tasks.get(task_id)
+            if (self._task_runs.get(task_id) != run_id or task is None or
+                    task.status not in (TaskStatus.RUNNING, TaskStatus.PAUSED)):
+                self._terminate_process(pid)
+            elif task.status == TaskStatus.PAUSED:
+                self._signal_process(pid, signal.SIGSTOP)
+    
+    def _process_of(self, task_id: str) -> Optional[int]:
+        """任务当前这次执行的 mktorrent 进程号"""
+        return self._run_processes.get(self._task_runs.get(task_id))
+    
+    def _terminate_process(self, pid: int) -> None:
+        self._signal_process(pid, signal.SIGTERM)
+        if hasattr(signal, 'SIGCONT'):
+            # 已挂起的进程要先继续才能处理 SIGTERM
+            self._signal_process(pid, signal.SIGCONT)
+    
+    def _mark_paused(self, run_id: Optional[int], paused: bool) -> None:
+        """在共享数组中登记或清除暂停的执行，供工作进程内的创建器读取"""
+        paused_runs = self._paused_runs
+        if paused_runs is None or run_id is None:
+            return
+        with paused_runs.get_lock():
+            runs = paused_runs.get_obj()
+            current = runs[:]
+            if paused and run_id not in current and 0 in current:
+                runs[current.index(0)] = run_id
+            elif not paused and run_id in current:
+                runs[current.index(run_id)] = 0
+    
+    def _suspend_running_task(self, task_id: str) -> bool:
+        """用 SIGSTOP 挂起任务的 mktorrent；子进程尚未启动时在启动后补发"""
+        if not hasattr(signal, 'SIGSTOP'):
+            return False
+        self._mark_paused(self._task_runs.get(task_id), True)
+        pid = self._process_of(task_id)
+        return pid is None or self._signal_process(pid, signal.SIGSTOP)
+    
+    def _resume_running_task(self, task_id: str) -> None:
+        pid = self._process_of(task_id)
+        if pid is not None:
+            self._signal_process(pid, signal.SIGCONT)
+        self._mark_paused(self._task_runs.get(task_id), False)
+    
+    def _cancel_running_task(self, task_id: str) -> None:
+        """终止任务的 mktorrent（未写完的种子文件由创建器删除）"""
+        # 放弃当前执行；子进程尚未启动时，_attach_process 会在它启动后立即终止
+        pid = self._run_processes.get(self._task_runs.pop(task_id, None))
+        if pid is not None:
+            self._terminate_process(pid)
+        super()._cancel_running_task(task_id)
+    
+    def _execute_task(self, task: QueueTask) -> bool:
+        """执行Torrent制种任务"""
+        with self._lock:
+            run_id = next(self._run_ids)
+            self._task_runs[task.id] = run_id
+            self._run_processes[run_id] = None
+        try:
+            snapshot = CreationSnapshot.for_task(task, self.torrent_creator)
+            if self.use_processes:
+                try:
+                    future = self._ensure_process_pool().submit(_run_queue_task, task.id, run_id,
+                                                                    task.path, snapshot)
+                    return bool(future.result())
+                except BrokenProcessPool as e:
+                    # 工作进程异常退出：本任务失败，进程池下次使用时重建
+                    self._shutdown_process_pool()
+                    raise TorrentCreationError(f"制种工作进程异常退出: {e}")
+            
+            creator = snapshot.build_creator(self.torrent_creator)
+            success = creator.create_torrent(
+                task.path,
                 custom_name=None,  # 使用默认命名（基于文件夹名）
-                progress_callback=lambda p: self._update_task_progress(task, p)
+                progress_callback=lambda p: self._update_task_progress(task, p),
+                process_callback=lambda pid: self._attach_process(task.id, run_id, pid),
+                is_paused=lambda: task.status == TaskStatus.PAUSED
             )
             
-            return success
+            return bool(success)
             
         except Exception as e:
+            if (self._task_runs.get(task.id) != run_id or
+                    task.status not in (TaskStatus.RUNNING, TaskStatus.PAUSED)):
+                self.logger.info(f"制种已终止: {task.name}")
+                return False
             task.error_message = str(e)
             self.logger.error(f"制种任务执行失败: {task.name} - {e}")
             return False
-    
-    def _update_task_progress(self, task: QueueTask, progress: float) -> None:
-        """更新任务进度"""
-        task.progress = progress
+        finally:
+            with self._lock:
+                self._run_processes.pop(run_id, None)
+                self._mark_paused(run_id, False)
+                if self._task_runs.get(task.id) == run_id:
+                    del self._task_runs[task.id]
+    
+    def _update_task_progress(self, task: QueueTask, progress: Union[float, str]) -> None:
+        """更新任务进度（创建器报告的文字消息只记录日志）"""
+        if isinstance(progress, str):
+            self.logger.debug(f"{task.name}: {progress}")
+        else:
+            task.progress = progress
         
         # 调用进度更新回调
         if self.on_progress_update:
@@ -1082,10 +1946,10 @@ class TorrentQueueManager(QueueManager):
     
     def add_torrent_task(self, file_path: str, preset: str = "standard", 
                         priority: TaskPriority = TaskPriority.NORMAL,
-                        output_path: str = "") -> str:
+                        output_path: str = "", deadline: Optional[float] = None) -> str:
         """添加制种任务"""
         name = self._generate_smart_task_name(file_path)
-        return self.add_task(name, file_path, priority, preset, output_path)
+        return self.add_task(name, file_path, priority, preset, output_path, deadline)
     
     def _generate_smart_task_name(self, file_path: str) -> str:
         """生成智能任务名称"""
@@ -1132,12 +1996,18 @@ class TorrentQueueManager(QueueManager):
                        priority: TaskPriority = TaskPriority.NORMAL) -> List[str]:
         """批量添加制种任务"""
         task_ids = []
-        for file_path in file_paths:
-            task_id = self.add_torrent_task(file_path, preset, priority)
-            task_ids.append(task_id)
+        with self.batch():
+            for file_path in file_paths:
+                task_id = self.add_torrent_task(file_path, preset, priority)
+                task_ids.append(task_id)
         
         self.logger.info(f"批量添加了 {len(task_ids)} 个制种任务")
         return task_ids
+    
+    def shutdown(self) -> None:
+        """关闭队列管理器与制种工作进程"""
+        super().shutdown()
+        self._shutdown_process_pool()
 
 
 # ================== 路径补全模块 ==================
@@ -2139,58 +3009,1048 @@ class PerformanceMonitor:
         with self._lock:
             return self._stats.copy()
 
+    @staticmethod
+    def merge_stats(stats_list: List[Dict[str, Dict[str, float]]]) -> Dict[str, Dict[str, float]]:
+        """合并多个监控器的 get_all_stats() 结果（次数与总耗时相加，平均值重新计算）"""
+        merged: Dict[str, Dict[str, float]] = {}
+        for all_stats in stats_list:
+            for name, stats in all_stats.items():
+                if not stats:
+                    continue
+                target = merged.setdefault(name, {'count': 0, 'total': 0.0, 'average': 0.0,
+                                                  'max': 0.0, 'min': float('inf')})
+                target['count'] += stats['count']
+                target['total'] += stats['total']
+                target['max'] = max(target['max'], stats['max'])
+                target['min'] = min(target['min'], stats['min'])
+                target['average'] = target['total'] / target['count'] if target['count'] else 0.0
+        return merged
+
 
 # ================== 缓存系统 ==================
+from collections import OrderedDict
+
+
+def estimate_size(value: Any, depth: int = 3) -> int:
+    """估算对象占用的字节数（近似值，用于缓存预算）
+
+    容器递归估算到 depth 层，元素较多时按前 64 个元素抽样外推；
+    提供 memory_usage() 的对象（如 FolderTable）直接使用其统计。
+    """
+    if hasattr(value, 'memory_usage'):
+        try:
+            return int(value.memory_usage()['total_bytes'])
+        except (TypeError, KeyError):
+            pass
+    size = sys.getsizeof(value)
+    if depth <= 0 or isinstance(value, (str, bytes, int, float, bool, type(None))):
+        return size
+    if isinstance(value, dict):
+        items = list(value.items())
+        if not items:
+            return size
+        sample = items[:64]
+        sampled = sum(estimate_size(k, depth - 1) + estimate_size(v, depth - 1) for k, v in sample)
+        return size + sampled * len(items) // len(sample)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = value if isinstance(value, (list, tuple)) else list(value)
+        if not items:
+            return size
+        sample = items[:64]
+        sampled = sum(estimate_size(item, depth - 1) for item in sample)
+        return size + sampled * len(items) // len(sample)
+    return size
+
+
 class SearchCache:
-    """搜索结果缓存类"""
+    """搜索结果缓存类 - 有界 LRU + TTL，按命名空间分配字节预算
+
+    每个命名空间（如 normalize、similarity、results）一个
+    OrderedDict，读写均为 O(1)：命中时移到末尾，超出预算时从头部（最久
+    未使用）淘汰。条目大小由 estimate_size() 估算。内存吃紧时
+    MemoryManager 调用 shrink() 按比例收缩。命名空间可单独设置有效期，
+    None 表示不按时间过期（由调用方自行校验，如按索引代数失效的搜索结果）。
+    """
+
+    DEFAULT_NAMESPACE = 'default'
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
 
-    def __init__(self, cache_duration: int = 3600):
+    def __init__(self, cache_duration: int = 3600, max_bytes: int = DEFAULT_MAX_BYTES,
+                 namespace_budgets: Optional[Dict[str, int]] = None,
+                 namespace_ttls: Optional[Dict[str, Optional[float]]] = None):
         self.cache_duration = cache_duration
-        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self.max_bytes = max_bytes
+        # 未单独配置的命名空间共用 max_bytes / cache_duration
+        self.namespace_budgets = dict(namespace_budgets or {})
+        self.namespace_ttls = dict(namespace_ttls or {})
+        self._namespaces: Dict[str, OrderedDict] = {}  # 命名空间 -> key -> (时间戳, 字节数, 值)
+        self._bytes: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
         self._lock = threading.Lock()
 
-    def get(self, key: str) -> Optional[Any]:
+    def _namespace(self, namespace: str) -> OrderedDict:
+        entries = self._namespaces.get(namespace)
+        if entries is None:
+            entries = self._namespaces[namespace] = OrderedDict()
+            self._bytes[namespace] = 0
+            self._stats[namespace] = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+        return entries
+
+    def budget(self, namespace: str) -> int:
+        return self.namespace_budgets.get(namespace, self.max_bytes)
+
+    def ttl(self, namespace: str) -> Optional[float]:
+        return self.namespace_ttls.get(namespace, self.cache_duration)
+
+    def count(self, namespace: str = DEFAULT_NAMESPACE) -> int:
+        """命名空间中的条目数"""
         with self._lock:
-            if key in self._cache:
-                timestamp, value = self._cache[key]
-                if time.time() - timestamp < self.cache_duration:
-                    return value
-                else:
-                    del self._cache[key]
-            return None
+            entries = self._namespaces.get(namespace)
+            return len(entries) if entries is not None else 0
 
-    def set(self, key: str, value: Any) -> None:
+    def get(self, key: str, namespace: str = DEFAULT_NAMESPACE) -> Optional[Any]:
         with self._lock:
-            self._cache[key] = (time.time(), value)
+            entries = self._namespace(namespace)
+            stats = self._stats[namespace]
+            entry = entries.get(key)
+            if entry is None:
+                stats['misses'] += 1
+                return None
+            timestamp, size, value = entry
+            ttl = self.ttl(namespace)
+            if ttl is not None and time.time() - timestamp >= ttl:
+                del entries[key]
+                self._bytes[namespace] -= size
+                stats['expirations'] += 1
+                stats['misses'] += 1
+                return None
+            entries.move_to_end(key)
+            stats['hits'] += 1
+            return value
 
-    def clear(self) -> None:
+    def set(self, key: str, value: Any, namespace: str = DEFAULT_NAMESPACE) -> None:
+        size = estimate_size(key) + estimate_size(value)
         with self._lock:
-            self._cache.clear()
+            entries = self._namespace(namespace)
+            budget = self.budget(namespace)
+            old = entries.pop(key, None)
+            if old is not None:
+                self._bytes[namespace] -= old[1]
+            if size > budget:
+                # 单个条目超出整个预算时不缓存
+                return
+            entries[key] = (time.time(), size, value)
+            self._bytes[namespace] += size
+            self._evict(namespace, budget)
+
+    def _evict(self, namespace: str, budget: int) -> int:
+        """从最久未使用的一端淘汰，直到不超出预算（调用方持锁）"""
+        entries = self._namespaces[namespace]
+        evicted = 0
+        while self._bytes[namespace] > budget and entries:
+            _, (_, size, _) = entries.popitem(last=False)
+            self._bytes[namespace] -= size
+            evicted += 1
+        self._stats[namespace]['evictions'] += evicted
+        return evicted
+
+    def shrink(self, fraction: float = 0.5) -> int:
+        """内存压力下收缩：清除过期条目，再把每个命名空间压到当前占用的 fraction
+
+        Returns:
+            释放的估算字节数
+        """
+        freed = 0
+        with self._lock:
+            for namespace in self._namespaces:
+                before = self._bytes[namespace]
+                self._purge_expired(namespace)
+                self._evict(namespace, int(self._bytes[namespace] * fraction))
+                freed += before - self._bytes[namespace]
+        return freed
+
+    def _purge_expired(self, namespace: str) -> int:
+        entries = self._namespaces[namespace]
+        ttl = self.ttl(namespace)
+        if ttl is None:
+            return 0
+        deadline = time.time() - ttl
+        expired = [key for key, (timestamp, _, _) in entries.items() if timestamp <= deadline]
+        for key in expired:
+            self._bytes[namespace] -= entries.pop(key)[1]
+        self._stats[namespace]['expirations'] += len(expired)
+        return len(expired)
+
+    def cleanup_expired(self) -> int:
+        """清理过期条目"""
+        with self._lock:
+            return sum(self._purge_expired(namespace) for namespace in self._namespaces)
+
+    def clear(self, namespace: Optional[str] = None) -> int:
+        """清空缓存（或指定命名空间），返回清除的条目数"""
+        with self._lock:
+            namespaces = [namespace] if namespace is not None else list(self._namespaces)
+            cleared = 0
+            for name in namespaces:
+                if name in self._namespaces:
+                    cleared += len(self._namespaces[name])
+                    self._namespaces[name].clear()
+                    self._bytes[name] = 0
+            return cleared
 
     def get_stats(self) -> Dict[str, Any]:
         with self._lock:
-            total_items = len(self._cache)
             current_time = time.time()
-            expired_items = sum(1 for timestamp, _ in self._cache.values()
-                              if current_time - timestamp >= self.cache_duration)
+            total_items = 0
+            expired_items = 0
+            namespaces = {}
+            for namespace, entries in self._namespaces.items():
+                stats = self._stats[namespace]
+                requests = stats['hits'] + stats['misses']
+                total_items += len(entries)
+                ttl = self.ttl(namespace)
+                if ttl is not None:
+                    expired_items += sum(1 for timestamp, _, _ in entries.values()
+                                         if current_time - timestamp >= ttl)
+                namespaces[namespace] = {
+                    **stats,
+                    'items': len(entries),
+                    'bytes': self._bytes[namespace],
+                    'budget_bytes': self.budget(namespace),
+                    'hit_rate': stats['hits'] / requests if requests else 0.0
+                }
             return {
                 'total_items': total_items,
                 'valid_items': total_items - expired_items,
-                'expired_items': expired_items
+                'expired_items': expired_items,
+                'total_bytes': sum(self._bytes.values()),
+                'namespaces': namespaces
+            }
+
+    @staticmethod
+    def merge_stats(stats_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """合并多个缓存的 get_stats() 结果（计数与字节数相加，命中率重新计算）"""
+        stats_list = [stats for stats in stats_list if stats]
+        if not stats_list:
+            return {}
+        merged = {key: sum(stats[key] for stats in stats_list)
+                  for key in ('total_items', 'valid_items', 'expired_items', 'total_bytes')}
+        namespaces: Dict[str, Dict[str, Any]] = {}
+        for stats in stats_list:
+            for namespace, ns_stats in stats['namespaces'].items():
+                target = namespaces.setdefault(namespace, dict.fromkeys(ns_stats, 0))
+                for key, value in ns_stats.items():
+                    target[key] += value
+        for ns_stats in namespaces.values():
+            requests = ns_stats['hits'] + ns_stats['misses']
+            ns_stats['hit_rate'] = ns_stats['hits'] / requests if requests else 0.0
+        merged['namespaces'] = namespaces
+        return merged
+
+
+# ================== 扫描排除规则 ==================
+class ScanIgnoreRules:
+    """扫描排除规则 - 在进入目录之前剪枝
+
+    支持两类规则，全部编译进同一个正则，每个条目只匹配一次：
+    - gitignore 风格的通配符：``*``、``?``、``**``、``[...]``；以 ``/`` 结尾只匹配目录，
+      以 ``/`` 开头或中间含 ``/`` 时相对扫描根目录锚定，否则匹配任意层级的名称；
+      以 ``!`` 开头表示重新包含
+    - 正则表达式：对相对扫描根目录的 POSIX 路径做 search，目录路径末尾带 ``/``
+
+    规则只作用于文件夹搜索扫描，被剪枝的目录不会被读取，因此只统计条目数。
+    目录大小与文件数统计不剪枝：制种会包含目录下的全部文件。
+    """
+
+    DEFAULT_PATTERNS = [
+        '.recycle/', '#recycle/', '@Recycle/', '$RECYCLE.BIN/', '.Trash-*/', '.Trashes/',
+        '@eaDir/', '.@__thumb/', '.AppleDouble/', '.Spotlight-V100/', '.fseventsd/',
+        'System Volume Information/', 'lost+found/',
+        '.DS_Store', '._*', 'Thumbs.db', 'desktop.ini'
+    ]
+
+    DEFAULT_REGEXES = [
+        r'(?i)(^|/)samples?/$'
+    ]
+
+    def __init__(self, patterns: Optional[List[str]] = None,
+                 regexes: Optional[List[str]] = None):
+        self.patterns = list(self.DEFAULT_PATTERNS if patterns is None else patterns)
+        self.regexes = list(self.DEFAULT_REGEXES if regexes is None else regexes)
+        self.errors: List[str] = []
+        self._ignore, self._include = self._compile()
+        self._lock = threading.Lock()
+        self._stats = {'pruned_dirs': 0, 'pruned_files': 0}
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> 'ScanIgnoreRules':
+        """从配置字典创建规则"""
+        patterns = settings.get('scan_ignore_patterns')
+        regexes = settings.get('scan_ignore_regexes')
+        return cls(patterns if isinstance(patterns, list) else None,
+                   regexes if isinstance(regexes, list) else None)
+
+    @staticmethod
+    def _glob_to_regex(pattern: str) -> str:
+        """将 gitignore 风格通配符转换为正则"""
+        dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+
+        parts = []
+        i = 0
+        while i < len(pattern):
+            char = pattern[i]
+            if pattern.startswith('**/', i):
+                parts.append('(?:.*/)?')
+                i += 3
+                continue
+            if pattern.startswith('**', i):
+                parts.append('.*')
+                i += 2
+                continue
+            if char == '*':
+                parts.append('[^/]*')
+            elif char == '?':
+                parts.append('[^/]')
+            elif char == '[':
+                end = pattern.find(']', i + 1)
+                if end == -1:
+                    parts.append(re.escape(char))
+                else:
+                    body = pattern[i + 1:end]
+                    if body.startswith('!'):
+                        body = '^' + body[1:]
+                    parts.append('[' + body.replace('\\', '\\\\') + ']')
+                    i = end
+            else:
+                parts.append(re.escape(char))
+            i += 1
+
+        prefix = '^' if anchored else '(?:^|/)'
+        suffix = '/$' if dir_only else '/?$'
+        return prefix + ''.join(parts) + suffix
+
+    @staticmethod
+    def _scope_inline_flags(regex: str) -> str:
+        """把开头的全局内联标志 (?i) 改写为局部形式 (?i:...)，才能与其他规则合并"""
+        match = re.match(r'^\(\?([aiLmsux]+)\)', regex)
+        if match:
+            return f'(?{match.group(1)}:{regex[match.end():]})'
+        return regex
+
+    def _compile(self) -> Tuple[Optional['re.Pattern'], Optional['re.Pattern']]:
+        ignore_parts = []
+        include_parts = []
+
+        for pattern in self.patterns:
+            if not isinstance(pattern, str):
+                continue
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            target = ignore_parts
+            if pattern.startswith('!'):
+                target = include_parts
+                pattern = pattern[1:]
+            target.append(self._glob_to_regex(pattern))
+
+        for regex in self.regexes:
+            if not isinstance(regex, str) or not regex:
+                continue
+            regex = self._scope_inline_flags(regex)
+            try:
+                re.compile(regex)
+            except re.error as e:
+                self.errors.append(f"无效的排除正则 {regex!r}: {e}")
+                continue
+            ignore_parts.append(regex)
+
+        def combine(parts: List[str]) -> Optional['re.Pattern']:
+            if not parts:
+                return None
+            return re.compile('|'.join(f'(?:{part})' for part in parts))
+
+        return combine(ignore_parts), combine(include_parts)
+
+    @property
+    def enabled(self) -> bool:
+        return self._ignore is not None
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """判断相对扫描根目录的路径是否被排除"""
+        if self._ignore is None:
+            return False
+        if os.sep != '/':
+            rel_path = rel_path.replace(os.sep, '/')
+        if is_dir:
+            rel_path += '/'
+        if self._ignore.search(rel_path) is None:
+            return False
+        return self._include is None or self._include.search(rel_path) is None
+
+    @staticmethod
+    def relative_path(path: str, root: str) -> str:
+        """条目相对扫描根目录的路径"""
+        root = root.rstrip(os.sep)
+        if root and path.startswith(root + os.sep):
+            return path[len(root) + 1:]
+        if not root and path.startswith(os.sep):
+            return path.lstrip(os.sep)
+        return os.path.basename(path)
+
+    def should_prune(self, entry: os.DirEntry, root: str, is_dir: bool) -> bool:
+        """判断扫描到的条目是否应剪枝，剪枝时记录统计"""
+        if self._ignore is None:
+            return False
+        if not self.is_ignored(self.relative_path(entry.path, root), is_dir):
+            return False
+        self.record_pruned(is_dir)
+        return True
+
+    def record_pruned(self, is_dir: bool) -> None:
+        with self._lock:
+            if is_dir:
+                self._stats['pruned_dirs'] += 1
+            else:
+                self._stats['pruned_files'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取剪枝统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['pruned_entries'] = stats['pruned_dirs'] + stats['pruned_files']
+        stats['rule_count'] = len(self.patterns) + len(self.regexes)
+        stats['errors'] = list(self.errors)
+        return stats
+
+    def adopt_stats(self, other: 'ScanIgnoreRules') -> None:
+        """重新加载规则时沿用旧规则的累计统计"""
+        with other._lock:
+            snapshot = dict(other._stats)
+        with self._lock:
+            self._stats = snapshot
+
+
+_SCAN_IGNORE_RULES: Optional[ScanIgnoreRules] = None
+_SCAN_IGNORE_MTIME: Optional[float] = None
+_SCAN_IGNORE_LOCK = threading.Lock()
+
+
+def get_scan_ignore_rules() -> ScanIgnoreRules:
+    """获取当前生效的排除规则（settings.json 修改后自动重新编译）"""
+    global _SCAN_IGNORE_RULES, _SCAN_IGNORE_MTIME
+
+    settings_path = os.path.join(os.path.expanduser("~/.torrent_maker"), "settings.json")
+    try:
+        mtime = os.path.getmtime(settings_path)
+    except OSError:
+        mtime = None
+
+    with _SCAN_IGNORE_LOCK:
+        if _SCAN_IGNORE_RULES is not None and mtime == _SCAN_IGNORE_MTIME:
+            return _SCAN_IGNORE_RULES
+
+        settings = {}
+        if mtime is not None:
+            try:
+                with open(settings_path, 'r', encoding='utf-8') as f:
+                    settings = json.load(f)
+            except (OSError, ValueError):
+                settings = {}
+
+        rules = ScanIgnoreRules.from_settings(settings if isinstance(settings, dict) else {})
+        if _SCAN_IGNORE_RULES is not None:
+            rules.adopt_stats(_SCAN_IGNORE_RULES)
+        for error in rules.errors:
+            logger.warning(error)
+        _SCAN_IGNORE_RULES = rules
+        _SCAN_IGNORE_MTIME = mtime
+        return rules
+
+
+# ================== 网络文件系统感知扫描 ==================
+class MountInfo:
+    """挂载点信息"""
+
+    __slots__ = ('mount_point', 'fs_type', 'device', 'is_network')
+
+    def __init__(self, mount_point: str, fs_type: str, device: str = "", is_network: bool = False):
+        self.mount_point = mount_point
+        self.fs_type = fs_type
+        self.device = device
+        self.is_network = is_network
+
+
+class MountDetector:
+    """挂载点检测 - 识别 NFS/SMB 等网络文件系统"""
+
+    NETWORK_FS_TYPES = {
+        'nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'smb2', 'afpfs', 'webdav', 'davfs',
+        'fuse.sshfs', 'sshfs', 'fuse.rclone', '9p', 'ceph', 'glusterfs',
+        'fuse.glusterfs', 'lustre', 'beegfs', 'gpfs', 'afs', 'ncpfs'
+    }
+
+    def __init__(self, refresh_interval: float = 60.0):
+        self.refresh_interval = refresh_interval
+        self._mounts: List[MountInfo] = []
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _read_mounts(self) -> List[MountInfo]:
+        mounts = []
+        try:
+            if os.path.exists('/proc/self/mounts'):
+                with open('/proc/self/mounts', 'r', encoding='utf-8', errors='replace') as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) >= 3:
+                            # /proc/mounts 中空格等字符以八进制转义
+                            mount_point = parts[1].replace('\\040', ' ').replace('\\011', '\t')
+                            mounts.append(self._make_info(mount_point, parts[2], parts[0]))
+            else:
+                # macOS / BSD: "//user@host/share on /Volumes/x (smbfs, nodev, ...)"
+                output = subprocess.run(['mount'], capture_output=True, text=True, timeout=5).stdout
+                for line in output.splitlines():
+                    match = re.match(r'^(.*?) on (.*?) \(([^,)]+)', line)
+                    if match:
+                        device, mount_point, fs_type = match.groups()
+                        mounts.append(self._make_info(mount_point, fs_type.strip(), device))
+        except (OSError, subprocess.SubprocessError):
+            pass
+
+        # 最长挂载点优先匹配
+        mounts.sort(key=lambda m: len(m.mount_point), reverse=True)
+        return mounts
+
+    def _make_info(self, mount_point: str, fs_type: str, device: str) -> MountInfo:
+        fs_type = fs_type.lower()
+        is_network = (fs_type in self.NETWORK_FS_TYPES or
+                      fs_type.split('.')[-1] in self.NETWORK_FS_TYPES or
+                      device.startswith('//'))
+        return MountInfo(mount_point, fs_type, device, is_network)
+
+    def get_mount(self, path: Union[str, Path]) -> MountInfo:
+        """获取路径所在的挂载点"""
+        with self._lock:
+            if time.time() - self._loaded_at > self.refresh_interval:
+                self._mounts = self._read_mounts()
+                self._loaded_at = time.time()
+            mounts = self._mounts
+
+        try:
+            real_path = os.path.realpath(str(path))
+        except (OSError, ValueError):
+            real_path = str(path)
+
+        for mount in mounts:
+            mount_point = mount.mount_point.rstrip(os.sep) or os.sep
+            if (real_path == mount_point or mount_point == os.sep or
+                    real_path.startswith(mount_point + os.sep)):
+                return mount
+        return MountInfo(os.sep, 'unknown')
+
+
+class MountLatencyStats:
+    """单个挂载点的元数据调用延迟统计"""
+
+    def __init__(self, sample_size: int = 256):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.ewma = 0.0
+        self._samples: deque = deque(maxlen=sample_size)
+
+    def record(self, latency: float) -> None:
+        self.count += 1
+        self.total += latency
+        self.min = min(self.min, latency)
+        self.max = max(self.max, latency)
+        self.ewma = latency if self.count == 1 else self.ewma * 0.8 + latency * 0.2
+        self._samples.append(latency)
+
+    def percentile(self, pct: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            'calls': self.count,
+            'average_ms': (self.total / self.count * 1000) if self.count else 0.0,
+            'ewma_ms': self.ewma * 1000,
+            'min_ms': (self.min * 1000) if self.count else 0.0,
+            'max_ms': self.max * 1000,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000
+        }
+
+
+class AIMDConcurrencyController:
+    """AIMD 并发控制器 - 根据观测到的单次调用延迟调整并发数
+
+    网络挂载上单次 stat/scandir 主要耗在往返延迟上，提高并发可以
+    掩盖延迟：延迟接近基线时加性增加并发；延迟相对基线明显上升
+    （服务端开始拥塞）时乘性减少。
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 increase_tolerance: float = 2.0, decrease_threshold: float = 4.0,
+                 adjust_every: int = 16):
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase_tolerance = increase_tolerance
+        self.decrease_threshold = decrease_threshold
+        self.adjust_every = adjust_every
+        self.baseline: Optional[float] = None
+        self._ewma: Optional[float] = None
+        self._samples_since_adjust = 0
+        self.increases = 0
+        self.decreases = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        """记录一次调用延迟"""
+        with self._lock:
+            self._ewma = latency if self._ewma is None else self._ewma * 0.8 + latency * 0.2
+            self._samples_since_adjust += 1
+            if self._samples_since_adjust < self.adjust_every:
+                return
+            self._samples_since_adjust = 0
+
+            if self.baseline is None or self._ewma < self.baseline:
+                self.baseline = self._ewma
+            # 基线缓慢上浮，避免一次异常低值长期压制并发
+            self.baseline = self.baseline * 0.99 + self._ewma * 0.01
+
+            if self._ewma > self.baseline * self.decrease_threshold:
+                self.limit = max(self.min_limit, self.limit // 2)
+                self.decreases += 1
+            elif self._ewma <= self.baseline * self.increase_tolerance and self.limit < self.max_limit:
+                self.limit += 1
+                self.increases += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'baseline_ms': (self.baseline or 0.0) * 1000,
+                'increases': self.increases,
+                'decreases': self.decreases
             }
 
 
+class ScanIOMonitor:
+    """按挂载点记录扫描延迟并提供并发控制器
+
+    本地磁盘使用固定的小并发；网络挂载使用 AIMD 控制器自动调整。
+    每个挂载点一个遍历线程池，所有遍历器共用，不随每次遍历创建和销毁线程。
+    """
+
+    def __init__(self, local_workers: int = 4, network_max_workers: int = 32):
+        self.local_workers = local_workers
+        self.network_max_workers = network_max_workers
+        self.detector = MountDetector()
+        self._stats: Dict[str, MountLatencyStats] = {}
+        self._controllers: Dict[str, AIMDConcurrencyController] = {}
+        self._mounts: Dict[str, MountInfo] = {}
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+    def mount_for(self, path: Union[str, Path]) -> MountInfo:
+        mount = self.detector.get_mount(path)
+        with self._lock:
+            if mount.mount_point not in self._mounts:
+                self._mounts[mount.mount_point] = mount
+                self._stats[mount.mount_point] = MountLatencyStats()
+                if mount.is_network:
+                    self._controllers[mount.mount_point] = AIMDConcurrencyController(
+                        initial=4, max_limit=self.network_max_workers)
+        return mount
+
+    def concurrency_for(self, mount: MountInfo) -> int:
+        """当前建议的并发数"""
+        controller = self._controllers.get(mount.mount_point)
+        return controller.limit if controller else self.local_workers
+
+    def max_workers_for(self, mount: MountInfo) -> int:
+        return self.network_max_workers if mount.is_network else self.local_workers
+
+    def executor_for(self, mount: MountInfo) -> ThreadPoolExecutor:
+        """挂载点共用的遍历线程池（首次使用时创建）"""
+        with self._lock:
+            executor = self._executors.get(mount.mount_point)
+            if executor is None:
+                executor = self._executors[mount.mount_point] = ThreadPoolExecutor(
+                    max_workers=self.max_workers_for(mount), thread_name_prefix='scan-walk')
+            return executor
+
+    def record(self, mount: MountInfo, latency: float) -> None:
+        stats = self._stats.get(mount.mount_point)
+        if stats is not None:
+            with self._lock:
+                stats.record(latency)
+        controller = self._controllers.get(mount.mount_point)
+        if controller is not None:
+            controller.record(latency)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取每个挂载点的延迟统计"""
+        with self._lock:
+            result = {}
+            for mount_point, mount in self._mounts.items():
+                entry = {
+                    'fs_type': mount.fs_type,
+                    'is_network': mount.is_network,
+                    **self._stats[mount_point].to_dict()
+                }
+                controller = self._controllers.get(mount_point)
+                entry['concurrency'] = controller.to_dict() if controller else {'limit': self.local_workers}
+                result[mount_point] = entry
+            return result
+
+
+# 进程内共享的扫描 I/O 监控器，所有扫描器共用同一份挂载点统计
+SCAN_IO_MONITOR = ScanIOMonitor()
+
+
+class AdaptiveDirectoryWalker:
+    """自适应并发目录遍历器
+
+    - 利用 scandir 的 d_type（DirEntry.is_dir/is_file 且 follow_symlinks=False）
+      判断条目类型，不额外 stat；只有需要文件大小时才 stat
+    - 每次 scandir/stat 计时并记录到所在挂载点
+    - 工作线程数随挂载点的建议并发数动态调整，线程取自挂载点共用的线程池
+    - 文件夹扫描时命中排除规则的条目在进入前剪枝；大小统计（measure）不剪枝
+    """
+
+    def __init__(self, monitor: Optional[ScanIOMonitor] = None,
+                 ignore_rules: Optional[ScanIgnoreRules] = None):
+        self.monitor = monitor or SCAN_IO_MONITOR
+        self.ignore_rules = ignore_rules
+
+    def list_dir(self, path: Union[str, Path], mount: Optional[MountInfo] = None) -> List[os.DirEntry]:
+        """计时的目录读取"""
+        mount = mount or self.monitor.mount_for(path)
+        start = time.perf_counter()
+        try:
+            with os.scandir(path) as entries:
+                return list(entries)
+        finally:
+            self.monitor.record(mount, time.perf_counter() - start)
+
+    def stat_entry(self, entry: os.DirEntry, mount: MountInfo) -> Optional[os.stat_result]:
+        """计时的条目 stat"""
+        start = time.perf_counter()
+        try:
+            return entry.stat(follow_symlinks=False)
+        except OSError:
+            return None
+        finally:
+            self.monitor.record(mount, time.perf_counter() - start)
+
+    def walk(self, root: Union[str, Path], visitor, max_depth: Optional[int] = None,
+             cancel_token: Optional['ScanCancelToken'] = None,
+             prune: bool = True) -> None:
+        """并发遍历目录树
+
+        Args:
+            root: 根目录
+            visitor: visitor(entry, depth, mount) -> bool，在工作线程中调用，
+                     需线程安全；对目录返回 True 表示继续深入
+            max_depth: 最大深度（根目录的直接子项深度为 0）
+            cancel_token: 取消令牌
+            prune: 是否按排除规则剪枝（大小统计需要全部文件，传 False）
+        """
+        mount = self.monitor.mount_for(root)
+        rules = (self.ignore_rules or get_scan_ignore_rules()) if prune else None
+        root_str = str(root)
+        max_workers = self.monitor.max_workers_for(mount)
+        pending: deque = deque([(str(root), 0)])
+        condition = threading.Condition()
+        state = {'active': 0}
+
+        def process(dir_path: str, depth: int) -> None:
+            try:
+                entries = self.list_dir(dir_path, mount)
+            except OSError:
+                return
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if rules is not None and rules.should_prune(entry, root_str, is_dir):
+                    continue
+                if visitor(entry, depth, mount):
+                    if is_dir and (max_depth is None or depth + 1 <= max_depth):
+                        with condition:
+                            pending.append((entry.path, depth + 1))
+                            condition.notify()
+
+        def worker() -> None:
+            while True:
+                with condition:
+                    while True:
+                        if cancel_token and cancel_token.cancelled:
+                            condition.notify_all()
+                            return
+                        limit = self.monitor.concurrency_for(mount)
+                        if pending and state['active'] < limit:
+                            dir_path, depth = pending.popleft()
+                            state['active'] += 1
+                            break
+                        if not pending and state['active'] == 0:
+                            condition.notify_all()
+                            return
+                        condition.wait(0.05)
+                try:
+                    process(dir_path, depth)
+                finally:
+                    with condition:
+                        state['active'] -= 1
+                        condition.notify_all()
+
+        if max_workers <= 1:
+            worker()
+            return
+
+        # 调用线程也参与遍历：线程池被其他遍历占满时本次遍历仍能完成，
+        # 结束时尚未开始的工作项直接取消
+        futures = [self.monitor.executor_for(mount).submit(worker) for _ in range(max_workers - 1)]
+        try:
+            worker()
+        finally:
+            for future in futures:
+                future.cancel()
+        for future in futures:
+            if not future.cancelled():
+                future.result()
+
+    def measure(self, root: Union[str, Path],
+                cancel_token: Optional['ScanCancelToken'] = None,
+                on_file: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+        """统计目录下的文件数和总大小（不按排除规则剪枝），on_file 依次收到每个文件名"""
+        totals = {'files': 0, 'dirs': 0, 'size': 0}
+        lock = threading.Lock()
+
+        def visitor(entry: os.DirEntry, depth: int, mount: MountInfo) -> bool:
+            _ = depth
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    with lock:
+                        totals['dirs'] += 1
+                    return True
+                if not entry.is_file(follow_symlinks=False):
+                    return False
+            except OSError:
+                return False
+            stat_info = self.stat_entry(entry, mount)
+            with lock:
+                totals['files'] += 1
+                if stat_info is not None:
+                    totals['size'] += stat_info.st_size
+                if on_file is not None:
+                    on_file(entry.name)
+            return False
+
+        self.walk(root, visitor, cancel_token=cancel_token, prune=False)
+        return totals
+
+
 # ================== 目录大小缓存 ==================
+class PersistentDirectoryStore:
+    """目录统计的磁盘存储 - 进程重启后缓存依然有效
+
+    CLI 与 Web 共用 ``~/.torrent_maker/directory_cache.db``（SQLite WAL 模式，
+    多进程可同时读写）。条目按需逐条读取，不在启动时整体加载；
+    命中时用目录 mtime 加直接子项数量校验，任一不符即视为过期。签名只看
+    顶层目录，子目录里的变化察觉不到，所以调用方按自己的缓存时长
+    （cache_duration）限制复用期限；max_age 只决定条目最多保留多久。
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_age: float = 7 * 86400,
+                 max_entries: int = 50000):
+        self.db_path = db_path or os.path.expanduser("~/.torrent_maker/directory_cache.db")
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disabled = False
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'writes': 0}
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """首次使用时才打开数据库"""
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS directory_cache (
+                    kind TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    mtime REAL NOT NULL,
+                    child_count INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (kind, path)
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"目录缓存数据库不可用，仅使用内存缓存: {e}")
+            self._disabled = True
+        return self._conn
+
+    @staticmethod
+    def signature(path: Union[str, Path]) -> Optional[Tuple[float, int]]:
+        """目录校验签名：(mtime, 直接子项数量)"""
+        try:
+            mtime = os.stat(path).st_mtime
+            with os.scandir(path) as entries:
+                child_count = sum(1 for _ in entries)
+            return mtime, child_count
+        except OSError:
+            return None
+
+    def get(self, kind: str, path: str, signature: Tuple[float, int],
+            max_age: Optional[float] = None) -> Optional[Any]:
+        """读取条目，签名不符或超过 max_age（默认为最长保存时间）时删除并返回 None"""
+        max_age = self.max_age if max_age is None else min(max_age, self.max_age)
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT mtime, child_count, updated_at, payload FROM directory_cache "
+                    "WHERE kind = ? AND path = ?", (kind, path)).fetchone()
+                if row is None:
+                    self._stats['misses'] += 1
+                    return None
+
+                mtime, child_count, updated_at, payload = row
+                if (abs(mtime - signature[0]) >= 1.0 or child_count != signature[1] or
+                        time.time() - updated_at > max_age):
+                    conn.execute("DELETE FROM directory_cache WHERE kind = ? AND path = ?", (kind, path))
+                    conn.commit()
+                    self._stats['stale'] += 1
+                    return None
+
+                self._stats['hits'] += 1
+                return json.loads(payload)
+            except (sqlite3.Error, ValueError) as e:
+                logger.debug(f"读取目录缓存失败 {path}: {e}")
+                return None
+
+    def put(self, kind: str, path: str, signature: Tuple[float, int], value: Any) -> None:
+        """写入条目"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO directory_cache "
+                    "(kind, path, mtime, child_count, updated_at, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, path, signature[0], signature[1], time.time(),
+                     json.dumps(value, ensure_ascii=False)))
+                conn.commit()
+                self._stats['writes'] += 1
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= 256:
+                    self._writes_since_prune = 0
+                    self._prune(conn)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logger.debug(f"写入目录缓存失败 {path}: {e}")
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """删除过期条目，并把总条目数控制在上限内（保留最近更新的）"""
+        conn.execute("DELETE FROM directory_cache WHERE updated_at < ?", (time.time() - self.max_age,))
+        conn.execute("""
+            DELETE FROM directory_cache WHERE rowid IN (
+                SELECT rowid FROM directory_cache ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+        conn.commit()
+
+    def clear(self, kind: Optional[str] = None) -> int:
+        """清空磁盘缓存，返回删除的条目数"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return 0
+            try:
+                if kind is None:
+                    cursor = conn.execute("DELETE FROM directory_cache")
+                else:
+                    cursor = conn.execute("DELETE FROM directory_cache WHERE kind = ?", (kind,))
+                conn.commit()
+                return cursor.rowcount
+            except sqlite3.Error:
+                return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取磁盘缓存统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['db_path'] = self.db_path
+            stats['enabled'] = not self._disabled
+            stats['entries'] = 0
+            if self._conn is not None:
+                try:
+                    stats['entries'] = self._conn.execute(
+                        "SELECT COUNT(*) FROM directory_cache").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            lookups = stats['hits'] + stats['misses'] + stats['stale']
+            stats['hit_rate'] = stats['hits'] / lookups if lookups else 0
+            return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_DIRECTORY_STORE: Optional[PersistentDirectoryStore] = None
+_DIRECTORY_STORE_LOCK = threading.Lock()
+
+
+def get_directory_store() -> PersistentDirectoryStore:
+    """获取进程内共享的目录统计磁盘存储"""
+    global _DIRECTORY_STORE
+    with _DIRECTORY_STORE_LOCK:
+        if _DIRECTORY_STORE is None:
+            _DIRECTORY_STORE = PersistentDirectoryStore()
+        return _DIRECTORY_STORE
+
+
 class DirectorySizeCache:
-    """目录大小缓存类 - 高性能优化版本"""
+    """目录大小缓存类 - 高性能优化版本（OrderedDict 实现 O(1) LRU）"""
 
-    def __init__(self, cache_duration: int = 1800, max_cache_size: int = 1000):
+    def __init__(self, cache_duration: int = 1800, max_cache_size: int = 1000,
+                 store: Optional[PersistentDirectoryStore] = None, persistent: bool = True):
         self.cache_duration = cache_duration
         self.max_cache_size = max_cache_size
-        self._cache: Dict[str, Tuple[float, int, float, int]] = {}  # path -> (timestamp, size, mtime, access_count)
-        self._access_order: List[str] = []  # LRU 访问顺序
+        # path -> (timestamp, size, mtime, access_count)，按访问先后排列（最久未使用在前）
+        self._cache: 'OrderedDict[str, Tuple[float, int, float, int]]' = OrderedDict()
         self._lock = threading.Lock()
-        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'disk_hits': 0}
+        self.walker = AdaptiveDirectoryWalker()
+        # 磁盘存储：内存未命中时按需查询，进程重启后依然有效
+        self.store = store if store is not None else (get_directory_store() if persistent else None)
 
     def get_directory_size(self, path: Path) -> int:
         """获取目录大小，使用高性能缓存优化"""
@@ -2212,13 +4072,25 @@ class DirectorySizeCache:
                     abs(dir_mtime - cached_mtime) < 1.0):  # 1秒容差
                     # 更新访问统计和 LRU 顺序
                     self._cache[path_str] = (timestamp, cached_size, cached_mtime, access_count + 1)
-                    self._update_access_order(path_str)
+                    self._cache.move_to_end(path_str)
                     self._stats['hits'] += 1
                     return cached_size
                 else:
                     # 缓存过期，移除
                     self._remove_from_cache(path_str)
 
+        # 内存未命中时查询磁盘缓存（mtime + 子项数量校验）
+        signature = None
+        if self.store is not None:
+            signature = self.store.signature(path)
+            if signature is not None:
+                stored_size = self.store.get('size', path_str, signature, max_age=self.cache_duration)
+                if isinstance(stored_size, int):
+                    with self._lock:
+                        self._stats['disk_hits'] += 1
+                        self._add_to_cache(path_str, current_time, stored_size, dir_mtime)
+                    return stored_size
+
         self._stats['misses'] += 1
 
         # 计算目录大小
@@ -2227,41 +4099,47 @@ class DirectorySizeCache:
         # 更新缓存
         with self._lock:
             self._add_to_cache(path_str, current_time, total_size, dir_mtime)
+        if signature is not None:
+            self.store.put('size', path_str, signature, total_size)
 
         return total_size
 
     def _add_to_cache(self, path_str: str, timestamp: float, size: int, mtime: float) -> None:
         """添加到缓存，实现 LRU 淘汰"""
+        self._cache.pop(path_str, None)
         # 如果缓存已满，移除最少使用的项
-        if len(self._cache) >= self.max_cache_size:
+        while len(self._cache) >= self.max_cache_size and self._cache:
             self._evict_lru()
 
         self._cache[path_str] = (timestamp, size, mtime, 1)
-        self._access_order.append(path_str)
 
     def _remove_from_cache(self, path_str: str) -> None:
         """从缓存中移除项目"""
-        if path_str in self._cache:
-            del self._cache[path_str]
-        if path_str in self._access_order:
-            self._access_order.remove(path_str)
-
-    def _update_access_order(self, path_str: str) -> None:
-        """更新 LRU 访问顺序"""
-        if path_str in self._access_order:
-            self._access_order.remove(path_str)
-        self._access_order.append(path_str)
+        self._cache.pop(path_str, None)
 
     def _evict_lru(self) -> None:
         """淘汰最少使用的缓存项"""
-        if self._access_order:
-            lru_path = self._access_order.pop(0)
-            if lru_path in self._cache:
-                del self._cache[lru_path]
+        if self._cache:
+            self._cache.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def shrink(self, fraction: float = 0.5) -> int:
+        """内存压力下只保留最近使用的 fraction，返回释放的估算字节数"""
+        with self._lock:
+            keep = int(len(self._cache) * fraction)
+            freed = 0
+            while len(self._cache) > keep:
+                path_str, entry = self._cache.popitem(last=False)
+                freed += estimate_size(path_str) + estimate_size(entry)
                 self._stats['evictions'] += 1
+            return freed
 
     def _calculate_size_optimized(self, path: Path) -> int:
         """内存优化的目录大小计算"""
+        # 网络挂载上每次 stat 都是一次往返，直接使用自适应并发遍历
+        if self.walker.monitor.mount_for(path).is_network:
+            return self.walker.measure(path)['size']
+
         # 检查目录大小，决定使用哪种策略
         try:
             # 快速估算目录复杂度
@@ -2333,108 +4211,29 @@ class DirectorySizeCache:
                             async_processor.async_directory_tree_scan(path, max_depth=10, include_files=True)
                         )
                         result = asyncio.run_coroutine_threadsafe(future, loop).result(timeout=30)
-                    else:
-                        result = loop.run_until_complete(
-                            async_processor.async_directory_tree_scan(path, max_depth=10, include_files=True)
-                        )
-
-                    return result.get('total_size', 0)
-                except Exception:
-                    pass
-        except Exception:
-            pass
-
-        # 回退到同步流式处理
-        total_size = 0
-        processed_count = 0
-
-        try:
-            for file_path in path.rglob('*'):
-                if file_path.is_file():
-                    try:
-                        total_size += file_path.stat().st_size
-                        processed_count += 1
-
-                        # 每处理 1000 个文件检查一次内存
-                        if processed_count % 1000 == 0:
-                            # 这里可以添加内存检查逻辑
-                            pass
-
-                    except (OSError, IOError):
-                        pass
-        except (OSError, PermissionError):
-            pass
-
-        return total_size
-
-    def _calculate_size_batch(self, path: Path) -> int:
-        """批量计算中等目录大小"""
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-        import queue
-
-        total_size = 0
-        scan_queue = queue.Queue()
-        scan_queue.put(path)
-
-        def scan_directory_batch() -> int:
-            """批量扫描目录"""
-            batch_size = 0
-
-            try:
-                while not scan_queue.empty():
-                    try:
-                        current_path = scan_queue.get_nowait()
-
-                        with os.scandir(current_path) as entries:
-                            for entry in entries:
-                                if entry.is_file(follow_symlinks=False):
-                                    try:
-                                        batch_size += entry.stat().st_size
-                                    except (OSError, IOError):
-                                        pass
-                                elif entry.is_dir(follow_symlinks=False):
-                                    scan_queue.put(Path(entry.path))
-                    except queue.Empty:
-                        break
-                    except (PermissionError, OSError):
-                        continue
-            except Exception:
-                pass
-
-            return batch_size
-
-        try:
-            # 使用少量线程并行处理
-            with ThreadPoolExecutor(max_workers=2) as executor:
-                futures = []
-
-                # 启动扫描任务
-                for _ in range(2):
-                    if not scan_queue.empty():
-                        futures.append(executor.submit(scan_directory_batch))
+                    else:
+                        result = loop.run_until_complete(
+                            async_processor.async_directory_tree_scan(path, max_depth=10, include_files=True)
+                        )
 
-                # 收集结果
-                for future in as_completed(futures):
-                    try:
-                        total_size += future.result()
-                    except Exception:
-                        pass
+                    return result.get('total_size', 0)
+                except Exception:
+                    pass
+        except Exception:
+            pass
 
-                # 处理剩余目录
-                while not scan_queue.empty():
-                    try:
-                        remaining_path = scan_queue.get_nowait()
-                        total_size += self._scan_directory_simple(remaining_path)
-                    except queue.Empty:
-                        break
+        # 回退到同步遍历（同样应用排除规则）
+        return self._scan_directory_simple(path)
 
+    def _calculate_size_batch(self, path: Path) -> int:
+        """批量计算中等目录大小 - 按挂载点自适应并发"""
+        try:
+            return self.walker.measure(path)['size']
         except Exception:
-            total_size = self._scan_directory_simple(path)
-
-        return total_size
+            return self._scan_directory_simple(path)
 
     def _scan_directory_simple(self, path: Path) -> int:
-        """简单的目录扫描方法"""
+        """简单的目录扫描方法（统计全部文件，不按排除规则剪枝）"""
         size = 0
         try:
             with os.scandir(path) as entries:
@@ -2443,7 +4242,7 @@ class DirectorySizeCache:
                         try:
                             size += entry.stat().st_size
                         except (OSError, IOError):
-                            pass
+                            continue
                     elif entry.is_dir(follow_symlinks=False):
                         size += self._scan_directory_simple(Path(entry.path))
         except (PermissionError, OSError):
@@ -2452,40 +4251,34 @@ class DirectorySizeCache:
 
     def _calculate_size_fallback(self, path: Path) -> int:
         """回退的目录大小计算方法"""
-        total_size = 0
-        try:
-            for file_path in path.rglob('*'):
-                if file_path.is_file():
-                    try:
-                        total_size += file_path.stat().st_size
-                    except (OSError, IOError):
-                        pass
-        except (OSError, PermissionError):
-            pass
-        return total_size
+        return self._scan_directory_simple(path)
 
     def get_cache_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
         with self._lock:
-            total_requests = self._stats['hits'] + self._stats['misses']
-            hit_rate = self._stats['hits'] / total_requests if total_requests > 0 else 0
+            hits = self._stats['hits'] + self._stats['disk_hits']
+            total_requests = hits + self._stats['misses']
+            hit_rate = hits / total_requests if total_requests > 0 else 0
 
             return {
                 'cache_size': len(self._cache),
                 'max_cache_size': self.max_cache_size,
                 'hit_rate': hit_rate,
                 'hits': self._stats['hits'],
+                'disk_hits': self._stats['disk_hits'],
                 'misses': self._stats['misses'],
                 'evictions': self._stats['evictions'],
-                'total_requests': total_requests
+                'total_requests': total_requests,
+                'persistent': self.store.get_stats() if self.store is not None else None
             }
 
     def clear_cache(self) -> None:
-        """清空缓存"""
+        """清空缓存（包括磁盘缓存）"""
         with self._lock:
             self._cache.clear()
-            self._access_order.clear()
-            self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+            self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'disk_hits': 0}
+        if self.store is not None:
+            self.store.clear('size')
 
     def cleanup_expired(self) -> int:
         """清理过期的缓存项"""
@@ -2532,7 +4325,19 @@ class ConfigManager:
         "log_level": "WARNING",
         "max_scan_depth": 3,
         "max_scan_folders": 5000,
-        "max_scan_time": 30
+        "max_scan_time": 30,
+        "scan_ignore_patterns": list(ScanIgnoreRules.DEFAULT_PATTERNS),
+        "scan_ignore_regexes": list(ScanIgnoreRules.DEFAULT_REGEXES),
+        # 其他资源根目录：[{"name": "阵列1", "path": "/mnt/array1", "scan_interval": 7200}]
+        "resource_roots": [],
+        # 多个根目录时，单个根目录超过这么多秒未返回搜索结果即跳过
+        "root_search_timeout": 5,
+        # 制种队列调度策略：fifo / sjf / fair_share / deadline（见 SCHEDULING_POLICIES）
+        "queue_scheduling_policy": "fifo",
+        # 优先级老化：任务每等待满这么多秒提升一整级优先级，0 表示不老化
+        "queue_priority_aging": 1800,
+        # 制种任务在独立工作进程中执行（关闭则在队列线程中执行）
+        "queue_process_isolation": True
     }
     
     DEFAULT_TRACKERS = [
@@ -2568,7 +4373,7 @@ class ConfigManager:
             raise ConfigValidationError(f"无法创建配置文件: {e}")
 
     def _create_default_settings(self) -> None:
-        settings = self.DEFAULT_SETTINGS.copy()
+        settings = copy.deepcopy(self.DEFAULT_SETTINGS)
         settings['resource_folder'] = os.path.expanduser(settings['resource_folder'])
         settings['output_folder'] = os.path.expanduser(settings['output_folder'])
         
@@ -2677,12 +4482,12 @@ class ConfigManager:
                 if key in settings:
                     settings[key] = os.path.expanduser(settings[key])
                     
-            merged_settings = self.DEFAULT_SETTINGS.copy()
+            merged_settings = copy.deepcopy(self.DEFAULT_SETTINGS)
             merged_settings.update(settings)
             return merged_settings
             
         except (FileNotFoundError, json.JSONDecodeError):
-            return self.DEFAULT_SETTINGS.copy()
+            return copy.deepcopy(self.DEFAULT_SETTINGS)
 
     def _load_trackers(self) -> List[str]:
         try:
@@ -2716,9 +4521,54 @@ class ConfigManager:
                 if not isinstance(value, (int, float)) or not (min_val <= value <= max_val):
                     self.settings[key] = self.DEFAULT_SETTINGS[key]
 
+        for key in ('scan_ignore_patterns', 'scan_ignore_regexes'):
+            value = self.settings.get(key)
+            if value is not None and not (isinstance(value, list) and
+                                          all(isinstance(item, str) for item in value)):
+                self.settings[key] = list(self.DEFAULT_SETTINGS[key])
+
+        roots = self.settings.get('resource_roots')
+        if not isinstance(roots, list):
+            roots = []
+        self.settings['resource_roots'] = [
+            root for root in roots
+            if isinstance(root, dict) and isinstance(root.get('path'), str) and root['path'].strip()
+        ]
+        timeout = self.settings.get('root_search_timeout')
+        if not isinstance(timeout, (int, float)) or not (0.1 <= timeout <= 300):
+            self.settings['root_search_timeout'] = self.DEFAULT_SETTINGS['root_search_timeout']
+        if self.settings.get('queue_scheduling_policy') not in SCHEDULING_POLICIES:
+            self.settings['queue_scheduling_policy'] = self.DEFAULT_SETTINGS['queue_scheduling_policy']
+        aging = self.settings.get('queue_priority_aging')
+        if not isinstance(aging, (int, float)) or not (0 <= aging <= 7 * 86400):
+            self.settings['queue_priority_aging'] = self.DEFAULT_SETTINGS['queue_priority_aging']
+        if not isinstance(self.settings.get('queue_process_isolation'), bool):
+            self.settings['queue_process_isolation'] = self.DEFAULT_SETTINGS['queue_process_isolation']
+
     def get_resource_folder(self) -> str:
         return os.path.abspath(self.settings.get('resource_folder', os.path.expanduser("~/Downloads")))
 
+    def get_resource_roots(self) -> List[Dict[str, Any]]:
+        """全部资源根目录：resource_folder 在前（默认名"默认"），其后是 resource_roots
+
+        每项为 {'name', 'path'}，配置了 scan_interval（秒）时一并给出；
+        路径重复的根目录只保留一个。
+        """
+        roots = [{'name': '默认', 'path': self.get_resource_folder()}]
+        by_path = {roots[0]['path']: roots[0]}
+        for root in self.settings.get('resource_roots') or []:
+            path = os.path.abspath(os.path.expanduser(root['path']))
+            entry = by_path.get(path)
+            if entry is None:
+                entry = by_path[path] = {'name': os.path.basename(path) or path, 'path': path}
+                roots.append(entry)
+            if root.get('name'):
+                entry['name'] = str(root['name'])
+            interval = root.get('scan_interval')
+            if isinstance(interval, (int, float)) and 60 <= interval <= 7 * 86400:
+                entry['scan_interval'] = int(interval)
+        return roots
+
     def get_output_folder(self) -> str:
         output_path = self.settings.get('output_folder', os.path.expanduser("~/Desktop/torrents"))
         return os.path.abspath(output_path)
@@ -2998,56 +4848,1933 @@ class ConfigManager:
         print("="*60)
 
 
-# ================== 智能索引缓存 ==================
-class SmartIndexCache:
-    """智能索引缓存 - v1.5.1 搜索优化"""
+# ================== 紧凑文件夹表 ==================
+from array import array
+from bisect import bisect_left
+import math
+
+
+class FolderTable:
+    """紧凑文件夹表 - 整数 ID + 父指针 + 驻留名称片段
+
+    每个文件夹只占用两个数组槽位（父引用、名称片段 ID），名称片段全局
+    驻留只存一份；完整路径仅在需要展示时按父指针拼接生成。
+
+    父引用约定：>= 0 为父文件夹 ID；< 0 表示父目录不在表内，
+    -(ref + 1) 为该父目录路径字符串的片段 ID（通常就是扫描根目录）。
+    """
+
+    def __init__(self):
+        self._parents = array('l')
+        self._name_ids = array('L')
+        self._segments: List[str] = []
+        self._segment_ids: Optional[Dict[str, int]] = {}
+        # 路径哈希 -> ID（或 ID 列表），仅构建/更新期使用，freeze() 后释放
+        self._path_lookup: Optional[Dict[int, Any]] = {}
+
+    @classmethod
+    def from_paths(cls, paths: List[Union[str, Path]]) -> 'FolderTable':
+        """从路径列表构建（兼容旧的 List[Path] 接口）"""
+        table = cls()
+        for path in paths:
+            table.add(path)
+        table.freeze()
+        return table
+
+    def __len__(self) -> int:
+        return len(self._name_ids)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # 查找表以字符串哈希为键，而哈希值因进程而异，不随表保存
+        state = self.__dict__.copy()
+        state['_path_lookup'] = None
+        state['_segment_ids'] = None
+        return state
+
+    def _intern(self, segment: str) -> int:
+        if self._segment_ids is None:
+            self._segment_ids = {seg: i for i, seg in enumerate(self._segments)}
+        segment_id = self._segment_ids.get(segment)
+        if segment_id is None:
+            segment_id = len(self._segments)
+            self._segments.append(sys.intern(segment))
+            self._segment_ids[segment] = segment_id
+        return segment_id
+
+    def _ensure_lookup(self) -> Dict[int, Any]:
+        if self._path_lookup is None:
+            self._path_lookup = {}
+            for folder_id in range(len(self)):
+                self._register_path(self.path_str(folder_id), folder_id)
+        return self._path_lookup
+
+    def _register_path(self, path_str: str, folder_id: int) -> None:
+        key = hash(path_str)
+        existing = self._path_lookup.get(key)
+        if existing is None:
+            self._path_lookup[key] = folder_id
+        elif isinstance(existing, list):
+            existing.append(folder_id)
+        else:
+            self._path_lookup[key] = [existing, folder_id]
+
+    def add(self, path: Union[str, Path]) -> int:
+        """添加文件夹并返回其 ID"""
+        path_str = str(path)
+        parent_str, name = os.path.split(path_str)
+        parent_id = self.find(parent_str)
+        if parent_id is None:
+            parent_ref = -(self._intern(parent_str) + 1)
+        else:
+            parent_ref = parent_id
+
+        folder_id = len(self._name_ids)
+        self._parents.append(parent_ref)
+        self._name_ids.append(self._intern(name))
+        self._register_path(path_str, folder_id)
+        return folder_id
+
+    def find(self, path: Union[str, Path]) -> Optional[int]:
+        """按完整路径查找文件夹 ID"""
+        path_str = str(path)
+        candidates = self._ensure_lookup().get(hash(path_str))
+        if candidates is None:
+            return None
+        if not isinstance(candidates, list):
+            candidates = [candidates]
+        for folder_id in candidates:
+            if self.path_str(folder_id) == path_str:
+                return folder_id
+        return None
+
+    def freeze(self) -> None:
+        """构建完成后释放构建期查找表"""
+        self._path_lookup = None
+        self._segment_ids = None
+
+    def name_id(self, folder_id: int) -> int:
+        """名称段的驻留 ID；同名文件夹共享同一个 ID"""
+        return self._name_ids[folder_id]
+
+    def name(self, folder_id: int) -> str:
+        """文件夹名称（驻留字符串，不产生新对象）"""
+        return self._segments[self._name_ids[folder_id]]
+
+    def parent_id(self, folder_id: int) -> Optional[int]:
+        ref = self._parents[folder_id]
+        return ref if ref >= 0 else None
+
+    def path_str(self, folder_id: int) -> str:
+        """按父指针拼接完整路径"""
+        parts = []
+        ref = folder_id
+        while ref >= 0:
+            parts.append(self._segments[self._name_ids[ref]])
+            ref = self._parents[ref]
+        parts.append(self._segments[-ref - 1])
+        parts.reverse()
+        return os.path.join(*parts)
+
+    def path(self, folder_id: int) -> Path:
+        return Path(self.path_str(folder_id))
+
+    def path_length(self, folder_id: int) -> int:
+        """完整路径长度（无需拼接字符串）"""
+        length = 0
+        ref = folder_id
+        while ref >= 0:
+            length += len(self._segments[self._name_ids[ref]]) + 1
+            ref = self._parents[ref]
+        return length + len(self._segments[-ref - 1])
+
+    def paths(self) -> List[Path]:
+        """物化全部路径（仅供兼容接口使用）"""
+        return [self.path(folder_id) for folder_id in range(len(self))]
+
+    def diff(self, old: 'FolderTable') -> Tuple[array, Set[str]]:
+        """与旧表比较：(本表中新增的文件夹 ID, 旧表中已不存在的路径)
+
+        按 (父文件夹, 名称) 逐层对应，不拼接完整路径；父 ID 总小于子 ID，
+        因此按 ID 顺序一遍即可完成映射。
+        """
+        children: Dict[Tuple[Any, str], int] = {}
+        for folder_id in range(len(self)):
+            ref = self._parents[folder_id]
+            parent_key = ref if ref >= 0 else self._segments[-ref - 1]
+            children[(parent_key, self.name(folder_id))] = folder_id
+
+        matched = bytearray(len(self))
+        mapping = array('l', [-1]) * len(old)
+        removed: Set[str] = set()
+        for folder_id in range(len(old)):
+            ref = old._parents[folder_id]
+            if ref >= 0:
+                parent_key = mapping[ref]
+                if parent_key < 0:
+                    removed.add(old.path_str(folder_id))
+                    continue
+            else:
+                parent_key = old._segments[-ref - 1]
+            new_id = children.get((parent_key, old.name(folder_id)))
+            if new_id is None:
+                removed.add(old.path_str(folder_id))
+            else:
+                mapping[folder_id] = new_id
+                matched[new_id] = 1
+        added = array('L', (folder_id for folder_id in range(len(self)) if not matched[folder_id]))
+        return added, removed
+
+    def memory_usage(self) -> Dict[str, int]:
+        """估算内存占用（字节）"""
+        arrays_bytes = (self._parents.itemsize * len(self._parents) +
+                        self._name_ids.itemsize * len(self._name_ids))
+        segments_bytes = sum(sys.getsizeof(seg) for seg in self._segments)
+        return {
+            'folders': len(self),
+            'segments': len(self._segments),
+            'arrays_bytes': arrays_bytes,
+            'segments_bytes': segments_bytes,
+            'total_bytes': arrays_bytes + segments_bytes
+        }
+
+
+# ================== 中日韩分词 ==================
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+
+class CJKTokenizer:
+    """中日韩文本分词 - 字符二元组 + 可选拼音键
+
+    中文、日文标题没有空格分隔，整句只会成为一个词，倒排表无法预筛。
+    这里把连续的中日韩字符切成重叠的二元组（"权力的游戏" -> 权力 力的
+    的游 游戏），单个字符保留原样；拉丁字母与数字部分按原词保留。
+    安装 pypinyin 时，每段汉字另外生成一个拼音键（"quanlideyouxi"），
+    可以用拼音搜索中文标题。
+    """
+
+    CJK_PATTERN = re.compile(
+        r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+')
+    HAN_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+    def __init__(self, pinyin: bool = True):
+        self.pinyin_enabled = pinyin and lazy_pinyin is not None
+
+    @classmethod
+    def has_cjk(cls, text: str) -> bool:
+        return cls.CJK_PATTERN.search(text) is not None
+
+    @classmethod
+    def is_cjk_bigram(cls, token: str) -> bool:
+        return len(token) == 2 and cls.CJK_PATTERN.fullmatch(token) is not None
+
+    def tokenize(self, normalized_text: str) -> List[str]:
+        """切分为索引词（保持顺序，可能重复）"""
+        tokens: List[str] = []
+        for word in normalized_text.split():
+            if not self.CJK_PATTERN.search(word):
+                tokens.append(word)
+                continue
+            position = 0
+            for run in self.CJK_PATTERN.finditer(word):
+                if run.start() > position:
+                    tokens.append(word[position:run.start()])
+                text = run.group()
+                if len(text) == 1:
+                    tokens.append(text)
+                else:
+                    tokens.extend(text[i:i + 2] for i in range(len(text) - 1))
+                position = run.end()
+            if position < len(word):
+                tokens.append(word[position:])
+        return tokens
+
+    def pinyin_keys(self, normalized_text: str) -> List[str]:
+        """每段连续汉字的全拼（未安装 pypinyin 时为空）"""
+        if not self.pinyin_enabled:
+            return []
+        keys = []
+        for run in self.HAN_PATTERN.findall(normalized_text):
+            key = ''.join(lazy_pinyin(run))
+            if key and key.isascii():
+                keys.append(key)
+        return keys
+
+
+# ================== 发布名解析 ==================
+@dataclass(frozen=True)
+class ReleaseInfo:
+    """发布名解析结果（未识别的字段为 None）"""
+    title: str
+    year: Optional[int] = None
+    season_start: Optional[int] = None
+    season_end: Optional[int] = None
+    episode: Optional[int] = None
+    resolution: Optional[str] = None
+    codec: Optional[str] = None
+    source: Optional[str] = None
+    audio: Optional[str] = None
+    group: Optional[str] = None
+
+    def facets(self) -> Dict[str, Any]:
+        """可用于筛选的字段（仅含已识别的）"""
+        facets = {}
+        for facet in ('year', 'resolution', 'codec', 'source'):
+            value = getattr(self, facet)
+            if value is not None:
+                facets[facet] = value
+        if self.season_start is not None:
+            facets['season'] = (self.season_start, self.season_end)
+        return facets
+
+
+class ReleaseNameParser:
+    """发布名解析器 - 一个预编译正则一次扫描识别全部字段
+
+    识别分辨率、编码、来源、音频、年份、季/集（S01E02、S01-S05、Season 1、
+    1x02、EP02、第2季、第二季第3集）及发布组（开头的 [组名] 或结尾的 -组名）；
+    第一个识别出的字段之前的部分作为标题。分辨率、编码、来源统一为
+    规范写法（4K/UHD -> 2160p，HEVC/H.265 -> x265，WEB-DL/WEBRip -> web）。
+    """
+
+    SEASON_LIMIT = 50
+    EPISODE_LIMIT = 500
+
+    _B = r'(?<![a-z0-9])'  # 不用 \b：中日韩字符也算单词字符
+    _E = r'(?![a-z0-9])'
+    PATTERN = re.compile(
+        _B + r'(?:'
+        r'(?P<se>s(?P<se_s>\d{1,2})[ ._-]?e(?P<se_e>\d{1,3}))'
+        r'|(?P<sw>season[ ._]?(?P<sw_s>\d{1,2})[ ._]?episode[ ._]?(?P<sw_e>\d{1,3}))'
+        r'|(?P<sr>s(?P<sr_a>\d{1,2})[ ._]?(?:-|~|to)[ ._]?s(?P<sr_b>\d{1,2}))'
+        r'|(?P<ss>s(?P<ss_n>\d{1,2})|season[ ._]?(?P<ss_w>\d{1,2}))'
+        r'|(?P<xe>(?P<xe_s>\d{1,2})x(?P<xe_e>\d{1,3}))'
+        r'|(?P<ep>ep\.?[ ]?(?P<ep_n>\d{1,3}))'
+        r'|(?P<res>(?:480|576|720|1080|1440|2160|4320)[pi]|4k|8k|uhd)'
+        r'|(?P<codec>[xh]\.?26[45]|hevc|avc|av1|xvid|divx)'
+        r'|(?P<source>blu-?ray|bdrip|brrip|bdremux|remux|web-?dl|webrip|hdtv|dvdrip)'
+        r'|(?P<audio>e-?ac-?3|ac-?3|aac|dts(?:-hd)?(?:[ .-]?ma)?|truehd|atmos|flac|mp3|ddp?(?:[ .]?[257]\.[01])?)'
+        r'|(?P<year>(?:19|20)\d{2})'
+        r')' + _E +
+        r'|(?P<cse>第(?P<cse_s>\d{1,2}|[一二三四五六七八九十]+)季\s*第(?P<cse_e>\d{1,3}|[一二三四五六七八九十百]+)[集话話])'
+        r'|(?P<cs>第(?P<cs_n>\d{1,2}|[一二三四五六七八九十]+)季)'
+        r'|(?P<ce>第(?P<ce_n>\d{1,3}|[一二三四五六七八九十百]+)[集话話])',
+        re.IGNORECASE)
+    LEADING_GROUP = re.compile(r'^\s*[\[【](?P<group>[^\]】]{1,40})[\]】]')
+    TRAILING_GROUP = re.compile(r'-(?P<group>[A-Za-z0-9][A-Za-z0-9_]{1,30})\s*$')
+    TITLE_STRIP = re.compile(r'[\s._\-\[\](){}【】（）:：|+]+')
+
+    RESOLUTIONS = {'4k': '2160p', 'uhd': '2160p', '8k': '4320p'}
+    CODECS = {'x265': 'x265', 'h265': 'x265', 'hevc': 'x265',
+              'x264': 'x264', 'h264': 'x264', 'avc': 'x264',
+              'av1': 'av1', 'xvid': 'xvid', 'divx': 'xvid'}
+    SOURCES = {'bluray': 'bluray', 'blu-ray': 'bluray', 'bdrip': 'bluray', 'brrip': 'bluray',
+               'bdremux': 'remux', 'remux': 'remux',
+               'web-dl': 'web', 'webdl': 'web', 'webrip': 'web',
+               'hdtv': 'hdtv', 'dvdrip': 'dvd'}
+    CHINESE_DIGITS = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+
+    @classmethod
+    def _number(cls, text: str) -> Optional[int]:
+        """阿拉伯数字或一百以内的中文数字"""
+        if text.isdigit():
+            return int(text)
+        total, current = 0, 0
+        for char in text:
+            if char in cls.CHINESE_DIGITS:
+                current = cls.CHINESE_DIGITS[char]
+            elif char == '十':
+                total += (current or 1) * 10
+                current = 0
+            elif char == '百':
+                total += (current or 1) * 100
+                current = 0
+            else:
+                return None
+        return total + current or None
+
+    def parse(self, name: str) -> ReleaseInfo:
+        fields: Dict[str, Any] = {}
+        title_end = len(name)
+        tagged = False  # 是否出现分辨率、编码、来源等技术标记
+        tag_spans: List[Tuple[int, int]] = []
+
+        leading = self.LEADING_GROUP.match(name)
+        title_start = leading.end() if leading else 0
+        if leading:
+            fields['group'] = leading.group('group').strip()
+
+        for match in self.PATTERN.finditer(name, title_start):
+            kind = match.lastgroup
+            if kind is None:
+                continue
+            if match.start() < title_end and kind != 'year':
+                title_end = match.start()
+
+            tag_spans.append(match.span())
+            if kind in ('se', 'sw', 'xe', 'cse'):
+                season = self._number(match.group(f'{kind}_s'))
+                episode = self._number(match.group(f'{kind}_e'))
+                if (season and 1 <= season <= self.SEASON_LIMIT and episode and
+                        1 <= episode <= self.EPISODE_LIMIT and 'episode' not in fields):
+                    fields.setdefault('season_start', season)
+                    fields.setdefault('season_end', season)
+                    fields['episode'] = episode
+            elif kind == 'sr':
+                first, last = int(match.group('sr_a')), int(match.group('sr_b'))
+                if 1 <= first <= last <= self.SEASON_LIMIT and 'season_start' not in fields:
+                    fields['season_start'], fields['season_end'] = first, last
+            elif kind in ('ss', 'cs'):
+                season = self._number(match.group('ss_n') or match.group('ss_w') or '') if kind == 'ss' \
+                    else self._number(match.group('cs_n'))
+                if season and 1 <= season <= self.SEASON_LIMIT and 'season_start' not in fields:
+                    fields['season_start'] = fields['season_end'] = season
+            elif kind in ('ep', 'ce'):
+                episode = self._number(match.group('ep_n') or match.group('ce_n'))
+                if episode and 1 <= episode <= self.EPISODE_LIMIT and 'episode' not in fields:
+                    fields['episode'] = episode
+            elif kind == 'res':
+                value = match.group().lower()
+                fields.setdefault('resolution', self.RESOLUTIONS.get(value, value))
+                tagged = True
+            elif kind == 'codec':
+                value = match.group().lower().replace('.', '')
+                fields.setdefault('codec', self.CODECS.get(value, value))
+                tagged = True
+            elif kind == 'source':
+                fields.setdefault('source', self.SOURCES.get(match.group().lower(), match.group().lower()))
+                tagged = True
+            elif kind == 'audio':
+                fields.setdefault('audio', match.group().lower())
+            elif kind == 'year':
+                # 片名中也可能含年份，取最后一个；位于开头的年份视为片名
+                if match.start() > title_start:
+                    fields['year'] = int(match.group())
+                    year_start = match.start()
+                    if year_start < title_end:
+                        title_end = year_start
+
+        if tagged and 'group' not in fields:
+            trailing = self.TRAILING_GROUP.search(name)
+            # "WEB-DL" 之类标记中的连字符不是发布组分隔符
+            if trailing and not any(start <= trailing.start() < end for start, end in tag_spans):
+                fields['group'] = trailing.group('group')
+
+        title = self.TITLE_STRIP.sub(' ', name[title_start:title_end]).strip()
+        return ReleaseInfo(title=title, **fields)
+
+
+class FacetIndex:
+    """发布名分面索引 - 列式存储 + 分面值倒排表
+
+    每个文件夹一行：分辨率、编码、来源以小整数编码存入 array('B')，
+    年份存 array('H')，季范围存两列 array('B')（0 表示未知）。
+    另外为每个 (分面, 值) 维护文件夹 ID 倒排表（按 ID 递增，可二分查找），
+    纯分面查询只需对倒排表求交，无需逐个比较名称。
+    """
+
+    CODED_FACETS = ('resolution', 'codec', 'source')
+
+    def __init__(self):
+        self.columns: Dict[str, array] = {facet: array('B') for facet in self.CODED_FACETS}
+        self.columns['year'] = array('H')
+        self.columns['season_start'] = array('B')
+        self.columns['season_end'] = array('B')
+        self.values: Dict[str, List[str]] = {facet: [''] for facet in self.CODED_FACETS}  # 编码 0 = 未知
+        self._codes: Dict[str, Dict[str, int]] = {facet: {} for facet in self.CODED_FACETS}
+        self.postings: Dict[Tuple[str, Any], array] = {}
+
+    def __len__(self) -> int:
+        return len(self.columns['year'])
+
+    def _code(self, facet: str, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        codes = self._codes[facet]
+        code = codes.get(value)
+        if code is None and len(self.values[facet]) < 256:
+            code = codes[value] = len(self.values[facet])
+            self.values[facet].append(value)
+        return code or 0
+
+    def _post(self, facet: str, value: Any, folder_id: int) -> None:
+        postings = self.postings.get((facet, value))
+        if postings is None:
+            postings = self.postings[(facet, value)] = array('L')
+        postings.append(folder_id)
+
+    def add(self, info: ReleaseInfo) -> int:
+        """追加一个文件夹（ID 依次递增）"""
+        folder_id = len(self)
+        for facet in self.CODED_FACETS:
+            value = getattr(info, facet)
+            self.columns[facet].append(self._code(facet, value))
+            if value is not None:
+                self._post(facet, value, folder_id)
+        self.columns['year'].append(info.year or 0)
+        if info.year:
+            self._post('year', info.year, folder_id)
+        first, last = info.season_start or 0, info.season_end or 0
+        self.columns['season_start'].append(min(first, 255))
+        self.columns['season_end'].append(min(last, 255))
+        for season in range(first, last + 1) if first else ():
+            self._post('season', season, folder_id)
+        return folder_id
+
+    def _wanted(self, facets: Dict[str, Any]) -> Dict[str, Any]:
+        """把查询分面换成列上的比较值；值在索引中从未出现时为 None"""
+        wanted = {}
+        for facet, value in facets.items():
+            if facet in self.CODED_FACETS:
+                wanted[facet] = self._codes[facet].get(value)
+            else:
+                wanted[facet] = value
+        return wanted
+
+    def matches(self, folder_id: int, facets: Dict[str, Any]) -> bool:
+        """逐列校验；文件夹未标注的分面不排除（名称里没写分辨率不代表不符）"""
+        return self._matches_wanted(folder_id, self._wanted(facets))
+
+    def _matches_wanted(self, folder_id: int, wanted: Dict[str, Any]) -> bool:
+        columns = self.columns
+        for facet, value in wanted.items():
+            if facet == 'season':
+                start = columns['season_start'][folder_id]
+                if start and not (start <= value[1] and value[0] <= columns['season_end'][folder_id]):
+                    return False
+            else:
+                code = columns[facet][folder_id]
+                if code and code != value:
+                    return False
+        return True
+
+    def filter(self, ids: Any, scores: Any, facets: Dict[str, Any]) -> Tuple[Any, Any]:
+        """按分面过滤候选（见 matches）"""
+        if not facets or not len(ids):
+            return ids, scores
+        if np is not None:
+            ids = np.asarray(ids, dtype=np.int64)
+            keep = np.ones(len(ids), dtype=bool)
+            for facet, value in self._wanted(facets).items():
+                if facet == 'season':
+                    starts = np.frombuffer(self.columns['season_start'], dtype=np.uint8)[ids]
+                    ends = np.frombuffer(self.columns['season_end'], dtype=np.uint8)[ids]
+                    keep &= (starts == 0) | ((starts <= value[1]) & (ends >= value[0]))
+                else:
+                    column = self.columns[facet]
+                    codes = np.frombuffer(column, dtype=f'u{column.itemsize}')[ids]
+                    keep &= (codes == 0) | (codes == (value if value is not None else -1))
+            return ids[keep], np.asarray(scores, dtype=np.float64)[keep]
+        wanted = self._wanted(facets)
+        kept = [(folder_id, score) for folder_id, score in zip(ids, scores)
+                if self._matches_wanted(folder_id, wanted)]
+        return [folder_id for folder_id, _ in kept], [score for _, score in kept]
+
+    def lookup(self, facets: Dict[str, Any]) -> List[int]:
+        """严格匹配全部分面的文件夹（倒排表求交）"""
+        lists = []
+        for facet, value in facets.items():
+            if facet == 'season':
+                seasons = [self.postings.get(('season', season)) for season in range(value[0], value[1] + 1)]
+                seasons = [postings for postings in seasons if postings]
+                if len(seasons) == 1:
+                    lists.append(seasons[0])
+                else:
+                    lists.append(sorted(set().union(*seasons)))
+            else:
+                lists.append(self.postings.get((facet, value), ()))
+        if not lists:
+            return []
+
+        lists.sort(key=len)
+        result = []
+        for folder_id in lists[0]:
+            for postings in lists[1:]:
+                position = bisect_left(postings, folder_id)
+                if position == len(postings) or postings[position] != folder_id:
+                    break
+            else:
+                result.append(folder_id)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {'folders': len(self)}
+        for facet in self.CODED_FACETS:
+            stats[f'{facet}_values'] = len(self.values[facet]) - 1
+            stats[f'{facet}_tagged'] = sum(1 for code in self.columns[facet] if code)
+        stats['season_tagged'] = sum(1 for start in self.columns['season_start'] if start)
+        return stats
+
+
+# ================== BM25 排序 ==================
+import pickle
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class BM25Ranker:
+    """BM25 排序器 - 预计算词项统计，按倒排表累加得分
+
+    - 每个文件夹标准化名称的词数（分词后）及 BM25 长度归一化因子在建索引时算好，
+      查询时不再对候选名称重复做标准化
+    - 得分 = Σ idf(t)·norm(d) / Σ idf(t)（t 取查询词）：包含全部查询词且词数
+      不超过平均值的名称得 1.0，名称越长越低，缺少的词按其 idf 比例扣分；
+      norm(d) 封顶为 1，短名称不加分，只命中部分查询词的名称得分不超过
+      命中词的 idf 占比；查询整体作为子串出现在名称中时额外加分
+    - 标准化名称 -> 文件夹 ID 哈希表，完全匹配直接命中
+    - 有 NumPy 时对倒排表拼接去重、bincount 累加，partition 选前 k 个；
+      否则逐条累加、用堆选前 k 个；批量查询共用一次遍历
+
+    文件夹名称极少重复同一个词，倒排表按去重后的词建立，词频按 1 计。
+    """
+
+    K1 = 1.2
+    B = 0.75
+    PHRASE_BOOST = 0.15
+    # 非完全匹配的得分上限，保证完全匹配始终排在最前
+    MAX_RANKED_SCORE = 0.99
+
+    def __init__(self):
+        self.names: List[str] = []  # 标准化名称
+        self.doc_lengths = array('H')
+        self.path_lengths = array('L')
+        self.exact: Dict[str, Any] = {}  # 标准化名称 -> ID 或 ID 列表
+        self._norms = array('d')
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def average_length(self) -> float:
+        return self._total_length / len(self.names) if self.names else 1.0
+
+    def extend(self, normalized_names: List[str], term_counts: List[int], path_lengths: List[int]) -> None:
+        """追加文件夹（ID 依次接在已有文件夹之后）"""
+        start = len(self.names)
+        for offset, name in enumerate(normalized_names):
+            length = min(term_counts[offset], 65535)
+            self.doc_lengths.append(length)
+            self._total_length += length
+            if not name:
+                continue
+            folder_id = start + offset
+            existing = self.exact.get(name)
+            if existing is None:
+                self.exact[name] = folder_id
+            elif isinstance(existing, list):
+                existing.append(folder_id)
+            else:
+                self.exact[name] = [existing, folder_id]
+        self.names.extend(normalized_names)
+        self.path_lengths.extend(path_lengths)
+        self._update_norms()
+
+    def _update_norms(self, average_length: Optional[float] = None) -> None:
+        """平均词数变化后重算每个文件夹的长度归一化因子（分片按全局平均词数计算，封顶为 1）"""
+        k1, b = self.K1, self.B
+        avgdl = average_length or self.average_length or 1.0
+        self._norms_average = avgdl
+        norms = array('d')
+        if np is not None:
+            lengths = np.frombuffer(self.doc_lengths, dtype=np.uint16).astype(np.float64)
+            norms.frombytes(np.minimum(1.0, (k1 + 1) / (1 + k1 * (1 - b + b * lengths / avgdl))).tobytes())
+        else:
+            norms.extend(min(1.0, (k1 + 1) / (1 + k1 * (1 - b + b * length / avgdl)))
+                         for length in self.doc_lengths)
+        self._norms = norms
+
+    def idf(self, document_frequency: int, total: Optional[int] = None) -> float:
+        total = len(self.names) if total is None else total
+        return math.log(1 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def exact_ids(self, normalized_query: str) -> List[int]:
+        """标准化后与查询完全相同的文件夹"""
+        hit = self.exact.get(normalized_query)
+        if hit is None:
+            return []
+        return list(hit) if isinstance(hit, list) else [hit]
+
+    def score(self, normalized_query: str, query_terms: List[str],
+              word_index: Dict[str, array]) -> Tuple[Any, Any]:
+        """为至少包含一个查询词的文件夹计算归一化 BM25 得分
+
+        Returns:
+            (文件夹 ID 序列, 得分序列)，有 NumPy 时为数组
+        """
+        return self.score_many([(normalized_query, query_terms)], word_index)[0]
+
+    @staticmethod
+    def postings_range(postings: array, id_range: Optional[Tuple[int, int]]) -> array:
+        """倒排表中落在 [start, end) 区间内的部分（倒排表按 ID 递增，二分定位）"""
+        if id_range is None:
+            return postings
+        start, end = id_range
+        return postings[bisect_left(postings, start):bisect_left(postings, end)]
+
+    def score_many(self, queries: List[Tuple[str, List[str]]], word_index: Dict[str, array],
+                   id_range: Optional[Tuple[int, int]] = None,
+                   corpus: Optional[Dict[str, Any]] = None) -> List[Tuple[Any, Any]]:
+        """一次遍历为多个查询打分（见 score）
+
+        每个词的 idf 与倒排表只取一次；有 NumPy 时把全部查询的
+        (查询, 文件夹) 对拼在一起，一次去重累加。
+
+        Args:
+            queries: [(标准化查询, 查询词)]
+            id_range: 只为 [start, end) 内的文件夹打分（idf 仍按全部文件夹计算）
+            corpus: 全局统计（见 SmartIndexCache.corpus_stats）；分片索引只含
+                本区间的倒排表，文档频率、文件夹总数与平均词数取自这里
+        """
+        results: List[Tuple[Any, Any]] = [([], []) for _ in queries]
+        if corpus is not None and corpus['average_length'] != getattr(self, '_norms_average', None):
+            self._update_norms(corpus['average_length'])
+        idf_cache: Dict[str, float] = {}
+        plans = []  # (查询序号, 标准化查询, [(词, idf / Σidf)])
+        for query_number, (normalized_query, query_terms) in enumerate(queries):
+            query_words = set(query_terms)
+            for word in query_words:
+                if word not in idf_cache:
+                    if corpus is None:
+                        idf_cache[word] = self.idf(len(word_index.get(word, ())))
+                    else:
+                        idf_cache[word] = self.idf(corpus['document_frequency'].get(word, 0), corpus['total'])
+            total_idf = sum(idf_cache[word] for word in query_words)
+            present = [(word, idf_cache[word] / total_idf) for word in query_words
+                       if total_idf > 0 and len(word_index.get(word, ()))]
+            if present:
+                plans.append((query_number, normalized_query, present))
+        if not plans:
+            return results
+
+        names = self.names
+        boost = self.PHRASE_BOOST
+        cap = self.MAX_RANKED_SCORE
+
+        if np is not None:
+            postings_cache: Dict[str, Any] = {}
+            id_chunks, weight_chunks, plan_chunks = [], [], []
+            for plan_number, (_, _, present) in enumerate(plans):
+                for word, weight in present:
+                    folder_ids = postings_cache.get(word)
+                    if folder_ids is None:
+                        postings = self.postings_range(word_index[word], id_range)
+                        folder_ids = postings_cache[word] = np.frombuffer(
+                            postings, dtype=f'u{postings.itemsize}').astype(np.int64)
+                    id_chunks.append(folder_ids)
+                    weight_chunks.append(np.full(len(folder_ids), weight))
+                    plan_chunks.append(np.full(len(folder_ids), plan_number, dtype=np.int64))
+
+            size = max(len(names), 1)
+            keys, inverse = np.unique(np.concatenate(plan_chunks) * size + np.concatenate(id_chunks),
+                                      return_inverse=True)
+            totals = np.bincount(inverse, weights=np.concatenate(weight_chunks))
+            pair_plans, pair_ids = np.divmod(keys, size)
+            scores = totals * np.frombuffer(self._norms, dtype=np.float64)[pair_ids]
+            bounds = np.searchsorted(pair_plans, np.arange(len(plans) + 1))
+            for plan_number, (query_number, normalized_query, _) in enumerate(plans):
+                start, end = bounds[plan_number], bounds[plan_number + 1]
+                ids = pair_ids[start:end]
+                phrase = np.fromiter((normalized_query in names[folder_id] for folder_id in ids.tolist()),
+                                     dtype=bool, count=len(ids))
+                results[query_number] = (ids, np.minimum(scores[start:end] + phrase * boost, cap))
+            return results
+
+        # 每个词的倒排表只遍历一次，累加到所有包含它的查询
+        word_plans: Dict[str, List[Tuple[Dict[int, float], float]]] = {}
+        plan_totals: List[Dict[int, float]] = []
+        for _, _, present in plans:
+            totals: Dict[int, float] = {}
+            plan_totals.append(totals)
+            for word, weight in present:
+                word_plans.setdefault(word, []).append((totals, weight))
+        for word, targets in word_plans.items():
+            postings = self.postings_range(word_index[word], id_range)
+            for totals, weight in targets:
+                for folder_id in postings:
+                    totals[folder_id] = totals.get(folder_id, 0.0) + weight
+
+        norms = self._norms
+        for (query_number, normalized_query, _), totals in zip(plans, plan_totals):
+            ids = list(totals)
+            scores = [min(cap, totals[folder_id] * norms[folder_id] +
+                          (boost if normalized_query in names[folder_id] else 0.0))
+                      for folder_id in ids]
+            results[query_number] = (ids, scores)
+        return results
+
+    def top_k(self, parts: List[Tuple[Any, Any, float]], exact_ids: List[int],
+              min_score: float, k: int) -> Tuple[int, List[Tuple[int, float]]]:
+        """合并多路得分（同一文件夹取最高）并选出前 k 个
+
+        Args:
+            parts: [(ID 序列, 得分序列, 权重)]
+            exact_ids: 完全匹配的文件夹，得分固定为 1.0
+            min_score: 最低得分
+            k: 返回数量
+
+        Returns:
+            (达到最低得分的文件夹数, [(文件夹 ID, 得分)])，按得分降序、路径长度升序
+        """
+        if np is not None:
+            id_chunks, score_chunks = [], []
+            for ids, scores, weight in parts:
+                if len(ids):
+                    id_chunks.append(np.asarray(ids, dtype=np.int64))
+                    score_chunks.append(np.asarray(scores, dtype=np.float64) * weight)
+            if exact_ids:
+                id_chunks.append(np.asarray(exact_ids, dtype=np.int64))
+                score_chunks.append(np.ones(len(exact_ids)))
+            if not id_chunks:
+                return 0, []
+
+            # 只在出现过的文件夹上合并，耗时与候选数成正比而非文件夹总数
+            matched, inverse = np.unique(np.concatenate(id_chunks), return_inverse=True)
+            best = np.zeros(len(matched))
+            np.maximum.at(best, inverse, np.concatenate(score_chunks))
+            keep = best >= min_score
+            matched, best = matched[keep], best[keep]
+            match_count = len(matched)
+            if match_count > k:
+                # 只保留不低于第 k 名得分的文件夹（含同分），再精确排序
+                kth_score = np.partition(best, match_count - k)[match_count - k]
+                keep = best >= kth_score
+                matched, best = matched[keep], best[keep]
+            path_lengths = np.frombuffer(self.path_lengths, dtype=f'u{self.path_lengths.itemsize}')[matched]
+            order = np.lexsort((path_lengths, -best))[:k]
+            return match_count, list(zip(matched[order].tolist(), best[order].tolist()))
+
+        best: Dict[int, float] = {}
+        for ids, scores, weight in parts:
+            for folder_id, score in zip(ids, scores):
+                score *= weight
+                if score > best.get(folder_id, 0.0):
+                    best[folder_id] = score
+        for folder_id in exact_ids:
+            best[folder_id] = 1.0
+
+        matched = [(folder_id, score) for folder_id, score in best.items() if score >= min_score]
+        path_lengths = self.path_lengths
+        top = heapq.nlargest(k, matched, key=lambda item: (item[1], -path_lengths[item[0]]))
+        return len(matched), top
+
+
+# ================== 拼写纠错 ==================
+class SymSpellCorrector:
+    """SymSpell 风格的拼写纠错 - 预计算删除字典
+
+    为词表中每个词（取前 prefix_length 个字符）预先生成编辑距离以内的
+    所有"删除变体"，查询时只需生成查询词的删除变体并查字典，再用真实
+    编辑距离校验候选，无需与整个词表逐一比较。词表可增量增删。
+    """
+
+    def __init__(self, max_distance: int = 2, prefix_length: int = 7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self._deletes: Dict[str, List[str]] = {}  # 删除变体 -> 词列表
+        self._vocabulary: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stats = {'lookups': 0, 'corrections': 0, 'misses': 0, 'added': 0, 'removed': 0}
+
+    def __len__(self) -> int:
+        return len(self._vocabulary)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._vocabulary
+
+    def _edits(self, word: str, distance: Optional[int] = None) -> Set[str]:
+        """生成最多 distance（默认 max_distance）次删除得到的所有变体（含原词）"""
+        word = word[:self.prefix_length]
+        results = {word}
+        frontier = {word}
+        for _ in range(self.max_distance if distance is None else distance):
+            next_frontier = set()
+            for item in frontier:
+                if len(item) <= 1:
+                    continue
+                for i in range(len(item)):
+                    next_frontier.add(item[:i] + item[i + 1:])
+            next_frontier -= results
+            results |= next_frontier
+            frontier = next_frontier
+        return results
+
+    def add_words(self, words) -> int:
+        """加入新词，返回实际新增的数量"""
+        added = 0
+        with self._lock:
+            for word in words:
+                if word in self._vocabulary or not self._is_correctable(word):
+                    continue
+                self._vocabulary.add(word)
+                for variant in self._edits(word):
+                    bucket = self._deletes.get(variant)
+                    if bucket is None:
+                        self._deletes[variant] = [word]
+                    else:
+                        bucket.append(word)
+                added += 1
+            self._stats['added'] += added
+        return added
+
+    def remove_words(self, words) -> int:
+        """移除不再出现的词，返回实际移除的数量"""
+        removed = 0
+        with self._lock:
+            for word in words:
+                if word not in self._vocabulary:
+                    continue
+                self._vocabulary.discard(word)
+                for variant in self._edits(word):
+                    bucket = self._deletes.get(variant)
+                    if bucket is None:
+                        continue
+                    try:
+                        bucket.remove(word)
+                    except ValueError:
+                        pass
+                    if not bucket:
+                        del self._deletes[variant]
+                removed += 1
+            self._stats['removed'] += removed
+        return removed
+
+    def sync(self, vocabulary) -> Tuple[int, int]:
+        """与新词表同步：只处理增减的词，返回 (新增数, 移除数)"""
+        target = {word for word in vocabulary if self._is_correctable(word)}
+        with self._lock:
+            current = set(self._vocabulary)
+        removed = self.remove_words(current - target)
+        added = self.add_words(target - current)
+        return added, removed
+
+    @staticmethod
+    def _is_correctable(word: str) -> bool:
+        """只纠正三个字符以上且不含数字的词（S01、1080p 等不参与纠错）"""
+        return len(word) >= 3 and not any(char.isdigit() for char in word)
+
+    def _allowed_distance(self, word: str) -> int:
+        if len(word) <= 5:
+            return min(1, self.max_distance)
+        return self.max_distance
+
+    @staticmethod
+    def edit_distance(a: str, b: str, limit: int) -> int:
+        """受限 Damerau-Levenshtein 距离（OSA），超过 limit 时返回 limit + 1"""
+        if abs(len(a) - len(b)) > limit:
+            return limit + 1
+        previous_previous: List[int] = []
+        previous = list(range(len(b) + 1))
+        for i in range(1, len(a) + 1):
+            current = [i] + [0] * len(b)
+            row_min = current[0]
+            for j in range(1, len(b) + 1):
+                cost = 0 if a[i - 1] == b[j - 1] else 1
+                value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+                if (i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                    value = min(value, previous_previous[j - 2] + 1)
+                current[j] = value
+                row_min = min(row_min, value)
+            if row_min > limit:
+                return limit + 1
+            previous_previous, previous = previous, current
+        return min(previous[-1], limit + 1)
+
+    def lookup(self, word: str) -> List[str]:
+        """返回编辑距离最近的词表词（词本身在词表中时直接返回）"""
+        with self._lock:
+            self._stats['lookups'] += 1
+            if word in self._vocabulary:
+                return [word]
+            if not self._is_correctable(word):
+                self._stats['misses'] += 1
+                return []
+
+            limit = self._allowed_distance(word)
+            candidates: Set[str] = set()
+            for variant in self._edits(word, limit):
+                bucket = self._deletes.get(variant)
+                if bucket:
+                    candidates.update(bucket)
+            length = len(word)
+
+            best_distance = limit + 1
+            best: List[str] = []
+            for candidate in candidates:
+                if abs(len(candidate) - length) > min(limit, best_distance):
+                    continue
+                distance = self.edit_distance(word, candidate, min(limit, best_distance))
+                if distance < best_distance:
+                    best_distance = distance
+                    best = [candidate]
+                elif distance == best_distance and distance <= limit:
+                    best.append(candidate)
+
+            if best:
+                self._stats['corrections'] += 1
+            else:
+                self._stats['misses'] += 1
+            return sorted(best)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取纠错统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['vocabulary_size'] = len(self._vocabulary)
+            stats['delete_entries'] = len(self._deletes)
+            return stats
+
+
+# ================== 智能索引缓存 ==================
+class SmartIndexCache:
+    """智能索引缓存 - v1.5.1 搜索优化
+
+    倒排表存储文件夹整数 ID（array），不再保存完整路径字符串。
+    除整词索引外还维护字符三元组（trigram）索引，用于部分词和子串匹配；
+    倒排表按 ID 递增追加，天然有序，可直接二分查找。
+    整词词表同时维护一份拼写纠错删除字典，首次需要纠错时才同步。
+    中日韩名称按字符二元组分词（见 CJKTokenizer），拼音键同时进入整词
+    与三元组索引。发布名（季、分辨率、编码等）解析一次存入 FacetIndex。
+    索引连同文件夹表可保存到磁盘，启动时直接加载。
+
+    每次构建、续建、加载或清空都使代数（generation）加一，并记录该代
+    新增的文件夹 ID 与消失的路径，供搜索结果缓存精确判断是否失效。
+    """
+
+    # 候选文件夹至少包含查询中这一比例的三元组
+    TRIGRAM_THRESHOLD = 0.6
+    # 磁盘索引格式版本，结构变化时递增使旧文件失效
+    INDEX_VERSION = 5
+    # 保留变更记录的代数，更早的缓存结果一律视为失效
+    MAX_TRACKED_GENERATIONS = 32
+
+    def __init__(self, cache_duration: int = 3600, tokenizer: Optional[CJKTokenizer] = None,
+                 release_parser: Optional[ReleaseNameParser] = None):
+        self.cache_duration = cache_duration
+        self.tokenizer = tokenizer or CJKTokenizer()
+        self.release_parser = release_parser or ReleaseNameParser()
+        self.facets = FacetIndex()
+        self._word_index: Dict[str, array] = {}  # word -> array of folder IDs
+        self._trigram_index: Dict[str, array] = {}  # trigram -> array of folder IDs
+        self.table: Optional[FolderTable] = None
+        self.ranker = BM25Ranker()
+        self._last_update = 0
+        self.indexed_count = 0
+        self.spell = SymSpellCorrector()
+        self._spell_synced = True
+        self._prefix_index: Optional['PrefixSearchIndex'] = None
+        self._lock = threading.Lock()
+        self.generation = 0
+        # (代数, 是否换了文件夹表, 新增 ID, 消失路径)；新增 ID 为 None 表示变化未知
+        self._changes: deque = deque(maxlen=self.MAX_TRACKED_GENERATIONS)
+
+    def _record_change(self, table_replaced: bool, added: Optional[array],
+                       removed: Set[str]) -> None:
+        """代数加一并记录本代的变化（调用方持锁）"""
+        self.generation += 1
+        self._changes.append((self.generation, table_replaced, added, removed))
+
+    def changes_since(self, generation: int) -> Optional[Tuple[array, Set[str]]]:
+        """自某一代以来新增的文件夹 ID（当前表中）与消失的路径
+
+        记录已被淘汰、其间有未知变化，或新增 ID 属于已被替换的旧表时
+        返回 None，调用方应视为全部失效。
+        """
+        with self._lock:
+            if generation == self.generation:
+                return array('L'), set()
+            pending = [change for change in self._changes if change[0] > generation]
+            if not pending or pending[0][0] != generation + 1:
+                return None
+            added_ids: Set[int] = set()
+            removed: Set[str] = set()
+            for position, (_, table_replaced, added, gone) in enumerate(pending):
+                if added is None or (table_replaced and position > 0):
+                    return None
+                added_ids.update(added)
+                removed.update(gone)
+            return array('L', sorted(added_ids)), removed
+
+    def affects(self, folder_ids: array, normalized_text: str) -> bool:
+        """这些（新增的）文件夹能否影响该查询的结果
+
+        与查询共有整词或三元组才可能得分；查询含词表外的词时，新词可能
+        改变拼写纠正，保守地视为有影响。
+        """
+        if not len(folder_ids):
+            return False
+        with self._lock:
+            word_index = self._word_index
+            trigram_index = self._trigram_index
+        words = set(self.tokenizer.tokenize(normalized_text))
+        if any(word not in word_index for word in words):
+            return True
+        candidates = set(folder_ids)
+        postings_lists = [word_index[word] for word in words]
+        postings_lists.extend(trigram_index[gram] for gram in self.trigrams(normalized_text)
+                              if gram in trigram_index)
+        for postings in postings_lists:
+            if len(postings) <= len(candidates):
+                if any(folder_id in candidates for folder_id in postings):
+                    return True
+            else:
+                size = len(postings)
+                for folder_id in folder_ids:
+                    position = bisect_left(postings, folder_id)
+                    if position < size and postings[position] == folder_id:
+                        return True
+        return False
+
+    def build_index(self, folders: Union[FolderTable, List[Path]], normalize_func,
+                    track_changes: bool = True) -> None:
+        """构建智能索引
+
+        同一张文件夹表续扫追加了新文件夹时，只为新增的 ID 建索引；
+        否则完整重建。track_changes 为真且换了文件夹表时与旧表比较，
+        记录新增与消失的文件夹（见 changes_since）。
+        """
+        table = folders if isinstance(folders, FolderTable) else FolderTable.from_paths(folders)
+
+        incremental = (table is self.table and len(table) >= self.indexed_count and
+                       not self.is_expired())
+        if incremental:
+            start = self.indexed_count
+            word_index = self._word_index
+            trigram_index = self._trigram_index
+            ranker = self.ranker
+            facets = self.facets
+        else:
+            start = 0
+            word_index = {}
+            trigram_index = {}
+            ranker = BM25Ranker()
+            facets = FacetIndex()
+        parse_release = self.release_parser.parse
+
+        new_words = []
+        normalized_names: List[str] = []
+        term_counts: List[int] = []
+        path_lengths: List[int] = []
+        tokenize = self.tokenizer.tokenize
+        pinyin_keys = self.tokenizer.pinyin_keys
+        # 同名文件夹（Season 01、Extras 等）只标准化、分词一次：名称段第二次
+        # 出现时才记下分析结果，只出现一次的名称不占额外内存
+        seen = bytearray(len(table._segments))
+        analyzed: Dict[int, Tuple] = {}
+        for folder_id in range(start, len(table)):
+            name_id = table.name_id(folder_id)
+            entry = analyzed.get(name_id)
+            if entry is None:
+                folder_name = table.name(folder_id)
+                try:
+                    # 含代理字符等无法编码的名称不参与索引
+                    folder_name.encode('utf-8')
+                    normalized_name = sys.intern(normalize_func(folder_name))
+                    release = parse_release(folder_name)
+                except UnicodeEncodeError:
+                    normalized_name = ""
+                    release = ReleaseInfo(title="")
+                terms = tokenize(normalized_name)
+                keys = pinyin_keys(normalized_name)
+                gram_source = f"{normalized_name} {' '.join(keys)}" if keys else normalized_name
+                entry = (normalized_name, release, len(terms), set(terms).union(keys),
+                         self.trigrams(gram_source))
+                if seen[name_id]:
+                    analyzed[name_id] = entry
+                else:
+                    seen[name_id] = 1
+            normalized_name, release, term_count, words, grams = entry
+            facets.add(release)
+            normalized_names.append(normalized_name)
+            term_counts.append(term_count)
+            path_lengths.append(table.path_length(folder_id))
+            for word in words:
+                postings = word_index.get(word)
+                if postings is None:
+                    postings = word_index[word] = array('L')
+                    new_words.append(word)
+                postings.append(folder_id)
+            for gram in grams:
+                postings = trigram_index.get(gram)
+                if postings is None:
+                    postings = trigram_index[gram] = array('L')
+                postings.append(folder_id)
+
+        ranker.extend(normalized_names, term_counts, path_lengths)
+
+        table_replaced = table is not self.table
+        if incremental:
+            added, removed = array('L', range(start, len(table))), set()
+        elif not table_replaced:
+            added, removed = array('L'), set()
+        elif track_changes and self.table is not None:
+            added, removed = table.diff(self.table)
+        else:
+            added, removed = None, set()
+
+        with self._lock:
+            self._word_index = word_index
+            self._trigram_index = trigram_index
+            self.ranker = ranker
+            self.facets = facets
+            self.table = table
+            self.indexed_count = len(table)
+            self._prefix_index = None
+            self._record_change(table_replaced, added, removed)
+            if not incremental:
+                self._last_update = time.time()
+                self._spell_synced = False
+
+        if incremental and self._spell_synced:
+            self.spell.add_words(new_words)
+
+    def query_terms(self, normalized_query: str) -> List[str]:
+        """查询分词；索引中不存在的中日韩二元组不计入
+
+        中文没有分词，跨词边界的二元组（"游戏第八季"中的"戏第"）多半
+        不是真实的词，若按缺失词扣分，多写几个字反而搜不到。
+        """
+        word_index = self._word_index
+        return [term for term in self.tokenizer.tokenize(normalized_query)
+                if term in word_index or not CJKTokenizer.is_cjk_bigram(term)]
+
+    def rank(self, normalized_query: str) -> Tuple[Any, Any]:
+        """BM25 得分（见 BM25Ranker.score）"""
+        return self.rank_many([normalized_query])[0]
+
+    def rank_many(self, normalized_queries: List[str], id_range: Optional[Tuple[int, int]] = None,
+                  corpus: Optional[Dict[str, Any]] = None) -> List[Tuple[Any, Any]]:
+        """多个查询一次打分（见 BM25Ranker.score_many）"""
+        if corpus is None:
+            queries = [(query, self.query_terms(query)) for query in normalized_queries]
+        else:
+            queries = [(query, corpus['terms'][query]) for query in normalized_queries]
+        return self.ranker.score_many(queries, self._word_index, id_range, corpus)
+
+    def corpus_stats(self, jobs: List[Tuple[str, Optional[str], List[int], Dict[str, Any]]]) -> Dict[str, Any]:
+        """一组查询打分所需的全局统计：查询词、各词文档频率、文件夹总数与平均词数
+
+        分片索引（见 shard_states）只有本区间的倒排表，凭这些统计得到与
+        完整索引一致的得分。
+        """
+        texts = {text for text, _, _, _ in jobs} | {corrected for _, corrected, _, _ in jobs if corrected}
+        terms = {text: self.query_terms(text) for text in texts}
+        with self._lock:
+            word_index, ranker = self._word_index, self.ranker
+        words = {word for query_terms in terms.values() for word in query_terms}
+        return {
+            'terms': terms,
+            'document_frequency': {word: len(word_index.get(word, ())) for word in words},
+            'total': len(ranker),
+            'average_length': ranker.average_length
+        }
+
+    def shard_states(self, ranges: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+        """按文件夹 ID 区间切出打分分片（可序列化，见 from_shard_state）
+
+        分片只含区间内的倒排表片段和名称；长度、路径长度、分面等按 ID
+        直接索引的小数组截取到区间末尾。倒排表只追加，续建不影响已取的区间。
+        """
+        with self._lock:
+            word_index, trigram_index = self._word_index, self._trigram_index
+            ranker, facets = self.ranker, self.facets
+        bounds = [start for start, _ in ranges] + [ranges[-1][1]]
+        states = [{'id_range': id_range, 'word_index': {}, 'trigram_index': {}} for id_range in ranges]
+        for name in ('word_index', 'trigram_index'):
+            for key, postings in list((word_index if name == 'word_index' else trigram_index).items()):
+                cuts = [bisect_left(postings, bound) for bound in bounds]
+                for shard, state in enumerate(states):
+                    if cuts[shard] < cuts[shard + 1]:
+                        state[name][key] = postings[cuts[shard]:cuts[shard + 1]]
+        for state in states:
+            start, end = state['id_range']
+            state['ranker'] = {
+                'names': [''] * start + ranker.names[start:end],
+                'doc_lengths': ranker.doc_lengths[:end],
+                'path_lengths': ranker.path_lengths[:end],
+                'average_length': ranker.average_length
+            }
+            state['facets'] = {
+                'columns': {facet: column[:end] for facet, column in facets.columns.items()},
+                'values': {facet: list(values) for facet, values in facets.values.items()},
+                'codes': {facet: dict(codes) for facet, codes in facets._codes.items()}
+            }
+        return states
+
+    @classmethod
+    def from_shard_state(cls, state: Dict[str, Any]) -> 'SmartIndexCache':
+        """由 shard_states 的结果重建只能用于区间打分的索引（score_jobs 须传 corpus）"""
+        index = cls(tokenizer=CJKTokenizer(pinyin=False))
+        index._word_index = state['word_index']
+        index._trigram_index = state['trigram_index']
+        ranker = BM25Ranker()
+        ranker.names = state['ranker']['names']
+        ranker.doc_lengths = state['ranker']['doc_lengths']
+        ranker.path_lengths = state['ranker']['path_lengths']
+        ranker._update_norms(state['ranker']['average_length'])
+        index.ranker = ranker
+        facets = FacetIndex()
+        facets.columns = state['facets']['columns']
+        facets.values = state['facets']['values']
+        facets._codes = state['facets']['codes']
+        index.facets = facets
+        index.indexed_count = state['id_range'][1]
+        return index
+
+    def score_jobs(self, jobs: List[Tuple[str, Optional[str], List[int], Dict[str, Any]]],
+                   min_score: float, k: int, partial_weight: float, correction_weight: float,
+                   id_range: Optional[Tuple[int, int]] = None,
+                   corpus: Optional[Dict[str, Any]] = None) -> List[Tuple[int, List[Tuple[int, float]]]]:
+        """为一组已纠错的查询打分并各选出前 k 个
+
+        每个查询合并 BM25（原查询与纠正后查询）、三元组部分匹配和完全
+        匹配的得分，再按分面过滤。给定 id_range 时只处理区间内的文件夹，
+        供多进程按区间并行（见 ScoringPool）；分片索引须同时给出 corpus。
+
+        Args:
+            jobs: [(参与打分的文本, 纠正后的文本或 None, 完全匹配 ID, 分面条件)]
+
+        Returns:
+            每个查询一项：(匹配总数, [(文件夹 ID, 得分)])
+        """
+        texts = [text for text, _, _, _ in jobs]
+        corrected_slots: List[Optional[int]] = []
+        for _, corrected, _, _ in jobs:
+            if corrected:
+                corrected_slots.append(len(texts))
+                texts.append(corrected)
+            else:
+                corrected_slots.append(None)
+        ranked = self.rank_many(texts, id_range, corpus)
+
+        results = []
+        for slot, (text, _, exact_ids, facets) in enumerate(jobs):
+            parts = [(*ranked[slot], 1.0)]
+            if corrected_slots[slot] is not None:
+                parts.append((*ranked[corrected_slots[slot]], correction_weight))
+
+            # 三元组重叠（部分词、子串），得分上限低于整词匹配
+            partial_scores = self.get_trigram_candidates(self.trigrams(text), id_range=id_range)
+            if partial_scores:
+                parts.append((list(partial_scores.keys()), list(partial_scores.values()), partial_weight))
+
+            if facets:
+                parts = [(*self.facets.filter(ids, scores, facets), weight) for ids, scores, weight in parts]
+            if id_range is not None:
+                exact_ids = [folder_id for folder_id in exact_ids if id_range[0] <= folder_id < id_range[1]]
+
+            # 堆选前 k 个：相似度 + 路径长度（更短的路径优先）
+            results.append(self.ranker.top_k(parts, exact_ids, min_score, k))
+        return results
+
+    def get_prefix_index(self) -> 'PrefixSearchIndex':
+        """输入即搜索的前缀索引，首次使用时构建，索引变化后重建"""
+        with self._lock:
+            prefix_index = self._prefix_index
+            word_index, ranker = self._word_index, self.ranker
+        if prefix_index is None:
+            prefix_index = PrefixSearchIndex(word_index, ranker)
+            with self._lock:
+                if self.ranker is ranker and len(ranker) == len(prefix_index):
+                    self._prefix_index = prefix_index
+        return prefix_index
+
+    def correct_words(self, search_words: Set[str]) -> Dict[str, str]:
+        """为不在词表中的搜索词查找纠正词，多个同距离候选时取出现次数最多的"""
+        corrections = {}
+        for word in search_words:
+            if word in self._word_index:
+                continue
+            if not self._spell_synced:
+                # 重建或从磁盘加载索引后，首次需要纠错时才同步词表
+                self.spell.sync(self._word_index.keys())
+                self._spell_synced = True
+            suggestions = self.spell.lookup(word)
+            if suggestions:
+                corrections[word] = max(
+                    suggestions, key=lambda term: len(self._word_index.get(term, ())))
+        return corrections
+
+    def get_candidate_folders(self, search_words: Set[str]) -> Set[int]:
+        """根据搜索词获取候选文件夹 ID"""
+        if not search_words:
+            return set()
+
+        candidates: Set[int] = set()
+        for word in set(self.tokenizer.tokenize(' '.join(search_words))):
+            postings = self._word_index.get(word)
+            if postings is not None:
+                # 返回包含任意搜索词的文件夹
+                candidates.update(postings)
+
+        return candidates
+
+    @staticmethod
+    def trigrams(normalized_text: str) -> Set[str]:
+        """提取字符三元组（不跨词；不足三个字符的词整体作为一项）"""
+        grams: Set[str] = set()
+        for word in normalized_text.split():
+            if len(word) < 3:
+                grams.add(word)
+            else:
+                grams.update(word[i:i + 3] for i in range(len(word) - 2))
+        return grams
+
+    def get_trigram_candidates(self, query_grams: Set[str], threshold: Optional[float] = None,
+                               id_range: Optional[Tuple[int, int]] = None) -> Dict[int, float]:
+        """按三元组重叠度获取候选文件夹
+
+        要求候选至少包含 ceil(threshold * n) 个查询三元组，因此它必然出现在
+        最短的 n - required + 1 个倒排表之一：只从这些表收集候选，再对其余
+        较长的表做二分查找校验，耗时取决于倒排表长度而非文件夹总数。
+
+        Returns:
+            {文件夹 ID: 查询三元组的覆盖比例}（给定 id_range 时只含区间内的文件夹）
+        """
+        if not query_grams:
+            return {}
+        threshold = self.TRIGRAM_THRESHOLD if threshold is None else threshold
+
+        with self._lock:
+            trigram_index = self._trigram_index
+        postings_lists = sorted((BM25Ranker.postings_range(trigram_index.get(gram, array('L')), id_range)
+                                 for gram in query_grams), key=len)
+        total = len(postings_lists)
+        required = max(1, math.ceil(round(threshold * total, 6)))
+        prefix_count = total - required + 1
+
+        counts = Counter()
+        for postings in postings_lists[:prefix_count]:
+            counts.update(postings)
+
+        for postings in postings_lists[prefix_count:]:
+            if not counts:
+                break
+            size = len(postings)
+            for folder_id in list(counts):
+                position = bisect_left(postings, folder_id)
+                if position < size and postings[position] == folder_id:
+                    counts[folder_id] += 1
+
+        return {folder_id: count / total for folder_id, count in counts.items() if count >= required}
+
+    def save(self, path: str, meta: Dict[str, Any]) -> bool:
+        """把索引连同文件夹表保存到磁盘（先写临时文件再替换）"""
+        return self.write_snapshot(path, self.snapshot(meta))
+
+    def snapshot(self, meta: Dict[str, Any]) -> Dict[str, Any]:
+        """取当前索引的引用（不复制），供 write_snapshot 在后台线程写盘
+
+        完整扫描的文件夹表已冻结，重建索引时换用新的结构，快照引用的
+        对象不会再被原地修改。
+        """
+        with self._lock:
+            return {
+                'version': self.INDEX_VERSION,
+                'meta': meta,
+                'built_at': self._last_update,
+                'table': self.table,
+                'word_index': self._word_index,
+                'trigram_index': self._trigram_index,
+                'ranker': self.ranker,
+                'facets': self.facets
+            }
+
+    @staticmethod
+    def write_snapshot(path: str, state: Dict[str, Any]) -> bool:
+        """序列化索引快照并写入磁盘（先写临时文件再替换）"""
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+            return True
+        except (OSError, pickle.PickleError) as e:
+            logger.debug(f"保存搜索索引失败: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+
+    def load(self, path: str, meta: Dict[str, Any]) -> bool:
+        """从磁盘加载索引；版本、元信息不符或已过期时返回 False"""
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, EOFError, ValueError, TypeError, AttributeError, pickle.UnpicklingError):
+            return False
 
-    def __init__(self, cache_duration: int = 3600):
-        self.cache_duration = cache_duration
-        self._word_index: Dict[str, Set[str]] = {}  # word -> set of folder paths
-        self._folder_words: Dict[str, Set[str]] = {}  # folder_path -> set of words
-        self._last_update = 0
+        if (not isinstance(state, dict) or state.get('version') != self.INDEX_VERSION or
+                state.get('meta') != meta or
+                time.time() - state.get('built_at', 0) > self.cache_duration):
+            return False
+
+        with self._lock:
+            self.table = state['table']
+            self._word_index = state['word_index']
+            self._trigram_index = state['trigram_index']
+            self.ranker = state['ranker']
+            self.facets = state['facets']
+            self.indexed_count = len(self.table)
+            self._last_update = state['built_at']
+            self._spell_synced = False
+            self._prefix_index = None
+            self._record_change(True, None, set())
+        return True
+
+    def clear(self) -> None:
+        """清空内存中的索引"""
+        with self._lock:
+            self._word_index = {}
+            self._trigram_index = {}
+            self.ranker = BM25Ranker()
+            self.facets = FacetIndex()
+            self.table = None
+            self.indexed_count = 0
+            self._last_update = 0
+            self._spell_synced = False
+            self._prefix_index = None
+            self._record_change(True, None, set())
+
+    def is_expired(self) -> bool:
+        """检查索引是否过期"""
+        return time.time() - self._last_update > self.cache_duration
+
+# ================== 输入即搜索 ==================
+class PrefixSearchSession:
+    """一个搜索框的连续输入状态
+
+    上一次查询若已求出完整候选集，下一次击键只是让查询更严格（最后一个
+    词继续输入、或追加新词）时，直接在这个候选集上过滤，不再从倒排表扫描。
+    """
+
+    def __init__(self):
+        self.index: Optional['PrefixSearchIndex'] = None
+        self.terms: List[str] = []
+        self.candidates: Optional[array] = None
+        self.reused = 0
+
+    def reset(self) -> None:
+        self.index = None
+        self.terms = []
+        self.candidates = None
+
+    def narrows(self, index: 'PrefixSearchIndex', terms: List[str]) -> bool:
+        """新查询的结果是否必然是上一次结果的子集"""
+        previous = self.terms
+        if self.index is not index or self.candidates is None or not previous:
+            return False
+        if len(terms) < len(previous) or terms[:len(previous) - 1] != previous[:-1]:
+            return False
+        return terms[len(previous) - 1].startswith(previous[-1])
+
+
+class PrefixSearchIndex:
+    """输入即搜索的前缀索引 - 有序词表 + 按静态排名存储的正排/倒排表
+
+    - 文件夹按静态排名编号（词数少、路径短的靠前，补全时更可能是要找的），
+      下文的"排名"即该编号，升序就是结果顺序
+    - 词表（分词结果及拼音键）排序后存为列表，以某前缀开头的词恰好是一段
+      连续的词号区间 [lo, hi)，二分查找定位
+    - 倒排表：每个词的排名升序表，全部拼接为一个 array
+    - 正排表：每个文件夹的词号升序表；"文件夹含以某前缀开头的词"只需在
+      它的词号表里二分查找 lo，无需合并该前缀下的所有倒排表
+    - 查询时以总长度最短的那个词的倒排表按排名顺序扫描（前缀覆盖多个词时
+      堆归并），其余词用正排表校验，凑够 k 个即停止
+    - 最后一个词按前缀匹配；之前已输完的词在词表中存在时按整词匹配
+    """
+
+    # 前缀覆盖的词超过这个数时不再多路归并，直接按排名顺序扫描全部文件夹
+    MAX_MERGE_TERMS = 4096
+    # 驱动表不超过这个长度时扫描到底，求出完整候选集供后续击键复用
+    COMPLETE_SCAN_LIMIT = 4096
+    # 前缀区间的上界字符
+    MAX_CHAR = '\U0010ffff'
+
+    def __init__(self, word_index: Dict[str, array], ranker: BM25Ranker):
+        self.size = len(ranker)
+        self.terms = sorted(word_index)
+        self.order = array('L')  # 排名 -> 文件夹 ID
+        self.term_offsets = array('L', [0])
+        self.postings = array('L')  # 按词拼接的排名表
+        self.folder_offsets = array('L', [0])
+        self.folder_terms = array('L')  # 按排名拼接的词号表
         self._lock = threading.Lock()
+        self._stats = {'queries': 0, 'session_reuses': 0, 'scanned': 0, 'total_ms': 0.0}
 
-    def build_index(self, folders: List[Path], normalize_func) -> None:
-        """构建智能索引"""
+        if not self.size:
+            self._view = memoryview(self.postings)
+            return
+
+        if np is not None:
+            self._build_vectorized(word_index, ranker)
+        else:
+            order = sorted(range(self.size), key=lambda i: (ranker.doc_lengths[i], ranker.path_lengths[i]))
+            self.order.extend(order)
+            rank_of = array('L', [0]) * self.size
+            for rank, folder_id in enumerate(order):
+                rank_of[folder_id] = rank
+            folder_terms: List[List[int]] = [[] for _ in range(self.size)]
+            for term_number, term in enumerate(self.terms):
+                ranks = sorted(rank_of[folder_id] for folder_id in word_index[term])
+                self.postings.extend(ranks)
+                self.term_offsets.append(len(self.postings))
+                for rank in ranks:
+                    folder_terms[rank].append(term_number)
+            for numbers in folder_terms:
+                self.folder_terms.extend(numbers)
+                self.folder_offsets.append(len(self.folder_terms))
+
+        self._view = memoryview(self.postings)
+
+    def _build_vectorized(self, word_index: Dict[str, array], ranker: BM25Ranker) -> None:
+        dtype = f'u{self.postings.itemsize}'
+        doc_lengths = np.frombuffer(ranker.doc_lengths, dtype=np.uint16)
+        path_lengths = np.frombuffer(ranker.path_lengths, dtype=f'u{ranker.path_lengths.itemsize}')
+        order = np.lexsort((path_lengths, doc_lengths))
+        rank_of = np.empty(self.size, dtype=np.int64)
+        rank_of[order] = np.arange(self.size)
+        self.order.frombytes(order.astype(dtype).tobytes())
+        if not self.terms:
+            self.folder_offsets.frombytes(np.zeros(self.size, dtype=dtype).tobytes())
+            return
+
+        lengths = np.fromiter((len(word_index[term]) for term in self.terms),
+                              dtype=np.int64, count=len(self.terms))
+        ids = np.concatenate([np.frombuffer(word_index[term], dtype=f'u{word_index[term].itemsize}')
+                              for term in self.terms]).astype(np.int64)
+        term_numbers = np.repeat(np.arange(len(self.terms)), lengths)
+        ranks = rank_of[ids]
+
+        by_term = np.lexsort((ranks, term_numbers))
+        self.postings.frombytes(ranks[by_term].astype(dtype).tobytes())
+        self.term_offsets.frombytes(np.cumsum(lengths).astype(dtype).tobytes())
+
+        by_rank = np.lexsort((term_numbers, ranks))
+        self.folder_terms.frombytes(term_numbers[by_rank].astype(dtype).tobytes())
+        counts = np.bincount(ranks, minlength=self.size)
+        self.folder_offsets.frombytes(np.cumsum(counts).astype(dtype).tobytes())
+
+    def __len__(self) -> int:
+        return self.size
+
+    def term_range(self, prefix: str) -> Tuple[int, int]:
+        """以 prefix 开头的词的词号区间"""
+        lo = bisect_left(self.terms, prefix)
+        return lo, bisect_left(self.terms, prefix + self.MAX_CHAR, lo)
+
+    def query_ranges(self, terms: List[str]) -> List[Tuple[int, int]]:
+        """查询词对应的词号区间：已输完的词优先整词匹配，最后一个词按前缀"""
+        ranges = []
+        for position, term in enumerate(terms):
+            lo, hi = self.term_range(term)
+            if position < len(terms) - 1 and lo < hi and self.terms[lo] == term:
+                hi = lo + 1
+            ranges.append((lo, hi))
+        return ranges
+
+    def _driver(self, lo: int, hi: int) -> Any:
+        """按排名升序产出含该区间内任一词的文件夹"""
+        offsets = self.term_offsets
+        if hi - lo == 1:
+            return self._view[offsets[lo]:offsets[lo + 1]]
+        return self._merge(self._view[offsets[term]:offsets[term + 1]] for term in range(lo, hi))
+
+    @staticmethod
+    def _merge(lists) -> Iterator[int]:
+        previous = -1
+        for rank in heapq.merge(*lists):
+            if rank != previous:
+                previous = rank
+                yield rank
+
+    def search(self, terms: List[str], k: int = 10,
+               session: Optional[PrefixSearchSession] = None) -> Tuple[List[int], bool]:
+        """每个查询词都是某个索引词前缀的文件夹，按静态排名取前 k 个
+
+        Returns:
+            (文件夹 ID 列表, 是否还有更多结果)
+        """
+        start_time = time.perf_counter()
+        if not terms or not self.size:
+            return [], False
+
+        ranges = self.query_ranges(terms)
+        if any(lo == hi for lo, hi in ranges):
+            hits, complete, scanned = array('L'), True, 0
+        else:
+            reuse = session is not None and session.narrows(self, terms)
+            if reuse:
+                source, checks = session.candidates, ranges
+                source_size = len(source)
+                session.reused += 1
+            else:
+                sizes = [self.term_offsets[hi] - self.term_offsets[lo] for lo, hi in ranges]
+                driver = min(range(len(ranges)), key=sizes.__getitem__)
+                lo, hi = ranges[driver]
+                source_size = sizes[driver]
+                if hi - lo > self.MAX_MERGE_TERMS:
+                    source, checks, source_size = range(self.size), ranges, self.size
+                else:
+                    source, checks = self._driver(lo, hi), ranges[:driver] + ranges[driver + 1:]
+
+            # 驱动表够短时扫描到底，得到完整候选集
+            limit = None if source_size <= self.COMPLETE_SCAN_LIMIT else k + 1
+            hits = array('L')
+            complete = True
+            scanned = 0
+            folder_offsets, folder_terms = self.folder_offsets, self.folder_terms
+            for rank in source:
+                scanned += 1
+                start, end = folder_offsets[rank], folder_offsets[rank + 1]
+                for lo, hi in checks:
+                    # 该文件夹的词号表中是否有落在 [lo, hi) 内的
+                    position = bisect_left(folder_terms, lo, start, end)
+                    if position == end or folder_terms[position] >= hi:
+                        break
+                else:
+                    hits.append(rank)
+                    if limit is not None and len(hits) >= limit:
+                        complete = False
+                        break
+
+            with self._lock:
+                self._stats['session_reuses'] += reuse
+
+        if session is not None:
+            session.index = self
+            session.terms = list(terms)
+            session.candidates = hits if complete else None
+
+        with self._lock:
+            self._stats['queries'] += 1
+            self._stats['scanned'] += scanned
+            self._stats['total_ms'] += (time.perf_counter() - start_time) * 1000
+        return [self.order[rank] for rank in hits[:k]], len(hits) > k
+
+    def get_stats(self) -> Dict[str, Any]:
         with self._lock:
-            self._word_index.clear()
-            self._folder_words.clear()
+            stats = dict(self._stats)
+        total_ms = stats.pop('total_ms')
+        stats['avg_ms'] = round(total_ms / stats['queries'], 3) if stats['queries'] else 0.0
+        stats['terms'] = len(self.terms)
+        stats['folders'] = self.size
+        return stats
+
+# ================== 多进程打分 ==================
+# 打分子进程持有的索引分片（由进程池 initializer 载入）
+_SCORING_SHARD: Optional[SmartIndexCache] = None
+_SCORING_RANGE: Optional[Tuple[int, int]] = None
+
+
+def _init_scoring_worker(state: Dict[str, Any]) -> None:
+    """子进程初始化：由父进程发来的分片数据重建区间索引"""
+    global _SCORING_SHARD, _SCORING_RANGE
+    _SCORING_SHARD = SmartIndexCache.from_shard_state(state)
+    _SCORING_RANGE = state['id_range']
+
+
+def _scoring_worker_ready(_: int) -> int:
+    return os.getpid()
+
+
+def _score_shard(jobs: List[Tuple[str, Optional[str], List[int], Dict[str, Any]]],
+                 corpus: Dict[str, Any], min_score: float, k: int, partial_weight: float,
+                 correction_weight: float) -> List[Tuple[int, List[Tuple[int, float]]]]:
+    """子进程中为本分片的文件夹 ID 区间打分（见 SmartIndexCache.score_jobs）"""
+    return _SCORING_SHARD.score_jobs(jobs, min_score, k, partial_weight, correction_weight,
+                                     _SCORING_RANGE, corpus)
+
+
+class ScoringPool:
+    """候选打分进程池 - 持久、后台启动，每个子进程持有一个文件夹 ID 区间的分片
+
+    打分是纯 Python 的字典与集合运算，线程受 GIL 限制无法并行。
+    索引很大且查询涉及的倒排表很长时，把文件夹 ID 空间切成若干区间，
+    各子进程只持有并处理自己区间内的倒排表片段，返回本区间前 k 名，
+    父进程合并；文档频率等全局统计随查询一并发送（见 corpus_stats）。
+
+    子进程以 spawn 方式启动（父进程有多个线程，fork 可能继承被占用的
+    锁），分片数据在启动时发送。进程池在后台构建，就绪前在当前进程
+    打分。续建只在 ID 空间末尾追加文件夹，追加部分在当前进程补打分，
+    新增超过 REBUILD_GROWTH 或换了文件夹表时才在后台重建进程池。
+    """
+
+    # 索引至少这么多文件夹、查询倒排表总长至少这么多时才并行
+    MIN_FOLDERS = 200000
+    MIN_POSTINGS = 100000
+    # 分片之后新增的文件夹超过这一比例时重建进程池
+    REBUILD_GROWTH = 0.1
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or min(os.cpu_count() or 1, 8)
+        # 每个分片一个单进程执行器，保证查询送到持有该分片的子进程
+        self._executors: List[ProcessPoolExecutor] = []
+        self._ranges: List[Tuple[int, int]] = []
+        self._index: Optional[SmartIndexCache] = None
+        self._table: Optional[FolderTable] = None
+        self._sharded_count = 0
+        self._builder: Optional[threading.Thread] = None
+        self._epoch = 0  # 关闭时递增，作废尚未完成的后台构建
+        self._lock = threading.Lock()
+        self._stats = {'starts': 0, 'parallel_batches': 0, 'inline_batches': 0, 'failures': 0}
 
-            for folder in folders:
-                folder_path = str(folder)
-                normalized_name = normalize_func(folder.name)
-                words = set(normalized_name.split())
+    def should_parallelize(self, index: SmartIndexCache,
+                           jobs: List[Tuple[str, Optional[str], List[int], Dict[str, Any]]]) -> bool:
+        """候选规模是否值得并行：按查询涉及的整词与三元组倒排表总长估计"""
+        if self.max_workers < 2 or index.indexed_count < self.MIN_FOLDERS:
+            return False
+        word_index = index._word_index
+        trigram_index = index._trigram_index
+        volume = 0
+        for text, corrected, _, _ in jobs:
+            for source in (text, corrected) if corrected else (text,):
+                volume += sum(len(word_index.get(word, ())) for word in index.tokenizer.tokenize(source))
+            volume += sum(len(trigram_index.get(gram, ())) for gram in index.trigrams(text))
+            if volume >= self.MIN_POSTINGS:
+                return True
+        return False
 
-                self._folder_words[folder_path] = words
+    def _usable(self, index: SmartIndexCache) -> bool:
+        """现有分片能否用于该索引：同一张文件夹表，且只在末尾追加过（调用方持锁）"""
+        return (bool(self._executors) and self._index is index and self._table is index.table and
+                index.indexed_count >= self._sharded_count)
+
+    def _needs_rebuild(self, index: SmartIndexCache) -> bool:
+        return (not self._usable(index) or
+                index.indexed_count > self._sharded_count * (1 + self.REBUILD_GROWTH))
+
+    def _start_build(self, index: SmartIndexCache) -> threading.Thread:
+        """在后台构建进程池（已在构建时直接返回该线程），调用方持锁"""
+        if self._builder is None:
+            self._builder = threading.Thread(target=self._build, args=(index, self._epoch),
+                                             name='scoring-pool-build', daemon=True)
+            self._builder.start()
+        return self._builder
+
+    def _build(self, index: SmartIndexCache, epoch: int) -> None:
+        executors: List[ProcessPoolExecutor] = []
+        try:
+            with index._lock:
+                table, total = index.table, index.indexed_count
+            step = -(-total // self.max_workers)
+            ranges = [(start, min(start + step, total)) for start in range(0, total, step)]
+            states = index.shard_states(ranges)
+            context = multiprocessing.get_context('spawn')
+            for state in states:
+                executors.append(ProcessPoolExecutor(max_workers=1, mp_context=context,
+                                                     initializer=_init_scoring_worker, initargs=(state,)))
+            del states
+            # 等全部子进程载入分片后再启用
+            for future in [executor.submit(_scoring_worker_ready, 0) for executor in executors]:
+                future.result()
+        except (BrokenProcessPool, OSError, pickle.PickleError) as e:
+            logger.debug(f"打分进程池启动失败: {e}")
+            for executor in executors:
+                executor.shutdown(wait=False, cancel_futures=True)
+            with self._lock:
+                self._stats['failures'] += 1
+                self._builder = None
+            return
 
-                for word in words:
-                    if word not in self._word_index:
-                        self._word_index[word] = set()
-                    self._word_index[word].add(folder_path)
+        with self._lock:
+            self._builder = None
+            if epoch != self._epoch:
+                stale = executors
+            else:
+                stale = self._executors
+                self._executors, self._ranges = executors, ranges
+                self._index, self._table, self._sharded_count = index, table, total
+                self._stats['starts'] += 1
+        for executor in stale:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def prepare(self, index: SmartIndexCache, timeout: Optional[float] = None) -> bool:
+        """为该索引构建进程池并等待就绪，返回是否可用"""
+        with self._lock:
+            builder = self._start_build(index) if self._needs_rebuild(index) else None
+        if builder is not None:
+            builder.join(timeout)
+        with self._lock:
+            return self._usable(index)
 
-            self._last_update = time.time()
+    def score(self, index: SmartIndexCache, jobs: List[Tuple[str, Optional[str], List[int], Dict[str, Any]]],
+              min_score: float, k: int, partial_weight: float,
+              correction_weight: float) -> List[Tuple[int, List[Tuple[int, float]]]]:
+        """为一组查询打分（规则见 SmartIndexCache.score_jobs），必要时并行"""
+        if not self.should_parallelize(index, jobs):
+            with self._lock:
+                self._stats['inline_batches'] += 1
+            return index.score_jobs(jobs, min_score, k, partial_weight, correction_weight)
 
-    def get_candidate_folders(self, search_words: Set[str]) -> Set[str]:
-        """根据搜索词获取候选文件夹"""
-        if not search_words:
-            return set()
+        with self._lock:
+            if self._needs_rebuild(index):
+                self._start_build(index)
+            usable = self._usable(index)
+            executors, sharded_count = self._executors, self._sharded_count
+            if not usable:
+                self._stats['inline_batches'] += 1
+        if not usable:
+            return index.score_jobs(jobs, min_score, k, partial_weight, correction_weight)
+
+        corpus = index.corpus_stats(jobs)
+        try:
+            futures = [executor.submit(_score_shard, jobs, corpus, min_score, k, partial_weight,
+                                       correction_weight) for executor in executors]
+            partials = []
+            total = index.indexed_count
+            if total > sharded_count:
+                # 分片之后追加的文件夹在当前进程补打分
+                partials.append(index.score_jobs(jobs, min_score, k, partial_weight, correction_weight,
+                                                 (sharded_count, total), corpus))
+            partials.extend(future.result() for future in futures)
+        except (BrokenProcessPool, OSError) as e:
+            logger.debug(f"打分进程池不可用，改为当前进程打分: {e}")
+            with self._lock:
+                self._stats['failures'] += 1
+                self._shutdown_executors()
+            return index.score_jobs(jobs, min_score, k, partial_weight, correction_weight)
 
-        candidate_sets = []
-        for word in search_words:
-            if word in self._word_index:
-                candidate_sets.append(self._word_index[word])
+        with self._lock:
+            self._stats['parallel_batches'] += 1
+        path_lengths = index.ranker.path_lengths
+        results = []
+        for job_number in range(len(jobs)):
+            match_count = sum(partial[job_number][0] for partial in partials)
+            candidates = [match for partial in partials for match in partial[job_number][1]]
+            top = heapq.nsmallest(k, candidates,
+                                  key=lambda item: (-item[1], path_lengths[item[0]], item[0]))
+            results.append((match_count, top))
+        return results
 
-        if not candidate_sets:
-            return set()
+    def _shutdown_executors(self) -> None:
+        """关闭全部分片进程（调用方持锁）"""
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors, self._ranges = [], []
+        self._index, self._table, self._sharded_count = None, None, 0
 
-        # 返回包含任意搜索词的文件夹
-        return set.union(*candidate_sets)
+    def shutdown(self) -> None:
+        """关闭进程池（正在进行的后台构建完成后即丢弃）"""
+        with self._lock:
+            self._epoch += 1
+            self._shutdown_executors()
 
-    def is_expired(self) -> bool:
-        """检查索引是否过期"""
-        return time.time() - self._last_update > self.cache_duration
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            'workers': self.max_workers,
+            'running': bool(self._executors),
+            'sharded_folders': self._sharded_count,
+            'building': self._builder is not None
+        }
 
 
 # ================== 内存分析器 ==================
@@ -3107,6 +6834,9 @@ class MemoryAnalyzer:
 
 
 # ================== 增强内存管理器 ==================
+import weakref
+
+
 class MemoryManager:
     """内存管理器 - v1.5.1 深度内存优化"""
 
@@ -3119,6 +6849,19 @@ class MemoryManager:
         self._lock = threading.Lock()
         self._analyzer = MemoryAnalyzer()
         self._cleanup_threshold = 0.8  # 80% 内存使用时触发清理
+        # 可收缩的缓存（提供 shrink(fraction) -> 释放字节数），弱引用不延长其生命周期
+        self._caches = weakref.WeakSet()
+
+    def register_cache(self, cache: Any) -> None:
+        """登记可收缩的缓存，内存清理时按 LRU 收缩而非只依赖垃圾回收"""
+        with self._lock:
+            self._caches.add(cache)
+
+    def shrink_caches(self, fraction: float = 0.5) -> int:
+        """把已登记的缓存收缩到当前占用的 fraction，返回释放的估算字节数"""
+        with self._lock:
+            caches = list(self._caches)
+        return sum(cache.shrink(fraction) for cache in caches)
 
     def get_memory_usage(self) -> Dict[str, Any]:
         """获取详细内存使用情况"""
@@ -3228,6 +6971,7 @@ class MemoryManager:
         cleaned_stats = {
             'memory_pools_cleaned': 0,
             'object_cache_cleaned': 0,
+            'cache_bytes_freed': 0,
             'gc_collected': 0,
             'freed_mb': 0
         }
@@ -3235,6 +6979,9 @@ class MemoryManager:
         # 记录清理前的内存使用
         before_memory = self.get_memory_usage()['rss_mb']
 
+        # 先收缩已登记的缓存（淘汰最久未使用的一半）
+        cleaned_stats['cache_bytes_freed'] = self.shrink_caches(0.5)
+
         with self._lock:
             # 清理内存池
             for pool_name in list(self._memory_pools.keys()):
@@ -3279,7 +7026,8 @@ class MemoryManager:
             'pool_stats': {
                 'total_pools': len(self._memory_pools),
                 'total_cached_objects': sum(len(pool) for pool in self._memory_pools.values()),
-                'object_cache_size': len(self._object_cache)
+                'object_cache_size': len(self._object_cache),
+                'registered_caches': len(self._caches)
             },
             'recommendations': self._generate_memory_recommendations(current_usage)
         }
@@ -3367,17 +7115,24 @@ class AsyncIOProcessor:
             self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent)
         return self._executor
 
-    async def async_directory_scan_native(self, base_path: Path, max_depth: int = 3) -> List[Path]:
+    async def async_directory_scan_native(self, base_path: Path, max_depth: int = 3,
+                                          cancel_token: Optional['ScanCancelToken'] = None) -> List[Path]:
         """原生异步目录扫描"""
         import asyncio
 
         folders = []
         semaphore = asyncio.Semaphore(self.max_concurrent)
+        rules = get_scan_ignore_rules()
+        root = str(base_path)
 
         async def scan_directory(path: Path, depth: int):
             if depth >= max_depth:
                 return
+            if cancel_token and cancel_token.cancelled:
+                return
 
+            # 信号量只保护目录读取本身，不能在等待子目录时持有，否则并发数
+            # 被父目录占满后子目录永远拿不到信号量（死锁）
             async with semaphore:
                 try:
                     # 异步扫描目录
@@ -3385,94 +7140,78 @@ class AsyncIOProcessor:
                         self._get_executor(),
                         lambda: list(os.scandir(path))
                     )
+                except (PermissionError, OSError):
+                    return
 
-                    subdirs = []
-                    for entry in entries:
-                        if entry.is_dir(follow_symlinks=False):
-                            folder_path = Path(entry.path)
-                            folders.append(folder_path)
-                            if depth + 1 < max_depth:
-                                subdirs.append(folder_path)
-
-                    # 并发扫描子目录
-                    if subdirs:
-                        tasks = [scan_directory(subdir, depth + 1) for subdir in subdirs]
-                        await asyncio.gather(*tasks, return_exceptions=True)
+            subdirs = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if rules.should_prune(entry, root, True):
+                            continue
+                        folder_path = Path(entry.path)
+                        folders.append(folder_path)
+                        if depth + 1 < max_depth:
+                            subdirs.append(folder_path)
+                except OSError:
+                    continue
 
-                except (PermissionError, OSError):
-                    pass
+            # 并发扫描子目录
+            if subdirs:
+                tasks = [scan_directory(subdir, depth + 1) for subdir in subdirs]
+                await asyncio.gather(*tasks, return_exceptions=True)
 
         await scan_directory(base_path, 0)
         return folders
 
-    def async_directory_scan(self, base_path: Path, max_depth: int = 3) -> List[Path]:
-        """异步目录扫描 - 兼容接口"""
+    def async_directory_scan(self, base_path: Path, max_depth: int = 3,
+                             cancel_token: Optional['ScanCancelToken'] = None) -> List[Path]:
+        """异步目录扫描 - 兼容接口
+
+        cancel_token 触发（取消或超过截止时间）后不再进入新的目录，
+        已发现的文件夹照常返回，调用方可通过令牌状态判断结果是否完整。
+        """
         loop = self._get_event_loop()
         if loop is None:
             # 回退到线程池实现
-            return self._async_directory_scan_threaded(base_path, max_depth)
+            return self._async_directory_scan_threaded(base_path, max_depth, cancel_token)
 
         try:
             import asyncio
             if loop.is_running():
                 # 如果循环正在运行，使用 run_in_executor
-                future = asyncio.ensure_future(self.async_directory_scan_native(base_path, max_depth))
+                future = asyncio.ensure_future(
+                    self.async_directory_scan_native(base_path, max_depth, cancel_token))
                 return asyncio.run_coroutine_threadsafe(future, loop).result(timeout=30)
             else:
                 # 如果循环未运行，直接运行
-                return loop.run_until_complete(self.async_directory_scan_native(base_path, max_depth))
+                return loop.run_until_complete(
+                    self.async_directory_scan_native(base_path, max_depth, cancel_token))
         except Exception:
             # 异常时回退到线程池实现
-            return self._async_directory_scan_threaded(base_path, max_depth)
-
-    def _async_directory_scan_threaded(self, base_path: Path, max_depth: int = 3) -> List[Path]:
-        """线程池版本的异步目录扫描"""
-        import queue
-        import threading
-
-        result_queue = queue.Queue()
-        scan_queue = queue.Queue()
-        scan_queue.put((base_path, 0))
+            return self._async_directory_scan_threaded(base_path, max_depth, cancel_token)
 
-        def worker():
-            while True:
-                try:
-                    path, depth = scan_queue.get(timeout=1)
-                    if depth >= max_depth:
-                        scan_queue.task_done()
-                        continue
-
-                    try:
-                        with os.scandir(path) as entries:
-                            for entry in entries:
-                                if entry.is_dir(follow_symlinks=False):
-                                    folder_path = Path(entry.path)
-                                    result_queue.put(folder_path)
-                                    if depth + 1 < max_depth:
-                                        scan_queue.put((folder_path, depth + 1))
-                    except (PermissionError, OSError):
-                        pass
-
-                    scan_queue.task_done()
-                except queue.Empty:
-                    break
-
-        # 启动工作线程
-        threads = []
-        for _ in range(min(4, self.max_concurrent)):
-            t = threading.Thread(target=worker)
-            t.daemon = True
-            t.start()
-            threads.append(t)
-
-        # 等待完成
-        scan_queue.join()
-
-        # 收集结果
+    def _async_directory_scan_threaded(self, base_path: Path, max_depth: int = 3,
+                                       cancel_token: Optional['ScanCancelToken'] = None) -> List[Path]:
+        """线程池版本的异步目录扫描 - 并发数由挂载点的延迟统计决定"""
         folders = []
-        while not result_queue.empty():
-            folders.append(result_queue.get())
+        lock = threading.Lock()
+
+        def visitor(entry, depth, mount) -> bool:
+            _ = depth, mount
+            try:
+                if not entry.is_dir(follow_symlinks=False):
+                    return False
+            except OSError:
+                return False
+            with lock:
+                folders.append(Path(entry.path))
+            return True
 
+        if max_depth <= 0:
+            return folders
+        AdaptiveDirectoryWalker().walk(base_path, visitor, max_depth=max_depth - 1,
+                                       cancel_token=cancel_token)
         return folders
 
     async def async_file_operations_native(self, operations: List[Tuple[str, Path, Any]]) -> List[Any]:
@@ -3697,6 +7436,8 @@ class AsyncFileProcessor:
             if depth >= max_depth:
                 return
 
+            # 信号量只覆盖目录读取和文件 stat，等待子目录前释放，避免死锁
+            subdirs = []
             async with semaphore:
                 try:
                     loop = asyncio.get_event_loop()
@@ -3706,7 +7447,6 @@ class AsyncFileProcessor:
                         None, lambda: list(os.scandir(path))
                     )
 
-                    subdirs = []
                     files = []
 
                     for entry in entries:
@@ -3735,14 +7475,14 @@ class AsyncFileProcessor:
                     if files:
                         result['files'].extend(files)
 
-                    # 并发扫描子目录
-                    if subdirs:
-                        tasks = [scan_directory(subdir, depth + 1) for subdir in subdirs]
-                        await asyncio.gather(*tasks, return_exceptions=True)
-
                 except (PermissionError, OSError) as e:
                     result['errors'].append(f"扫描目录失败 {path}: {e}")
 
+            # 并发扫描子目录
+            if subdirs:
+                tasks = [scan_directory(subdir, depth + 1) for subdir in subdirs]
+                await asyncio.gather(*tasks, return_exceptions=True)
+
         await scan_directory(base_path, 0)
         return result
 
@@ -4055,6 +7795,169 @@ class FastSimilarityCalculator:
         return 0.0
 
 
+# ================== 流式目录扫描 ==================
+class ScanCancelToken:
+    """协作式扫描取消令牌 - 支持手动取消和截止时间
+
+    替代 signal.alarm 超时方案：不依赖信号，可在队列工作线程、Flask
+    请求线程等任意线程中使用。扫描器在处理每个目录前检查 cancelled。
+    """
+
+    def __init__(self, timeout: Optional[float] = None, deadline: Optional[float] = None):
+        self._event = threading.Event()
+        if deadline is None and timeout is not None:
+            deadline = time.monotonic() + timeout
+        self.deadline = deadline  # 基于 time.monotonic() 的截止时间
+        self.reason = ""
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """请求取消扫描"""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """是否已取消（包括超过截止时间）"""
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+            return True
+        return False
+
+    def remaining(self) -> Optional[float]:
+        """距截止时间的剩余秒数，无截止时间时返回 None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+
+class FolderScanCursor:
+    """可恢复的文件夹扫描游标
+
+    按广度优先顺序记录扫描进度：ready 为已发现但尚未产出的文件夹，
+    pending 为尚未列出内容的目录。扫描被取消后保留游标，下次调用
+    从中断处继续，而不是重新开始并返回偏向前几个子目录的截断结果。
+    """
+
+    def __init__(self, root: Path, max_depth: int = 3):
+        self.root = Path(root)
+        self.max_depth = max_depth
+        self.ready: deque = deque()
+        self.pending: deque = deque([(str(self.root), 0)])
+        self.scanned_dirs = 0
+        self.yielded = 0
+
+    @property
+    def exhausted(self) -> bool:
+        """扫描是否已全部完成"""
+        return not self.ready and not self.pending
+
+
+# ================== 历史选择热缓存 ==================
+class SelectionHotCache:
+    """历史选择热缓存 - 重复查询直接返回上次选中的文件夹
+
+    以标准化后的查询为键（"Game.of.Thrones.1080p" 与 "game of thrones"
+    命中同一条），记录用户选中的文件夹及其目录 mtime。命中时只对这几个
+    路径各做一次 stat：全部存在且 mtime 未变才返回，否则整条作废，回退到
+    完整搜索。条目按 LRU 保留最近 max_queries 个查询。
+    """
+
+    MAX_QUERIES = 1000
+    MAX_PATHS = 10
+
+    def __init__(self, normalize_func: Callable[[str], str], max_queries: int = MAX_QUERIES):
+        self.normalize_func = normalize_func
+        self.max_queries = max_queries
+        self._entries: 'OrderedDict[str, List[Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0}
+
+    def _key(self, query: str) -> str:
+        return self.normalize_func(query) if query else ""
+
+    @staticmethod
+    def _mtime_ns(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def record(self, query: str, selections: List[Tuple[str, float]]) -> List[Dict[str, Any]]:
+        """记录一次选择 [(路径, 得分)]，返回该查询保存的全部选择（可持久化）"""
+        key = self._key(query)
+        if not key:
+            return []
+        fresh = []
+        for path, score in selections:
+            mtime_ns = self._mtime_ns(path)
+            if mtime_ns is not None:
+                fresh.append({'path': path, 'mtime_ns': mtime_ns, 'score': score})
+        with self._lock:
+            paths = {item['path'] for item in fresh}
+            kept = [item for item in self._entries.pop(key, []) if item['path'] not in paths]
+            entry = (fresh + kept)[:self.MAX_PATHS]
+            if entry:
+                self._store(key, entry)
+        return entry
+
+    def _store(self, key: str, entry: List[Dict[str, Any]]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_queries:
+            self._entries.popitem(last=False)
+
+    def load(self, records: List[Tuple[str, List[Dict[str, Any]]]]) -> int:
+        """从搜索历史载入 [(查询, 选择列表)]，按从旧到新的顺序"""
+        loaded = 0
+        with self._lock:
+            for query, entry in records:
+                key = self._key(query)
+                entry = [item for item in entry
+                         if isinstance(item, dict) and 'path' in item and 'mtime_ns' in item]
+                if key and entry:
+                    self._store(key, entry[:self.MAX_PATHS])
+                    loaded += 1
+        return loaded
+
+    def lookup(self, query: str) -> Optional[List[Tuple[str, float]]]:
+        """上次为该查询选中的 [(路径, 得分)]；没有记录或已失效时返回 None"""
+        key = self._key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+
+        # 路径消失或目录内容变化（mtime 改变）时整条作废
+        if any(self._mtime_ns(item['path']) != item['mtime_ns'] for item in entry):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                self.stats['stale'] += 1
+            return None
+
+        with self._lock:
+            self.stats['hits'] += 1
+        return [(item['path'], item.get('score', 1.0)) for item in entry]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses'] + self.stats['stale']
+            return {
+                **self.stats,
+                'queries': len(self._entries),
+                'hit_rate': self.stats['hits'] / lookups if lookups else 0.0
+            }
+
+
 # ================== 文件匹配器 ==================
 class FileMatcher:
     """文件匹配器 - v1.5.1 高性能搜索优化版本"""
@@ -4070,7 +7973,35 @@ class FileMatcher:
         'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had'
     }
 
-    SEPARATORS = ['.', '_', '-', ':', '|', '\\', '/', '+', '(', ')', '[', ']']
+    SEPARATORS = ['.', '_', '-', ':', '|', '\\', '/', '+', '(', ')', '[', ']',
+                  '【', '】', '「', '」', '《', '》', '（', '）', '：', '，', '、', '·', '・']
+
+    SEPARATOR_TABLE = str.maketrans(dict.fromkeys(SEPARATORS, ' '))
+
+    # 标准化时去掉的质量标识（一个正则一次替换）
+    NORMALIZE_DROP_PATTERN = re.compile(
+        r'\b(?:720p|1080p|4k|uhd|hd|sd|bluray|bdrip|webrip|hdtv|'
+        r'x264|x265|h264|h265|hevc|aac|ac3|dts|mp3)\b')
+    # 年份只在去掉后仍有其他词时才去掉（"1917"、"2012" 这类片名本身就是年份）
+    NORMALIZE_YEAR_PATTERN = re.compile(r'\b(?:19|20)\d{2}\b')
+    NORMALIZE_MEMO_SIZE = 4096
+
+    # 中日韩字符与拉丁字母/数字相邻处（"权力的游戏s08"）插入空格
+    SCRIPT_BOUNDARY_PATTERN = re.compile(
+        r'(?<=[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af])(?=[a-z0-9])|'
+        r'(?<=[a-z0-9])(?=[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af])')
+
+    # 三元组覆盖比例折算为相似度时的权重
+    PARTIAL_MATCH_WEIGHT = 0.85
+    # 拼写纠正后的查询得分权重
+    CORRECTION_WEIGHT = 0.95
+    # 各缓存命名空间的字节预算（估算值），超出时按 LRU 淘汰
+    CACHE_BUDGETS = {
+        'results': 16 * 1024 * 1024,
+    }
+    # 搜索结果按索引代数失效（见 _cached_results_valid），不按时间过期
+    CACHE_TTLS = {'results': None}
+    FOLDER_INFO_CACHE_BYTES = 16 * 1024 * 1024
 
     def __init__(self, base_directory: str, enable_cache: bool = True,
                  cache_duration: int = 3600, min_score: float = 0.6,
@@ -4078,406 +8009,655 @@ class FileMatcher:
         self.base_directory = Path(base_directory)
         self.min_score = min_score
         self.max_workers = max_workers
-        self.cache = SearchCache(cache_duration) if enable_cache else None
-        self.folder_info_cache = SearchCache(cache_duration) if enable_cache else None
+        self.cache = (SearchCache(cache_duration, namespace_budgets=self.CACHE_BUDGETS,
+                                  namespace_ttls=self.CACHE_TTLS)
+                      if enable_cache else None)
+        self.folder_info_cache = (SearchCache(cache_duration, max_bytes=self.FOLDER_INFO_CACHE_BYTES)
+                                  if enable_cache else None)
+        # 文件夹信息的磁盘缓存，与 CLI/Web 其他进程共享
+        self.folder_info_store = get_directory_store() if enable_cache else None
 
         # 初始化性能监控和内存管理
         self.performance_monitor = PerformanceMonitor()
         self.memory_manager = MemoryManager()
+        # 内存吃紧时由内存管理器收缩缓存
+        for cache in (self.cache, self.folder_info_cache):
+            if cache is not None:
+                self.memory_manager.register_cache(cache)
 
         # 初始化智能索引
         self.smart_index = SmartIndexCache(cache_duration)
+        # 发布名解析器与索引共用，文件夹信息中的剧集也由它解析
+        self.release_parser = self.smart_index.release_parser
+        # 大索引上的候选打分进程池（首次需要并行时才启动）
+        self.scoring_pool = ScoringPool()
 
         # 初始化异步处理器
         self.async_processor = AsyncIOProcessor(max_workers)
 
         # 简化的相似度计算
         self.similarity_calc = FastSimilarityCalculator()
-        self._compiled_patterns = self._compile_quality_patterns()
+        # 查询标准化的记忆化（文件夹名称在建索引时标准化一次，存入索引）
+        self._normalize_memo = lru_cache(maxsize=self.NORMALIZE_MEMO_SIZE)(self._normalize_uncached)
+        self._word_set_memo = lru_cache(maxsize=self.NORMALIZE_MEMO_SIZE)(
+            lambda text: frozenset(self._normalize_string(text).split()))
+        # 重复查询的快速路径：直接返回历史上选中的文件夹，完整搜索放到后台
+        self.hot_results = SelectionHotCache(self._normalize_string)
+        self._refine_executor: Optional[ThreadPoolExecutor] = None
+        self._refine_future = None
+
+        # 挂载点感知的目录遍历（网络挂载自动提高并发）
+        self.io_monitor = SCAN_IO_MONITOR
+        self.dir_walker = AdaptiveDirectoryWalker(self.io_monitor)
+        self._scan_executor: Optional[ThreadPoolExecutor] = None
+        # 完整扫描后的磁盘索引在后台保存
+        self._index_save_executor: Optional[ThreadPoolExecutor] = None
+        self._index_save_future = None
+
+        # 完整扫描的文件夹表：max_depth -> (扫描时间, 文件夹表)。索引本就引用着它，
+        # 不放进可淘汰的缓存，避免淘汰后重新加载磁盘索引导致索引换代
+        self._folder_tables: Dict[int, Tuple[float, FolderTable]] = {}
+
+        # 未完成的流式扫描：max_depth -> (游标, 已发现的文件夹表)
+        self._partial_scans: Dict[int, Tuple[FolderScanCursor, FolderTable]] = {}
 
         if not self.base_directory.exists():
             logger.warning(f"基础目录不存在: {self.base_directory}")
 
-    def _compile_quality_patterns(self) -> List:
-        """预编译正则表达式模式"""
-        import re
-        quality_patterns = [
-            r'\b(720p|1080p|4k|uhd|hd|sd|bluray|bdrip|webrip|hdtv)\b',
-            r'\b(x264|x265|h264|h265|hevc)\b',
-            r'\b(aac|ac3|dts|mp3)\b'
-        ]
-        return [re.compile(pattern, re.IGNORECASE) for pattern in quality_patterns]
-
     def _generate_cache_key(self, search_name: str) -> str:
         key_data = f"{search_name}:{self.base_directory}"
         return hashlib.md5(key_data.encode()).hexdigest()
 
-    def _normalize_string(self, text: str) -> str:
-        """高性能字符串标准化 - v1.5.1 优化版本"""
+    def _normalize_uncached(self, text: str) -> str:
+        """字符串标准化：小写、去年份与质量标识、分隔符换成空格、长查询去停用词
+
+        质量标识用一个正则一次替换，分隔符用 str.translate 一次替换；去掉
+        年份后不剩任何词时保留年份。建索引时每个文件夹名称直接调用（结果存入索引，不进缓存）；
+        查询经 _normalize_string 记忆化。
+        """
         if not text:
             return ""
 
-        # 缓存标准化结果
-        cache_key = f"normalize:{text}"
-        if self.cache:
-            cached_result = self.cache.get(cache_key)
-            if cached_result is not None:
-                return cached_result
-
-        text = text.lower()
-
-        # 使用预编译的正则表达式
-        text = re.sub(r'\b(19|20)\d{2}\b', '', text)
+        text = self.SCRIPT_BOUNDARY_PATTERN.sub(' ', text.lower())
+        text = self.NORMALIZE_DROP_PATTERN.sub('', text)
+        words = (self.NORMALIZE_YEAR_PATTERN.sub('', text).translate(self.SEPARATOR_TABLE).split() or
+                 text.translate(self.SEPARATOR_TABLE).split())
 
-        # 使用预编译的质量标识模式
-        for pattern in self._compiled_patterns:
-            text = pattern.sub('', text)
-
-        # 批量替换分隔符（更高效）
-        for sep in self.SEPARATORS:
-            text = text.replace(sep, ' ')
-
-        text = re.sub(r'\s+', ' ', text).strip()
-
-        # 优化停用词移除 - 搜索优化版本
-        words = text.split()
         # 对于短搜索词（≤3个词），不移除停用词，提高匹配准确性
         if len(words) > 3:
-            # 使用集合操作，更高效
-            word_set = set(words)
-            filtered_set = word_set - self.STOP_WORDS
-            if filtered_set:
-                # 保持原始顺序
-                words = [word for word in words if word in filtered_set]
+            filtered = [word for word in words if word not in self.STOP_WORDS]
+            if filtered:
+                words = filtered
 
-        result = ' '.join(words)
+        return ' '.join(words)
 
-        # 缓存结果
-        if self.cache:
-            self.cache.set(cache_key, result)
+    def _normalize_string(self, text: str) -> str:
+        """标准化查询字符串（有界记忆化，重复的查询与击键不重复计算）"""
+        if not text:
+            return ""
+        return self._normalize_memo(text)
 
-        return result
+    def _word_set(self, text: str) -> frozenset:
+        """标准化后的词集合（记忆化）"""
+        return self._word_set_memo(text)
 
     def similarity(self, a: str, b: str) -> float:
-        """高性能相似度计算 - v1.5.1 优化版本"""
-        # 缓存相似度计算结果
-        cache_key = f"sim:{a}:{b}"
-        if self.cache:
-            cached_score = self.cache.get(cache_key)
-            if cached_score is not None:
-                return cached_score
-
+        """高性能相似度计算 - 两侧的标准化结果与词集合各只计算一次"""
         a_normalized = self._normalize_string(a)
         b_normalized = self._normalize_string(b)
 
         # 快速完全匹配检查
         if a_normalized == b_normalized:
-            score = 1.0
-        else:
-            # 使用更快的算法组合
-            a_words = set(a_normalized.split())
-            b_words = set(b_normalized.split())
-
-            # 1. Jaccard 相似度（比 SequenceMatcher 更快）
-            jaccard_score = self.similarity_calc.jaccard_similarity(a_words, b_words)
+            return 1.0
 
-            # 2. 词汇重叠比例
-            overlap_ratio = self.similarity_calc.word_overlap_ratio(a_words, b_words)
+        a_words = self._word_set(a)
+        b_words = self._word_set(b)
 
-            # 3. 子字符串匹配奖励
-            substring_bonus = self.similarity_calc.substring_bonus(a_normalized, b_normalized)
+        # 1. Jaccard 相似度（比 SequenceMatcher 更快）
+        jaccard_score = self.similarity_calc.jaccard_similarity(a_words, b_words)
 
-            # 组合得分 - 优化权重分配
-            score = jaccard_score * 0.5 + overlap_ratio * 0.3 + substring_bonus * 0.2
+        # 2. 词汇重叠比例
+        overlap_ratio = self.similarity_calc.word_overlap_ratio(a_words, b_words)
 
-            # 如果词汇重叠度很高，给予额外奖励
-            if overlap_ratio >= 0.8:
-                score = max(score, 0.9)
-            elif overlap_ratio >= 0.6:
-                score = max(score, 0.8)
-            elif overlap_ratio >= 0.4:  # 新增中等匹配奖励
-                score = max(score, 0.7)
+        # 3. 子字符串匹配奖励
+        substring_bonus = self.similarity_calc.substring_bonus(a_normalized, b_normalized)
 
-        score = min(1.0, score)
+        # 组合得分 - 优化权重分配
+        score = jaccard_score * 0.5 + overlap_ratio * 0.3 + substring_bonus * 0.2
 
-        # 缓存结果
-        if self.cache:
-            self.cache.set(cache_key, score)
+        # 如果词汇重叠度很高，给予额外奖励
+        if overlap_ratio >= 0.8:
+            score = max(score, 0.9)
+        elif overlap_ratio >= 0.6:
+            score = max(score, 0.8)
+        elif overlap_ratio >= 0.4:  # 新增中等匹配奖励
+            score = max(score, 0.7)
 
-        return score
+        return min(1.0, score)
 
     def get_all_folders(self, max_depth: int = 3) -> List[Path]:
-        """获取基础目录下的所有文件夹 - 异步I/O优化版本"""
+        """获取基础目录下的所有文件夹（物化为路径列表的兼容接口）
+
+        搜索等内部流程直接使用 get_folder_table()，避免为每个文件夹
+        保存完整路径对象。
+        """
+        return self.get_folder_table(max_depth).paths()
+
+    def get_folder_table(self, max_depth: int = 3) -> FolderTable:
+        """获取基础目录下的紧凑文件夹表 - 异步I/O优化版本
+
+        单次调用受 max_scan_time / max_scan_folders 预算限制；预算用尽时返回
+        已发现的部分结果并保留扫描游标，下次调用从中断处继续扫描，
+        同一张表原地追加，已有文件夹 ID 保持不变。
+        """
         # 检查缓存
-        cache_key = f"all_folders:{self.base_directory}:{max_depth}"
         if self.cache:
-            cached_folders = self.cache.get(cache_key)
-            if cached_folders is not None:
-                return cached_folders
+            pinned = self._folder_tables.get(max_depth)
+            if pinned is not None and time.time() - pinned[0] < self.cache.cache_duration:
+                return pinned[1]
+            self._folder_tables.pop(max_depth, None)
+
+        # 磁盘上保存的完整扫描结果（连同搜索索引）
+        if self.cache:
+            loaded_table = self._load_search_index(max_depth)
+            if loaded_table is not None:
+                self._folder_tables[max_depth] = (self.smart_index._last_update, loaded_table)
+                return loaded_table
 
         self.performance_monitor.start_timer('folder_scanning')
-        folders = []
+        table = FolderTable()
 
         if not self.base_directory.exists():
-            return folders
+            self.performance_monitor.end_timer('folder_scanning')
+            return table
 
         try:
-            # 尝试使用异步目录扫描
-            async_folders = self._try_async_folder_scan(max_depth)
+            async_folders = None
+            if max_depth not in self._partial_scans:
+                # 尝试使用异步目录扫描
+                async_folders = self._try_async_folder_scan(max_depth)
+
             if async_folders is not None:
-                folders = async_folders
+                table = FolderTable.from_paths(async_folders)
+                del async_folders
+                complete = True
             else:
-                # 回退到同步扫描
-                folders = self._sync_folder_scan(max_depth)
+                # 回退到可恢复的流式同步扫描
+                table, complete = self._sync_folder_scan(max_depth)
 
-            # 缓存结果（如果内存允许）
-            if self.cache and not self.memory_manager.should_cleanup():
-                self.cache.set(cache_key, folders)
+            # 仅缓存完整结果，部分结果留待下次继续扫描
+            if complete and self.cache:
+                self._folder_tables[max_depth] = (time.time(), table)
 
         finally:
             scan_duration = self.performance_monitor.end_timer('folder_scanning')
             memory_info = self.memory_manager.get_memory_usage()
 
             if scan_duration > 3.0:
-                logger.warning(f"文件夹扫描耗时较长: {scan_duration:.2f}s, 找到 {len(folders)} 个文件夹")
+                logger.warning(f"文件夹扫描耗时较长: {scan_duration:.2f}s, 找到 {len(table)} 个文件夹")
 
-            print(f"  📊 内存使用: {memory_info['rss_mb']:.1f}MB, 找到 {len(folders)} 个文件夹")
+            print(f"  📊 内存使用: {memory_info['rss_mb']:.1f}MB, 找到 {len(table)} 个文件夹")
 
-        return folders
+        return table
 
-    def _try_async_folder_scan(self, max_depth: int) -> Optional[List[Path]]:
-        """尝试异步文件夹扫描 - 添加超时保护"""
-        try:
-            # 使用异步目录扫描，添加超时限制
-            import signal
+    def iter_folders(self, max_depth: int = 3,
+                     cancel_token: Optional[ScanCancelToken] = None,
+                     cursor: Optional[FolderScanCursor] = None) -> Iterator[Path]:
+        """流式遍历文件夹 - 边发现边产出
+
+        Args:
+            max_depth: 最大扫描深度
+            cancel_token: 取消令牌，触发后在下一个目录边界停止
+            cursor: 扫描游标，传入上次未完成的游标即可继续扫描
+
+        Yields:
+            按广度优先顺序发现的文件夹路径
+        """
+        if cursor is None:
+            cursor = FolderScanCursor(self.base_directory, max_depth)
+
+        mount = self.io_monitor.mount_for(self.base_directory)
+        rules = get_scan_ignore_rules()
+        root = str(cursor.root)
+
+        while not cursor.exhausted:
+            if cancel_token and cancel_token.cancelled:
+                return
+
+            if cursor.ready:
+                cursor.yielded += 1
+                yield Path(cursor.ready.popleft())
+                continue
 
-            def timeout_handler(signum, frame):
-                # 忽略未使用的参数警告
-                _ = signum, frame
-                raise TimeoutError("异步扫描超时")
+            # 网络挂载上按 AIMD 建议的并发数同时列出多个目录，掩盖往返延迟；
+            # 整批列完后再按原顺序入队，保证游标在任意时刻都可恢复
+            batch_size = self.io_monitor.concurrency_for(mount) if mount.is_network else 1
+            batch = [cursor.pending.popleft() for _ in range(min(batch_size, len(cursor.pending)))]
+            cursor.scanned_dirs += len(batch)
 
-            # 设置15秒超时
-            signal.signal(signal.SIGALRM, timeout_handler)
-            signal.alarm(15)
+            if len(batch) == 1:
+                listings = [self._list_subdirs(batch[0][0], mount, rules, root)]
+            else:
+                listings = list(self._get_scan_executor().map(
+                    lambda item: self._list_subdirs(item[0], mount, rules, root), batch))
+
+            for (_, depth), subdirs in zip(batch, listings):
+                for subdir in subdirs:
+                    cursor.ready.append(subdir)
+                    if depth + 1 < cursor.max_depth:
+                        cursor.pending.append((subdir, depth + 1))
+
+    def _list_subdirs(self, dir_path: str, mount: MountInfo,
+                      rules: Optional[ScanIgnoreRules] = None, root: Optional[str] = None) -> List[str]:
+        """列出子目录（依赖 d_type 判断类型，不额外 stat），跳过命中排除规则的目录"""
+        subdirs = []
+        try:
+            entries = self.dir_walker.list_dir(dir_path, mount)
+        except (PermissionError, OSError, UnicodeDecodeError, UnicodeEncodeError) as e:
+            if isinstance(e, (UnicodeDecodeError, UnicodeEncodeError)):
+                print(f"  ⚠️ 目录编码问题: {dir_path} ({e})")
+            return subdirs
 
+        for entry in entries:
             try:
-                async_folders = self.async_processor.async_directory_scan(self.base_directory, max_depth)
-                signal.alarm(0)  # 取消超时
-                print(f"  ⚡ 异步扫描完成: 找到 {len(async_folders)} 个文件夹")
-                return async_folders
-            except TimeoutError:
-                signal.alarm(0)  # 取消超时
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                # 验证路径可以正确编码/解码
+                entry.path.encode('utf-8').decode('utf-8')
+            except (UnicodeDecodeError, UnicodeEncodeError) as e:
+                print(f"  ⚠️ 跳过编码问题文件夹: {entry.name} ({e})")
+                continue
+            except OSError:
+                continue
+            if rules is not None and rules.should_prune(entry, root or dir_path, True):
+                continue
+            subdirs.append(entry.path)
+        return subdirs
+
+    def _get_scan_executor(self) -> ThreadPoolExecutor:
+        """网络挂载批量列目录使用的线程池（按需创建）"""
+        if self._scan_executor is None:
+            self._scan_executor = ThreadPoolExecutor(max_workers=self.io_monitor.network_max_workers)
+        return self._scan_executor
+
+    def _load_scan_limits(self) -> Tuple[float, int]:
+        """读取单次扫描的时间和数量预算"""
+        try:
+            config_path = Path.home() / ".torrent_maker" / "settings.json"
+            if config_path.exists():
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    settings = json.load(f)
+                return settings.get('max_scan_time', 30), settings.get('max_scan_folders', 5000)
+        except (OSError, ValueError):
+            pass
+        return 30, 5000
+
+    def _try_async_folder_scan(self, max_depth: int) -> Optional[List[Path]]:
+        """尝试异步文件夹扫描 - 基于截止时间的超时保护（任意线程可用）"""
+        try:
+            # 设置15秒截止时间，超时后扫描器自行停止
+            token = ScanCancelToken(timeout=15)
+            async_folders = self.async_processor.async_directory_scan(
+                self.base_directory, max_depth, cancel_token=token)
+
+            if token.cancelled:
                 print(f"  ⏰ 异步扫描超时，回退到同步模式")
                 return None
 
+            print(f"  ⚡ 异步扫描完成: 找到 {len(async_folders)} 个文件夹")
+            return async_folders
+
         except Exception as e:
             logger.debug(f"异步扫描失败，回退到同步模式: {e}")
             return None
 
-    def _sync_folder_scan(self, max_depth: int) -> List[Path]:
-        """同步文件夹扫描 - 优化版本，添加限制和超时"""
-        folders = []
-        start_time = time.time()
+    def _sync_folder_scan(self, max_depth: int) -> Tuple[FolderTable, bool]:
+        """同步流式文件夹扫描 - 预算用尽时保留游标以便继续
 
-        # 从配置中获取限制参数，如果没有配置则使用默认值
-        try:
-            # 尝试从全局配置获取
-            from pathlib import Path as PathLib
-            config_path = PathLib.home() / ".torrent_maker" / "settings.json"
-            if config_path.exists():
-                import json
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
-                max_scan_time = settings.get('max_scan_time', 30)
-                max_folders = settings.get('max_scan_folders', 5000)
-            else:
-                max_scan_time = 30
-                max_folders = 5000
-        except:
-            max_scan_time = 30  # 最大扫描时间30秒
-            max_folders = 5000  # 最大文件夹数量限制
-
-        def _scan_directory_memory_optimized(path: Path, current_depth: int = 0):
-            # 检查时间和数量限制
-            if (time.time() - start_time > max_scan_time or
-                len(folders) >= max_folders or
-                current_depth >= max_depth):
-                return
+        Returns:
+            (目前为止发现的全部文件夹组成的表, 扫描是否已完成)
+        """
+        start_time = time.time()
+        max_scan_time, max_folders = self._load_scan_limits()
+
+        cursor, table = self._partial_scans.pop(max_depth, (None, None))
+        resumed = cursor is not None
+        if cursor is None:
+            cursor = FolderScanCursor(self.base_directory, max_depth)
+            table = FolderTable()
+
+        token = ScanCancelToken(timeout=max_scan_time)
+        found_this_call = 0
+
+        for folder_path in self.iter_folders(max_depth, token, cursor):
+            table.add(folder_path)
+            found_this_call += 1
 
             # 定期检查内存使用
-            if len(folders) % 500 == 0 and len(folders) > 0:
+            if found_this_call % 500 == 0:
                 cleaned = self.memory_manager.cleanup_if_needed()
                 if cleaned.get('freed_mb', 0) > 0:
                     print(f"  🧹 内存清理: 释放 {cleaned['freed_mb']:.1f}MB")
 
-                # 检查扫描时间
                 elapsed = time.time() - start_time
                 if elapsed > 15:  # 15秒后开始警告
-                    print(f"  ⏰ 扫描耗时: {elapsed:.1f}s, 已找到 {len(folders)} 个文件夹")
-
-            try:
-                with os.scandir(path) as entries:
-                    batch_folders = []
-                    subdirs_to_scan = []
-
-                    for entry in entries:
-                        # 检查是否超时或超量
-                        if (time.time() - start_time > max_scan_time or
-                            len(folders) >= max_folders):
-                            break
-
-                        try:
-                            if entry.is_dir(follow_symlinks=False):
-                                # 安全处理文件路径，避免编码问题
-                                try:
-                                    folder_path = Path(entry.path)
-                                    # 验证路径可以正确编码/解码
-                                    str(folder_path).encode('utf-8').decode('utf-8')
-                                    batch_folders.append(folder_path)
-
-                                    # 只有在深度允许的情况下才添加到递归列表
-                                    if current_depth + 1 < max_depth:
-                                        subdirs_to_scan.append(folder_path)
-
-                                    # 批量添加，减少内存分配
-                                    if len(batch_folders) >= 50:  # 减少批量大小
-                                        folders.extend(batch_folders)
-                                        batch_folders.clear()
-
-                                except (UnicodeDecodeError, UnicodeEncodeError) as e:
-                                    # 跳过有编码问题的文件夹
-                                    print(f"  ⚠️ 跳过编码问题文件夹: {entry.name} ({e})")
-                                    continue
-
-                        except (OSError, IOError) as e:
-                            # 跳过无法访问的条目
-                            continue
-
-                    # 添加剩余的文件夹
-                    if batch_folders:
-                        folders.extend(batch_folders)
-
-                    # 递归扫描子目录（限制数量）
-                    for subdir in subdirs_to_scan[:20]:  # 限制每个目录最多扫描20个子目录
-                        if (time.time() - start_time > max_scan_time or
-                            len(folders) >= max_folders):
-                            break
-                        _scan_directory_memory_optimized(subdir, current_depth + 1)
+                    print(f"  ⏰ 扫描耗时: {elapsed:.1f}s, 已找到 {len(table)} 个文件夹")
 
-            except (PermissionError, OSError, UnicodeDecodeError, UnicodeEncodeError) as e:
-                # 增强异常处理，包括编码错误
-                if isinstance(e, (UnicodeDecodeError, UnicodeEncodeError)):
-                    print(f"  ⚠️ 目录编码问题: {path} ({e})")
-                pass
+            if found_this_call >= max_folders:
+                token.cancel("budget")
 
-        _scan_directory_memory_optimized(self.base_directory)
+        complete = cursor.exhausted
+        if complete:
+            table.freeze()
+        else:
+            self._partial_scans[max_depth] = (cursor, table)
 
         elapsed = time.time() - start_time
         status = ""
-        if elapsed > max_scan_time:
-            status = " (已超时)"
-        elif len(folders) >= max_folders:
-            status = " (已达到数量限制)"
+        if not complete:
+            reason = "已超时" if token.reason == "deadline" else "已达到单次数量预算"
+            status = f" ({reason}，剩余 {len(cursor.pending)} 个目录待下次继续)"
+        elif resumed:
+            status = " (续扫完成)"
 
-        print(f"  🔄 同步扫描完成: 找到 {len(folders)} 个文件夹, 耗时 {elapsed:.1f}s{status}")
-        return folders
+        print(f"  🔄 同步扫描完成: 找到 {len(table)} 个文件夹, 耗时 {elapsed:.1f}s{status}")
+        return table, complete
+
+    def fuzzy_search(self, search_name: str, max_results: int = 10,
+                     verbose: bool = True) -> List[Tuple[str, float]]:
+        """智能模糊搜索 - BM25 排序（规则见 _rank_normalized），结果按查询缓存
 
-    def fuzzy_search(self, search_name: str, max_results: int = 10) -> List[Tuple[str, float]]:
-        """智能模糊搜索 - v1.5.1 高性能优化版本"""
+        verbose 为假时不打印耗时与拼写纠正（后台搜索用）。
+        """
         self.performance_monitor.start_timer('fuzzy_search')
+        match_count = 0
 
         try:
-            # 检查缓存
-            cache_key = self._generate_cache_key(search_name)
-            if self.cache:
-                cached_result = self.cache.get(cache_key)
-                if cached_result is not None:
-                    return cached_result[:max_results]
-
-            all_folders = self.get_all_folders()
-            if not all_folders:
+            table = self.get_folder_table()
+            if not len(table):
                 return []
 
             # 预处理搜索名称
-            normalized_search = self._normalize_string(search_name)
-            search_words = set(normalized_search.split())
+            prepared_query = self._prepare_query(search_name)
+            if not prepared_query[0] and not prepared_query[2]:
+                return []
 
-            # 构建或更新智能索引
-            if self.smart_index.is_expired():
-                self.smart_index.build_index(all_folders, self._normalize_string)
+            self._ensure_search_index(table)
+
+            # 检查缓存（缓存内容为 (索引代数, 匹配总数, 已物化的前若干条结果)）
+            cache_key = self._generate_cache_key(search_name)
+            if self.cache:
+                cached_result = self.cache.get(cache_key, 'results')
+                if cached_result is not None and self._cached_results_valid(cached_result, prepared_query):
+                    generation, total_matches, cached_matches = cached_result
+                    if max_results <= len(cached_matches) or len(cached_matches) == total_matches:
+                        if generation != self.smart_index.generation:
+                            # 确认仍然有效，更新代数，下次直接命中
+                            self.cache.set(cache_key, (self.smart_index.generation, total_matches,
+                                                       cached_matches), 'results')
+                        return cached_matches[:max_results]
+
+            match_count, top_matches, corrections = self._rank_normalized([prepared_query], max_results)[0]
+            if corrections and verbose:
+                print(f"  ✏️ 拼写纠正: " + ", ".join(f"{k} → {v}" for k, v in corrections.items()))
+
+            # 只为需要展示的结果物化路径
+            results = [(table.path_str(folder_id), score) for folder_id, score in top_matches]
 
-            # 使用智能索引进行预筛选
-            candidate_folders = self.smart_index.get_candidate_folders(search_words)
+            # 缓存结果
+            if self.cache:
+                self.cache.set(cache_key, (self.smart_index.generation, match_count, results), 'results')
 
-            # 如果预筛选结果太少，回退到全量搜索
-            if len(candidate_folders) < max_results * 2:
-                candidate_paths = all_folders
-                print(f"  🔍 预筛选结果较少({len(candidate_folders)})，使用全量搜索")
-            else:
-                candidate_paths = [Path(path) for path in candidate_folders]
-                print(f"  🎯 智能预筛选: {len(all_folders)} → {len(candidate_paths)} 个候选")
+            return results
 
-            matches = []
+        finally:
+            search_duration = self.performance_monitor.end_timer('fuzzy_search')
+            if verbose:
+                print(f"  🔍 搜索耗时: {search_duration:.3f}s, 找到 {match_count} 个匹配项")
 
-            def process_folder_fast(folder_path: Path) -> Optional[Tuple[str, float]]:
-                """快速文件夹处理 - 增强编码安全"""
-                try:
-                    folder_name = folder_path.name
-                    # 验证文件夹名称可以正确编码/解码
-                    folder_name.encode('utf-8').decode('utf-8')
-                    str(folder_path).encode('utf-8').decode('utf-8')
+    def _cached_results_valid(self, cached_result: Tuple[int, int, List[Tuple[str, float]]],
+                              prepared_query: Tuple[str, str, Dict[str, Any]]) -> bool:
+        """缓存的搜索结果在当前索引代数下是否仍然有效
+
+        其间索引只追加或替换了与查询无关的文件夹时继续有效：结果中的
+        文件夹都还在，且新增文件夹与查询没有共同的词、三元组（纯分面
+        查询则不满足分面条件）。
+        """
+        index = self.smart_index
+        generation, _, results = cached_result
+        if generation == index.generation:
+            return True
+        changes = index.changes_since(generation)
+        if changes is None:
+            return False
+        added, removed = changes
+        if removed and any(path in removed for path, _ in results):
+            return False
+        normalized_query, text, facets = prepared_query
+        if not text:
+            matching = set(index.facets.lookup(facets))
+            return not any(folder_id in matching for folder_id in added)
+        return not index.affects(added, text)
 
-                    similarity_score = self.similarity(search_name, folder_name)
+    def _prepare_query(self, query: str) -> Tuple[str, str, Dict[str, Any]]:
+        """解析查询：(标准化查询, 参与打分的文本, 分面条件)
 
-                    if similarity_score >= self.min_score:
-                        return (str(folder_path), similarity_score)
-                    return None
-                except (UnicodeDecodeError, UnicodeEncodeError) as e:
-                    # 跳过有编码问题的文件夹
-                    print(f"  ⚠️ 跳过编码问题文件夹: {folder_path} ({e})")
-                    return None
-                except Exception:
-                    return None
+        查询中的季、分辨率、编码、来源、年份作为分面条件筛选，不参与文本
+        打分；"Breaking Bad S02" 因此能命中 "Breaking Bad S01-S05"。
+        """
+        normalized_query = self._normalize_string(query)
+        info = self.release_parser.parse(query)
+        facets = info.facets()
+        if not facets:
+            return normalized_query, normalized_query, facets
+        return normalized_query, self._normalize_string(info.title), facets
+
+    def _rank_normalized(self, queries: List[Tuple[str, str, Dict[str, Any]]],
+                         max_results: int) -> List[Tuple[int, List[Tuple[int, float]], Dict[str, str]]]:
+        """为已解析的查询（见 _prepare_query）排序，索引须已就绪
+
+        标准化后完全相同的文件夹经哈希表直接命中；其余结果来自整词倒排表
+        （BM25，含拼写纠正后的查询）与三元组索引（部分词匹配），同一文件夹
+        取最高分，再按分面条件过滤，只选出前 max_results 个。只有分面条件
+        的查询（"S02 1080p x265"）直接对分面倒排表求交。多个查询的纠错与
+        BM25 打分各只做一次。
 
-            # 智能并发策略
-            folder_count = len(candidate_paths)
-            if folder_count <= 50:
-                # 少量文件夹，使用串行处理
-                for folder in candidate_paths:
-                    result = process_folder_fast(folder)
-                    if result:
-                        matches.append(result)
+        Returns:
+            每个查询一项：(匹配总数, [(文件夹 ID, 得分)], 拼写纠正)
+        """
+        index = self.smart_index
+        ranker = index.ranker
+        facet_index = index.facets
+        results: List[Tuple[int, List[Tuple[int, float]], Dict[str, str]]] = [
+            (0, [], {}) for _ in queries]
+
+        pending = []
+        for position, (normalized_query, text, facets) in enumerate(queries):
+            exact_ids = ranker.exact_ids(normalized_query)
+            if len(exact_ids) >= max_results:
+                # 完全匹配足够时直接返回，无需打分
+                top_ids = heapq.nsmallest(max_results, exact_ids, key=ranker.path_lengths.__getitem__)
+                results[position] = (len(exact_ids), [(folder_id, 1.0) for folder_id in top_ids], {})
+            elif not text:
+                if facets:
+                    folder_ids = facet_index.lookup(facets)
+                    top_ids = heapq.nsmallest(max_results, folder_ids, key=ranker.path_lengths.__getitem__)
+                    results[position] = (len(folder_ids), [(folder_id, 1.0) for folder_id in top_ids], {})
             else:
-                # 大量文件夹，使用并行处理
-                batch_size = min(500, folder_count)
+                pending.append((position, text, facets, exact_ids, index.tokenizer.tokenize(text)))
+        if not pending:
+            return results
 
-                for i in range(0, folder_count, batch_size):
-                    batch_folders = candidate_paths[i:i + batch_size]
+        # 拼写纠错：不在词表中的搜索词替换为编辑距离最近的词，纠正后的得分略打折扣
+        all_corrections = index.correct_words({term for *_, terms in pending for term in terms})
+        jobs = []
+        query_corrections = []
+        for _, text, facets, exact_ids, terms in pending:
+            corrections = {term: all_corrections[term] for term in terms if term in all_corrections}
+            corrected = ' '.join(corrections.get(word, word) for word in text.split()) if corrections else None
+            jobs.append((text, corrected, exact_ids, facets))
+            query_corrections.append(corrections)
+
+        # 候选很多时按文件夹 ID 区间交给进程池并行打分
+        scored = self.scoring_pool.score(index, jobs, self.min_score, max_results,
+                                         self.PARTIAL_MATCH_WEIGHT, self.CORRECTION_WEIGHT)
+        for (position, *_), (match_count, top_matches), corrections in zip(pending, scored, query_corrections):
+            results[position] = (match_count, top_matches, corrections)
+        return results
 
-                    with ThreadPoolExecutor(max_workers=min(self.max_workers, 4)) as executor:
-                        future_to_folder = {
-                            executor.submit(process_folder_fast, folder): folder
-                            for folder in batch_folders
-                        }
+    def batch_search(self, queries: List[str], max_results: int = 5) -> List[List[Tuple[str, float]]]:
+        """批量模糊搜索：先统一解析、去重，再共用一次纠错与打分
 
-                        for future in as_completed(future_to_folder):
-                            result = future.result()
-                            if result:
-                                matches.append(result)
+        Returns:
+            与 queries 一一对应的 [(文件夹路径, 得分)] 列表
+        """
+        self.performance_monitor.start_timer('batch_search')
+        try:
+            results: List[List[Tuple[str, float]]] = [[] for _ in queries]
+            table = self.get_folder_table()
+            if not len(table):
+                return results
+
+            prepared_queries = [self._prepare_query(query) for query in queries]
+            keys = [(normalized_query, text, tuple(sorted(facets.items())))
+                    if normalized_query or facets else None
+                    for normalized_query, text, facets in prepared_queries]
+            unique = dict(zip(keys, prepared_queries))
+            unique.pop(None, None)
+            if not unique:
+                return results
+
+            self._ensure_search_index(table)
+            ranked = dict(zip(unique, self._rank_normalized(list(unique.values()), max_results)))
+            for position, key in enumerate(keys):
+                if key is not None:
+                    _, top_matches, _ = ranked[key]
+                    results[position] = [(table.path_str(folder_id), score) for folder_id, score in top_matches]
+            return results
+        finally:
+            self.performance_monitor.end_timer('batch_search')
 
-            # 智能排序：相似度 + 路径长度（更短的路径优先）
-            matches.sort(key=lambda x: (x[1], -len(x[0])), reverse=True)
+    def batch_match(self, queries: List[str], max_results: int = 5) -> List[Dict[str, Any]]:
+        """批量搜索并附带文件夹信息（见 match_folders），每个文件夹只统计一次
 
-            # 缓存结果
-            if self.cache:
-                self.cache.set(cache_key, matches)
+        Returns:
+            [{'query': 原始查询, 'matches': [匹配信息], 'skipped_roots': [未返回结果的根目录]}]，
+            与 queries 一一对应；skipped_roots 非空时 matches 只是部分结果
+        """
+        described: Dict[str, Optional[Dict[str, Any]]] = {}
+        output = []
+        batch_results = self.batch_search(queries, max_results)
+        skipped_roots = self.last_skipped_roots
+        for query, matches in zip(queries, batch_results):
+            entries = []
+            for folder_path, score in matches:
+                if folder_path not in described:
+                    described[folder_path] = self._describe_folder(folder_path)
+                info = described[folder_path]
+                if info is not None:
+                    entries.append({**info, 'score': int(score * 100)})
+            output.append({'query': query, 'matches': entries, 'skipped_roots': list(skipped_roots)})
+        return output
+
+    @property
+    def last_skipped_roots(self) -> List[str]:
+        """最近一次搜索中没有返回结果的根目录；单根目录搜索不会跳过"""
+        return []
+
+    def prefix_search(self, query: str, max_results: int = 10,
+                      session: Optional[PrefixSearchSession] = None) -> List[str]:
+        """输入即搜索：查询中每个词都是文件夹名称某个词（或拼音）的前缀
+
+        逐字输入时传入同一个 session，已输完的词的候选交集在击键间复用；
+        不传时每次调用用新的会话，并发的无状态调用互不影响。
+        结果按名称简短程度排序，不做相关度打分；完整搜索请用 fuzzy_search。
+
+        Returns:
+            文件夹路径列表
+        """
+        table = self.get_folder_table()
+        if not len(table):
+            return []
+        normalized_query = self._normalize_string(query)
+        if not normalized_query:
+            return []
 
-            return matches[:max_results]
+        self._ensure_search_index(table)
+        index = self.smart_index
+        folder_ids, _ = index.get_prefix_index().search(
+            index.tokenizer.tokenize(normalized_query), max_results,
+            PrefixSearchSession() if session is None else session)
+        return [table.path_str(folder_id) for folder_id in folder_ids]
+
+    def _ensure_search_index(self, table: FolderTable, max_depth: int = 3) -> None:
+        """索引过期或文件夹表变化（含续扫追加）时重建，完整扫描的索引保存到磁盘"""
+        index = self.smart_index
+        if index.is_expired() or index.table is not table or index.indexed_count != len(table):
+            # 没有缓存的搜索结果时无需比较新旧文件夹表
+            track_changes = bool(self.cache and self.cache.count('results'))
+            index.build_index(table, self._normalize_uncached, track_changes)
+            if self.cache and max_depth not in self._partial_scans:
+                self._save_search_index(max_depth)
+
+    def _save_search_index(self, max_depth: int) -> None:
+        """在后台线程序列化并保存索引，搜索不等待写盘"""
+        state = self.smart_index.snapshot(self._search_index_meta(max_depth))
+        if self._index_save_executor is None:
+            self._index_save_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='index-save')
+        self._index_save_future = self._index_save_executor.submit(
+            SmartIndexCache.write_snapshot, self._search_index_path(max_depth), state)
+
+    def _wait_for_index_save(self) -> None:
+        """等待排队中的索引写盘完成（单线程按提交顺序执行，等最后一个即可）"""
+        if self._index_save_future is not None:
+            self._index_save_future.result()
+            self._index_save_future = None
 
-        finally:
-            search_duration = self.performance_monitor.end_timer('fuzzy_search')
-            matches_count = len(matches) if 'matches' in locals() else 0
-            print(f"  🔍 搜索耗时: {search_duration:.3f}s, 找到 {matches_count} 个匹配项")
+    @staticmethod
+    def _search_index_dir() -> str:
+        return os.path.join(os.path.expanduser("~/.torrent_maker"), "search_index")
+
+    def _search_index_path(self, max_depth: int) -> str:
+        digest = hashlib.md5(f"{self.base_directory}:{max_depth}".encode('utf-8', 'surrogatepass')).hexdigest()
+        return os.path.join(self._search_index_dir(), f"{digest}.pkl")
+
+    def clear_search_index(self) -> int:
+        """清空内存与磁盘上的搜索索引，返回删除的索引文件数"""
+        self._wait_for_index_save()
+        self.smart_index.clear()
+        removed = 0
+        try:
+            entries = os.listdir(self._search_index_dir())
+        except OSError:
+            return 0
+        for entry in entries:
+            if entry.endswith('.pkl'):
+                try:
+                    os.remove(os.path.join(self._search_index_dir(), entry))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def _search_index_meta(self, max_depth: int) -> Dict[str, Any]:
+        """磁盘索引的校验信息：根目录签名与排除规则变化时索引失效"""
+        rules = get_scan_ignore_rules()
+        return {
+            'base_directory': str(self.base_directory),
+            'max_depth': max_depth,
+            'signature': PersistentDirectoryStore.signature(self.base_directory),
+            'ignore_rules': (tuple(rules.patterns), tuple(rules.regexes)),
+            'pinyin': self.smart_index.tokenizer.pinyin_enabled
+        }
+
+    def _load_search_index(self, max_depth: int) -> Optional[FolderTable]:
+        """启动时加载磁盘上的文件夹表与搜索索引"""
+        if max_depth in self._partial_scans:
+            return None
+        if not self.smart_index.load(self._search_index_path(max_depth), self._search_index_meta(max_depth)):
+            return None
+        print(f"  💾 已加载磁盘搜索索引: {len(self.smart_index.table)} 个文件夹")
+        return self.smart_index.table
 
     def get_folder_info(self, folder_path: str) -> Dict[str, Any]:
         """获取文件夹详细信息 - 带缓存优化"""
@@ -4491,28 +8671,41 @@ class FileMatcher:
             if cached_info is not None:
                 return cached_info
 
+        # 查询磁盘缓存（目录 mtime + 子项数量校验，最多复用 cache_duration 秒）
+        signature = None
+        if self.folder_info_store is not None and os.path.isdir(folder_path):
+            signature = self.folder_info_store.signature(folder_path)
+            if signature is not None:
+                stored_info = self.folder_info_store.get('info', folder_path, signature,
+                                                         max_age=self.folder_info_cache.cache_duration)
+                if isinstance(stored_info, dict):
+                    if self.folder_info_cache:
+                        self.folder_info_cache.set(cache_key, stored_info)
+                    return stored_info
+
         self.performance_monitor.start_timer('folder_info_calculation')
 
         try:
-            total_files = 0
-            total_size = 0
-
-            try:
-                # 使用更高效的方法计算文件信息
-                path_obj = Path(folder_path)
-                for file_path in path_obj.rglob('*'):
-                    if file_path.is_file():
-                        total_files += 1
-                        try:
-                            total_size += file_path.stat().st_size
-                        except (OSError, IOError):
-                            pass
-            except PermissionError:
+            if os.path.isdir(folder_path) and not os.access(folder_path, os.R_OK | os.X_OK):
                 result = {'exists': True, 'readable': False}
                 if self.folder_info_cache:
                     self.folder_info_cache.set(cache_key, result)
                 return result
 
+            # d_type 判断类型，仅对文件 stat；网络挂载上自动并发。
+            # 同一次遍历顺带解析视频文件的季/集，剧集摘要无需再遍历
+            episodes = []
+
+            def collect_episode(filename: str) -> None:
+                if self.is_video_file(filename):
+                    info = self.release_parser.parse(filename)
+                    if info.episode is not None:
+                        episodes.append([info.season_start, info.episode])
+
+            totals = self.dir_walker.measure(folder_path, on_file=collect_episode)
+            total_files = totals['files']
+            total_size = totals['size']
+
             size_str = self.format_size(total_size)
 
             result = {
@@ -4520,12 +8713,15 @@ class FileMatcher:
                 'readable': True,
                 'total_files': total_files,
                 'total_size': total_size,
-                'size_str': size_str
+                'size_str': size_str,
+                'episodes': sorted(episodes, key=lambda item: (item[0] or 0, item[1]))
             }
 
             # 缓存结果
             if self.folder_info_cache:
                 self.folder_info_cache.set(cache_key, result)
+            if signature is not None:
+                self.folder_info_store.put('info', folder_path, signature, result)
 
             return result
 
@@ -4544,34 +8740,74 @@ class FileMatcher:
         """检查文件是否为视频文件"""
         return Path(filename).suffix.lower() in self.VIDEO_EXTENSIONS
 
-    def match_folders(self, search_name: str) -> List[Dict[str, Any]]:
-        """搜索并返回匹配的文件夹信息"""
-        matches = self.fuzzy_search(search_name)
+    def match_folders(self, search_name: str, use_hot: bool = True) -> List[Dict[str, Any]]:
+        """搜索并返回匹配的文件夹信息
+
+        该查询有仍然有效的历史选择时直接返回那几个文件夹（'hot' 为真），
+        完整搜索在后台进行并写入结果缓存；之后以 use_hot=False 调用即可
+        取得完整结果。
+        """
+        self._wait_for_refine()
+        hot_matches = self.hot_results.lookup(search_name) if use_hot else None
+        if hot_matches is not None:
+            if self._refine_executor is None:
+                self._refine_executor = ThreadPoolExecutor(max_workers=1,
+                                                           thread_name_prefix='search-refine')
+            self._refine_future = self._refine_executor.submit(self.fuzzy_search, search_name,
+                                                               verbose=False)
+            matches = hot_matches
+        else:
+            matches = self.fuzzy_search(search_name)
         result = []
 
         for folder_path, score in matches:
-            folder_info = self.get_folder_info(folder_path)
-            if folder_info['exists']:
-                episode_info = self.extract_episode_info_simple(folder_path)
-                season_info = episode_info.get('season_info', '')
-                total_episodes = episode_info.get('total_episodes', 0)
-
-                result.append({
-                    'path': folder_path,
-                    'name': os.path.basename(folder_path),
-                    'score': int(score * 100),
-                    'file_count': folder_info.get('total_files', 0),
-                    'size': folder_info.get('size_str', '未知'),
-                    'readable': folder_info.get('readable', True),
-                    'episodes': season_info,
-                    'video_count': total_episodes
-                })
+            info = self._describe_folder(folder_path)
+            if info is not None:
+                result.append({**info, 'score': int(score * 100), 'hot': hot_matches is not None})
 
         return result
 
+    def _wait_for_refine(self) -> None:
+        """等待后台的完整搜索结束，前台搜索不与它同时使用索引"""
+        future, self._refine_future = self._refine_future, None
+        if future is not None:
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning(f"后台完整搜索失败: {e}")
+
+    def record_selection(self, search_name: str, selected: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """记录用户为查询选中的匹配结果，返回可写入搜索历史的选择列表"""
+        return self.hot_results.record(search_name, [(item['path'], item.get('score', 100) / 100)
+                                                     for item in selected])
+
+    def _describe_folder(self, folder_path: str) -> Optional[Dict[str, Any]]:
+        """匹配结果展示用的文件夹信息（不含得分），文件夹不存在时返回 None"""
+        folder_info = self.get_folder_info(folder_path)
+        if not folder_info['exists']:
+            return None
+        if 'episodes' in folder_info:
+            # 统计大小时已解析过季/集
+            episodes = [{'season': season, 'episode': episode}
+                        for season, episode in folder_info['episodes']]
+            seasons = {episode['season'] for episode in episodes if episode['season']}
+            episode_info = {'season_info': self.generate_season_summary(episodes, seasons),
+                            'total_episodes': len(episodes)}
+        else:
+            episode_info = self.extract_episode_info_simple(folder_path)
+        return {
+            'path': folder_path,
+            'name': os.path.basename(folder_path),
+            'file_count': folder_info.get('total_files', 0),
+            'size': folder_info.get('size_str', '未知'),
+            'readable': folder_info.get('readable', True),
+            'episodes': episode_info.get('season_info', ''),
+            'video_count': episode_info.get('total_episodes', 0)
+        }
+
     def get_performance_stats(self) -> Dict[str, Any]:
         """获取搜索性能统计 - v1.5.1 增强版"""
-        stats = self.performance_monitor.get_all_stats()
+        stats = self.get_timing_stats()
         memory_info = self.memory_manager.get_memory_usage()
 
         # 计算搜索效率指标
@@ -4590,9 +8826,20 @@ class FileMatcher:
                 'total_scans': folder_scan_stats.get('count', 0)
             },
             'memory_usage': memory_info,
+            'mount_latency': self.io_monitor.get_stats(),
+            'scan_pruning': get_scan_ignore_rules().get_stats(),
+            'typo_correction': self.smart_index.spell.get_stats(),
+            'prefix_search': (self.smart_index._prefix_index.get_stats()
+                              if self.smart_index._prefix_index is not None else {}),
+            'facets': self.smart_index.facets.get_stats(),
+            'scoring_pool': self.scoring_pool.get_stats(),
+            'normalization': self._normalize_memo.cache_info()._asdict(),
+            'hot_results': self.hot_results.get_stats(),
             'cache_performance': {
                 'smart_index_expired': self.smart_index.is_expired(),
-                'cache_enabled': self.cache is not None
+                'cache_enabled': self.cache is not None,
+                'search_cache': self.cache.get_stats() if self.cache else {},
+                'folder_info_cache': self.folder_info_cache.get_stats() if self.folder_info_cache else {}
             },
             'optimization_level': self._calculate_optimization_level(search_stats, memory_info)
         }
@@ -4618,10 +8865,12 @@ class FileMatcher:
         # 清理内存
         cleaned_stats['memory_items'] = self.memory_manager.cleanup_memory()
 
-        # 清理缓存
-        if self.cache:
-            # 这里可以添加缓存清理逻辑
-            cleaned_stats['cache_items'] = 0
+        # 关闭打分进程池（子进程持有索引副本），下次需要时重新启动
+        self.scoring_pool.shutdown()
+
+        # 清理过期缓存
+        cleaned_stats['cache_items'] = sum(cache.cleanup_expired()
+                                           for cache in (self.cache, self.folder_info_cache) if cache)
 
         # 重建索引
         if self.smart_index.is_expired():
@@ -4631,6 +8880,35 @@ class FileMatcher:
 
         return cleaned_stats
 
+    def clear_caches(self) -> int:
+        """清空内存中的搜索缓存、文件夹信息缓存与文件夹表，返回清除的条目数"""
+        cleared = len(self._folder_tables)
+        self._folder_tables.clear()
+        return cleared + sum(cache.clear() for cache in (self.cache, self.folder_info_cache)
+                             if cache is not None)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """搜索缓存统计（未启用缓存时为空）"""
+        return self.cache.get_stats() if self.cache is not None else {}
+
+    def get_timing_stats(self) -> Dict[str, Dict[str, float]]:
+        """各项操作的耗时统计（见 PerformanceMonitor）"""
+        return self.performance_monitor.get_all_stats()
+
+    def shutdown(self) -> None:
+        """关闭后台搜索线程、扫描线程池、异步处理器与打分进程池（匹配器被替换时调用）"""
+        for executor in (self._refine_executor, self._scan_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._refine_executor = None
+        self._scan_executor = None
+        # 已排队的索引写盘照常完成
+        if self._index_save_executor is not None:
+            self._index_save_executor.shutdown(wait=False)
+            self._index_save_executor = None
+        self.async_processor.cleanup()
+        self.scoring_pool.shutdown()
+
     def extract_episode_info_simple(self, folder_path: str) -> Dict[str, Any]:
         """简单的剧集信息提取"""
         if not os.path.exists(folder_path) or not os.path.isdir(folder_path):
@@ -4661,44 +8939,16 @@ class FileMatcher:
         }
 
     def parse_episode_from_filename(self, filename: str) -> Optional[Dict[str, Any]]:
-        """从文件名中解析剧集信息"""
-        import re
-
-        patterns = [
-            (r'[Ss](\d{1,2})[Ee](\d{1,3})', 'season_episode'),
-            (r'[Ss]eason\s*(\d{1,2})\s*[Ee]pisode\s*(\d{1,3})', 'season_episode'),
-            (r'第(\d{1,2})季第(\d{1,3})集', 'season_episode'),
-            (r'(\d{1,2})x(\d{1,3})', 'season_episode'),
-            (r'(?:[Ee][Pp]\.?\s*(\d{1,3})|第(\d{1,3})集)', 'episode_only'),
-        ]
-
-        for pattern, pattern_type in patterns:
-            match = re.search(pattern, filename)
-            if match:
-                try:
-                    if pattern_type == 'season_episode':
-                        season = int(match.group(1))
-                        episode = int(match.group(2))
-                        if 1 <= season <= 50 and 1 <= episode <= 500:
-                            return {
-                                'season': season,
-                                'episode': episode,
-                                'filename': filename,
-                                'pattern_type': pattern_type
-                            }
-                    elif pattern_type == 'episode_only':
-                        episode = int(match.group(1) or match.group(2))
-                        if 1 <= episode <= 500:
-                            return {
-                                'season': None,
-                                'episode': episode,
-                                'filename': filename,
-                                'pattern_type': pattern_type
-                            }
-                except ValueError:
-                    continue
-
-        return None
+        """从文件名中解析剧集信息（与索引共用发布名解析器）"""
+        info = self.release_parser.parse(filename)
+        if info.episode is None:
+            return None
+        return {
+            'season': info.season_start,
+            'episode': info.episode,
+            'filename': filename,
+            'pattern_type': 'season_episode' if info.season_start else 'episode_only'
+        }
 
     def generate_season_summary(self, episodes: list, seasons: set) -> str:
         """生成季度摘要信息"""
@@ -4765,6 +9015,311 @@ class FileMatcher:
             return ",".join(groups)
 
 
+# ================== 多资源根目录 ==================
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError, wait as futures_wait
+
+
+class RootShard:
+    """一个资源根目录的索引分片及其健康状态
+
+    状态：ok 正常；unavailable 根目录不存在或不可读（如阵列未挂载）；
+    slow 上次搜索超时且仍未结束；error 搜索抛出异常；unknown 尚未搜索。
+    """
+
+    def __init__(self, name: str, matcher: 'FileMatcher'):
+        self.name = name
+        self.matcher = matcher
+        self.path = str(matcher.base_directory)
+        self.status = 'unknown'
+        self.last_error = ''
+        self.last_search_ms = 0.0
+        self.searches = 0
+        self.failures = 0
+        # 超时后仍在运行的搜索，结束前不再派发新的搜索
+        self._stalled: Optional[Future] = None
+
+    def stalled(self) -> bool:
+        if self._stalled is not None and self._stalled.done():
+            self._stalled = None
+        return self._stalled is not None
+
+    def wait_stalled(self) -> None:
+        """等待上次超时的搜索结束"""
+        future = self._stalled
+        if future is not None:
+            futures_wait([future])
+            self._stalled = None
+
+    def mark_slow(self, future: Future) -> None:
+        self._stalled = future
+        self.status = 'slow'
+        self.failures += 1
+
+    def run(self, call: Callable[['FileMatcher'], Any]) -> Optional[Any]:
+        """在本分片上执行一次搜索，失败时记录状态并返回 None"""
+        if not (os.path.isdir(self.path) and os.access(self.path, os.R_OK | os.X_OK)):
+            self.status = 'unavailable'
+            self.last_error = '根目录不存在或不可读'
+            return None
+        start = time.time()
+        try:
+            result = call(self.matcher)
+        except Exception as e:
+            self.status = 'error'
+            self.last_error = str(e)
+            self.failures += 1
+            logger.warning(f"根目录 {self.name} 搜索失败: {e}")
+            return None
+        self.last_search_ms = (time.time() - start) * 1000
+        self.searches += 1
+        self.status = 'ok'
+        self.last_error = ''
+        return result
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'path': self.path,
+            'status': self.status,
+            'last_error': self.last_error,
+            'last_search_ms': round(self.last_search_ms, 1),
+            'searches': self.searches,
+            'failures': self.failures,
+            'scan_interval': self.matcher.smart_index.cache_duration,
+            'indexed_folders': self.matcher.smart_index.indexed_count
+        }
+
+
+class MultiRootMatcher:
+    """多资源根目录搜索 - 每个根目录一个索引分片，查询并发分发后合并
+
+    每个根目录由独立的 FileMatcher 负责（各自的文件夹表、索引、缓存，
+    扫描周期取该根目录的 scan_interval）。查询同时发往所有分片，
+    search_timeout 秒内未返回的分片记为 slow 并跳过，其搜索结束前不再
+    向它派发；根目录不存在时记为 unavailable。合并规则与单个分片相同：
+    得分降序、路径长度升序取前 k 个。缓存清理与各项统计逐个分片执行
+    后合并，不会只落在第一个根目录上。
+    """
+
+    def __init__(self, roots: List[Dict[str, Any]], enable_cache: bool = True,
+                 cache_duration: int = 3600, min_score: float = 0.6, max_workers: int = 4,
+                 search_timeout: float = 5.0):
+        if not roots:
+            raise ValueError("至少需要一个资源根目录")
+        self.shards = [
+            RootShard(root['name'], FileMatcher(root['path'], enable_cache=enable_cache,
+                                                cache_duration=root.get('scan_interval', cache_duration),
+                                                min_score=min_score, max_workers=max_workers))
+            for root in roots
+        ]
+        self.search_timeout = search_timeout
+        # 每个分片留出余量：超时的搜索仍占着线程
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shards) * 2,
+                                            thread_name_prefix='root-search')
+        # 调用方的会话 -> {根目录: 该分片的会话}
+        self._prefix_sessions = weakref.WeakKeyDictionary()
+        self._last_call = threading.local()
+        # 历史选择热缓存跨根目录共用（见 FileMatcher.match_folders）
+        self.hot_results = SelectionHotCache(self.shards[0].matcher._normalize_string)
+        self._refine_executor: Optional[ThreadPoolExecutor] = None
+        self._refine_future = None
+
+    @property
+    def base_directory(self) -> Path:
+        return self.shards[0].matcher.base_directory
+
+    @property
+    def last_skipped_roots(self) -> List[str]:
+        """当前线程最近一次搜索中没有返回结果的根目录（超时、不可用或出错）"""
+        return getattr(self._last_call, 'skipped_roots', [])
+
+    def _fan_out(self, call: Callable[['FileMatcher'], Any],
+                 wait: bool = False) -> List[Tuple[RootShard, Any]]:
+        """在所有分片上并发执行，返回按时完成的 [(分片, 结果)]
+
+        尚未完成过搜索的分片（首次搜索要建索引）不受 search_timeout 限制；
+        wait 为真时（批量/命令行）所有分片都等到结束，包括上次超时的分片。
+        未返回结果的根目录记入 last_skipped_roots。
+        """
+        futures = []
+        skipped = []
+        for shard in self.shards:
+            if shard.stalled():
+                if not wait:
+                    skipped.append(shard.name)
+                    continue
+                shard.wait_stalled()
+            futures.append((shard, shard.status == 'unknown',
+                            self._executor.submit(shard.run, call)))
+
+        deadline = time.time() + self.search_timeout
+        results = []
+        for shard, cold, future in futures:
+            try:
+                if wait or cold:
+                    result = future.result()
+                else:
+                    result = future.result(timeout=max(0.0, deadline - time.time()))
+            except FuturesTimeoutError:
+                shard.mark_slow(future)
+                logger.warning(f"根目录 {shard.name} 搜索超时，本次跳过")
+                skipped.append(shard.name)
+                continue
+            if result is None:
+                skipped.append(shard.name)
+            else:
+                results.append((shard, result))
+        self._last_call.skipped_roots = skipped
+        return results
+
+    @staticmethod
+    def _merge(result_lists: List[List[Tuple[str, float]]], max_results: int) -> List[Tuple[str, float]]:
+        return heapq.nsmallest(max_results, (match for matches in result_lists for match in matches),
+                               key=lambda match: (-match[1], len(match[0])))
+
+    def fuzzy_search(self, search_name: str, max_results: int = 10,
+                     verbose: bool = True) -> List[Tuple[str, float]]:
+        """在所有根目录中搜索，合并前 max_results 个（见 FileMatcher.fuzzy_search）"""
+        results = self._fan_out(lambda matcher: matcher.fuzzy_search(search_name, max_results, verbose))
+        return self._merge([matches for _, matches in results], max_results)
+
+    def batch_search(self, queries: List[str], max_results: int = 5,
+                     wait: bool = True) -> List[List[Tuple[str, float]]]:
+        """批量搜索（见 FileMatcher.batch_search），每个分片各做一次批量打分
+
+        默认等待所有分片结束，不套用交互搜索的超时。
+        """
+        results = self._fan_out(lambda matcher: matcher.batch_search(queries, max_results), wait=wait)
+        return [self._merge([matches[position] for _, matches in results], max_results)
+                for position in range(len(queries))]
+
+    def prefix_search(self, query: str, max_results: int = 10,
+                      session: Optional[PrefixSearchSession] = None) -> List[str]:
+        """输入即搜索（见 FileMatcher.prefix_search），每个分片各用一个会话，结果按名称长度合并"""
+        sessions = {} if session is None else self._prefix_sessions.setdefault(session, {})
+        results = self._fan_out(lambda matcher: matcher.prefix_search(
+            query, max_results, sessions.setdefault(str(matcher.base_directory), PrefixSearchSession())))
+        paths = [path for _, shard_paths in results for path in shard_paths]
+        return heapq.nsmallest(max_results, paths, key=lambda path: (len(os.path.basename(path)), len(path)))
+
+    def _shard_for(self, folder_path: str) -> RootShard:
+        """文件夹所属的根目录（最长前缀匹配）"""
+        best = self.shards[0]
+        best_length = -1
+        for shard in self.shards:
+            root = shard.path.rstrip(os.sep) + os.sep
+            if (folder_path == shard.path or folder_path.startswith(root)) and len(root) > best_length:
+                best, best_length = shard, len(root)
+        return best
+
+    def _describe_folder(self, folder_path: str) -> Optional[Dict[str, Any]]:
+        """匹配结果展示信息（见 FileMatcher._describe_folder），附带所属根目录名称"""
+        shard = self._shard_for(folder_path)
+        info = shard.matcher._describe_folder(folder_path)
+        if info is not None:
+            info['root'] = shard.name
+        return info
+
+    def match_folders(self, search_name: str, use_hot: bool = True) -> List[Dict[str, Any]]:
+        """见 FileMatcher.match_folders；命中历史选择时不分发查询，也就没有跳过的根目录"""
+        self._last_call.skipped_roots = []
+        return FileMatcher.match_folders(self, search_name, use_hot)
+
+    # 只依赖上面的搜索与描述方法，直接复用单根目录的实现
+    batch_match = FileMatcher.batch_match
+    _wait_for_refine = FileMatcher._wait_for_refine
+    record_selection = FileMatcher.record_selection
+    format_size = FileMatcher.format_size
+
+    def get_folder_info(self, folder_path: str) -> Dict[str, Any]:
+        return self._shard_for(folder_path).matcher.get_folder_info(folder_path)
+
+    def clear_search_index(self) -> int:
+        """清空所有分片的内存索引与磁盘索引"""
+        return sum(shard.matcher.clear_search_index() for shard in self.shards)
+
+    def clear_caches(self) -> int:
+        """清空所有分片的搜索缓存与文件夹信息缓存"""
+        return sum(shard.matcher.clear_caches() for shard in self.shards)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """所有分片合计的搜索缓存统计"""
+        return SearchCache.merge_stats([shard.matcher.get_cache_stats() for shard in self.shards])
+
+    def get_timing_stats(self) -> Dict[str, Dict[str, float]]:
+        """所有分片合计的耗时统计"""
+        return PerformanceMonitor.merge_stats([shard.matcher.get_timing_stats() for shard in self.shards])
+
+    def get_root_status(self) -> List[Dict[str, Any]]:
+        """各根目录的健康状态"""
+        return [shard.get_status() for shard in self.shards]
+
+    @staticmethod
+    def _sum_counters(stats_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """按键累加各分片的计数类统计（布尔值取或）"""
+        merged: Dict[str, Any] = {}
+        for stats in stats_list:
+            for key, value in stats.items():
+                if isinstance(value, bool):
+                    merged[key] = merged.get(key, False) or value
+                elif isinstance(value, (int, float)):
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def get_performance_stats(self) -> Dict[str, Any]:
+        """各分片统计的合计；内存、挂载点与剪枝统计是进程级的，取第一个分片即可"""
+        shard_stats = [shard.matcher.get_performance_stats() for shard in self.shards]
+        stats = shard_stats[0]
+        timings = self.get_timing_stats()
+        search_stats = timings.get('fuzzy_search', {})
+        scan_stats = timings.get('folder_scanning', {})
+        stats['search_performance'] = {
+            'average_search_time': search_stats.get('average', 0),
+            'total_searches': search_stats.get('count', 0),
+            'fastest_search': search_stats.get('min', 0),
+            'slowest_search': search_stats.get('max', 0)
+        }
+        stats['folder_scanning'] = {
+            'average_scan_time': scan_stats.get('average', 0),
+            'total_scans': scan_stats.get('count', 0)
+        }
+        for key in ('typo_correction', 'prefix_search', 'facets', 'scoring_pool'):
+            stats[key] = self._sum_counters([item[key] for item in shard_stats])
+        prefix_stats = stats['prefix_search']
+        if prefix_stats.get('queries'):
+            prefix_stats['avg_ms'] = round(sum(item['prefix_search'].get('avg_ms', 0) *
+                                               item['prefix_search'].get('queries', 0)
+                                               for item in shard_stats) / prefix_stats['queries'], 3)
+        cache_stats = [item['cache_performance'] for item in shard_stats]
+        stats['cache_performance'] = {
+            'smart_index_expired': any(item['smart_index_expired'] for item in cache_stats),
+            'cache_enabled': cache_stats[0]['cache_enabled'],
+            'search_cache': SearchCache.merge_stats([item['search_cache'] for item in cache_stats]),
+            'folder_info_cache': SearchCache.merge_stats([item['folder_info_cache'] for item in cache_stats])
+        }
+        stats['optimization_level'] = self.shards[0].matcher._calculate_optimization_level(
+            search_stats, stats['memory_usage'])
+        stats['roots'] = self.get_root_status()
+        stats['hot_results'] = self.hot_results.get_stats()
+        return stats
+
+    def cleanup_resources(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for shard in self.shards:
+            for key, value in shard.matcher.cleanup_resources().items():
+                if isinstance(value, (int, float)):
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def shutdown(self) -> None:
+        """关闭分发线程池、后台搜索线程与各分片的匹配器"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._refine_executor is not None:
+            self._refine_executor.shutdown(wait=False, cancel_futures=True)
+        for shard in self.shards:
+            shard.matcher.shutdown()
+
+
 # ================== 种子创建器 ==================
 class TorrentCreator:
     """种子创建器 - v1.7.0高性能Python引擎版本"""
@@ -4805,6 +9360,7 @@ class TorrentCreator:
 
         # 目录大小缓存
         self.size_cache = DirectorySizeCache()
+        self.memory_manager.register_cache(self.size_cache)
 
         # 初始化 piece size 缓存
         self._piece_size_cache = {}
@@ -5122,8 +9678,15 @@ class TorrentCreator:
 
     def create_torrent(self, source_path: Union[str, Path],
                       custom_name: str = None,
-                      progress_callback = None) -> Optional[str]:
-        """创建种子文件 - 使用 mktorrent"""
+                      progress_callback = None,
+                      process_callback = None,
+                      is_paused: Optional[Callable[[], bool]] = None) -> Optional[str]:
+        """创建种子文件 - 使用 mktorrent
+
+        process_callback 在 mktorrent 启动后收到其进程号（也是进程组号），
+        调用方可借此挂起、继续或终止制种；这样做的调用方通过 is_paused
+        告知当前是否处于挂起状态，挂起的时间不计入超时。
+        """
         # 记录制种开始时间
         creation_start_time = time.time()
         start_time_str = datetime.now().strftime("%H:%M:%S")
@@ -5183,7 +9746,9 @@ class TorrentCreator:
             print(f"  ⏰ 制种开始时间: {start_time_str}")
 
             # 使用 mktorrent 创建种子
-            result_path = self._create_torrent_mktorrent(source_path, output_file, piece_size_log2, progress_callback, total_size, creation_start_time)
+            result_path = self._create_torrent_mktorrent(source_path, output_file, piece_size_log2, progress_callback,
+                                                         total_size, creation_start_time, process_callback,
+                                                         is_paused)
 
             return result_path
 
@@ -5195,9 +9760,31 @@ class TorrentCreator:
 
 
 
+    def _wait_mktorrent(self, process: subprocess.Popen, timeout: float,
+                        poll_interval: float = 1.0,
+                        is_paused: Optional[Callable[[], bool]] = None) -> str:
+        """等待 mktorrent 结束并返回 stderr；超时只计算未被挂起的时间
+
+        调用方可能用 SIGSTOP 暂停制种，挂起期间不应消耗超时预算；是否
+        挂起由调用方通过 is_paused 告知。
+        """
+        active = 0.0
+        while True:
+            started = time.monotonic()
+            try:
+                _, stderr = process.communicate(timeout=poll_interval)
+                return stderr
+            except subprocess.TimeoutExpired:
+                if is_paused is None or not is_paused():
+                    active += time.monotonic() - started
+                if active >= timeout:
+                    raise subprocess.TimeoutExpired(process.args, timeout)
+
     def _create_torrent_mktorrent(self, source_path: Path, output_file: Path,
                                  piece_size_log2: int, progress_callback,
-                                 file_size_bytes: int = 0, creation_start_time: float = None) -> str:
+                                 file_size_bytes: int = 0, creation_start_time: float = None,
+                                 process_callback = None,
+                                 is_paused: Optional[Callable[[], bool]] = None) -> str:
         """使用 mktorrent 创建种子"""
         # 记录mktorrent执行开始时间
         mktorrent_start_time = time.time()
@@ -5214,29 +9801,39 @@ class TorrentCreator:
 
         print(f"  🚀 开始执行 mktorrent...")
 
-        # 执行mktorrent命令
-        try:
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=3600,
-                env=dict(os.environ, LANG='C', LC_ALL='C')
-            )
+        # 执行mktorrent命令（独立进程组，便于调用方挂起或终止整个制种）
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=dict(os.environ, LANG='C', LC_ALL='C'),
+            start_new_session=True
+        )
+        if process_callback:
+            process_callback(process.pid)
 
-            # 记录执行结果（如果需要调试）
-            if result.stderr:
-                logger.warning(f"mktorrent stderr: {result.stderr}")
+        try:
+            stderr = self._wait_mktorrent(process, timeout=3600, is_paused=is_paused)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            output_file.unlink(missing_ok=True)
+            raise TorrentCreationError("种子创建超时")
 
-        except subprocess.CalledProcessError as e:
-            error_msg = f"mktorrent执行失败: {e}"
-            if e.stderr:
-                error_msg += f"\n错误信息: {e.stderr}"
+        if process.returncode != 0:
+            # 失败或被终止时不留下未写完的种子文件
+            output_file.unlink(missing_ok=True)
+            if process.returncode < 0:
+                raise TorrentCreationError(f"mktorrent 被信号 {-process.returncode} 终止")
+            error_msg = f"mktorrent执行失败: 返回码 {process.returncode}"
+            if stderr:
+                error_msg += f"\n错误信息: {stderr}"
             raise TorrentCreationError(error_msg)
 
-        except subprocess.TimeoutExpired:
-            raise TorrentCreationError("种子创建超时")
+        # 记录执行结果（如果需要调试）
+        if stderr:
+            logger.warning(f"mktorrent stderr: {stderr}")
 
         # 计算mktorrent执行时间
         mktorrent_duration = time.time() - mktorrent_start_time
@@ -5588,8 +10185,8 @@ class TorrentCreator:
 class SearchHistory:
     """搜索历史管理器"""
 
-    def __init__(self, config_dir: str = None, max_history: int = 50):
-        """初始化搜索历史管理器"""
+    def __init__(self, config_dir: str = None, max_history: int = 500):
+        """初始化搜索历史管理器（每天重复搜索的几百个剧名都保留选择记录）"""
         if config_dir is None:
             config_dir = os.path.expanduser("~/.torrent_maker")
 
@@ -5684,6 +10281,24 @@ class SearchHistory:
 
         self._save_history()
 
+    def record_selection(self, query: str, selected_results: List[Dict[str, Any]]) -> bool:
+        """记录用户为查询选中的文件夹（路径、目录 mtime、得分，见 SelectionHotCache）"""
+        if not query or not query.strip():
+            return False
+        query = query.strip()
+        for item in reversed(self.history):
+            if item['query'] == query:
+                item['selected_results'] = selected_results
+                self._save_history()
+                return True
+        return False
+
+    def get_selections(self) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """有选择记录的查询 [(查询, 选择列表)]，按时间从旧到新"""
+        records = sorted((item for item in self.history if item.get('selected_results')),
+                         key=lambda x: x.get('timestamp', ''))
+        return [(item['query'], item['selected_results']) for item in records]
+
     def get_recent_searches(self, limit: int = 10) -> List[Dict[str, Any]]:
         """获取最近的搜索记录"""
         sorted_history = sorted(
@@ -5791,21 +10406,47 @@ class TorrentMakerApp:
             
         self._init_components()
 
+    def _create_matcher(self, enable_cache: bool = True, cache_duration: int = 3600,
+                        max_workers: int = 4) -> Union['FileMatcher', 'MultiRootMatcher']:
+        """按配置的资源根目录创建匹配器：多个根目录时每个一个索引分片"""
+        roots = self.config.get_resource_roots()
+        if len(roots) > 1:
+            matcher = MultiRootMatcher(
+                roots,
+                enable_cache=enable_cache,
+                cache_duration=cache_duration,
+                max_workers=max_workers,
+                search_timeout=self.config.settings.get('root_search_timeout', 5)
+            )
+        else:
+            matcher = FileMatcher(
+                roots[0]['path'],
+                enable_cache=enable_cache,
+                cache_duration=cache_duration,
+                max_workers=max_workers
+            )
+        # 历史选择作为重复查询的快速路径
+        if self.search_history:
+            matcher.hot_results.load(self.search_history.get_selections())
+        return matcher
+
+    def _replace_matcher(self, enable_cache: bool = True, cache_duration: int = 3600,
+                         max_workers: int = 4) -> None:
+        """按当前配置重建匹配器，旧匹配器的线程池与打分进程随即关闭"""
+        matcher = self._create_matcher(enable_cache, cache_duration, max_workers)
+        if self.matcher is not None:
+            self.matcher.shutdown()
+        self.matcher = matcher
+
     def _init_components(self):
         """初始化组件"""
         try:
             # 初始化文件匹配器
-            resource_folder = self.config.get_resource_folder()
             enable_cache = self.config.settings.get('enable_cache', True)
             cache_duration = self.config.settings.get('cache_duration', 3600)
             max_workers = self.config.settings.get('max_concurrent_operations', 4)
 
-            self.matcher = FileMatcher(
-                resource_folder,
-                enable_cache=enable_cache,
-                cache_duration=cache_duration,
-                max_workers=max_workers
-            )
+            self._replace_matcher(enable_cache, cache_duration, max_workers)
 
             # 初始化种子创建器
             trackers = self.config.get_trackers()
@@ -5825,7 +10466,10 @@ class TorrentMakerApp:
                 self.queue_manager = TorrentQueueManager(
                     self.creator,
                     max_concurrent=max_workers,
-                    save_file=queue_file
+                    save_file=queue_file,
+                    policy=self.config.settings.get('queue_scheduling_policy', 'fifo'),
+                    aging_interval=self.config.settings.get('queue_priority_aging', 0),
+                    use_processes=self.config.settings.get('queue_process_isolation', True)
                 )
                 # 设置回调函数
                 self.queue_manager.set_callbacks(
@@ -6192,6 +10836,13 @@ class TorrentMakerApp:
             print("  0. 🚪 退出")
         print()
 
+    def _warn_skipped_roots(self) -> None:
+        """提示本次搜索没有返回结果的根目录，避免把部分结果当成完整结果"""
+        skipped_roots = self.matcher.last_skipped_roots
+        if skipped_roots:
+            print(f"⚠️ 以下根目录本次没有返回结果（超时或不可用），结果可能不完整: "
+                  f"{', '.join(skipped_roots)}")
+
     def search_and_create(self):
         """搜索并制作种子"""
         # 检查队列运行状态
@@ -6253,10 +10904,11 @@ class TorrentMakerApp:
             try:
                 results = self.matcher.match_folders(search_name)
                 search_time = time.time() - start_time
+                self._warn_skipped_roots()
                 
                 # 记录搜索历史
                 if self.search_history:
-                    self.search_history.add_search(search_name, len(results), search_time)
+                    self.search_history.add_search(search_name, len(results))
 
                 if not results:
                     print(f"❌ 未找到匹配的文件夹 (搜索耗时: {search_time:.3f}s)")
@@ -6280,34 +10932,24 @@ class TorrentMakerApp:
                             print("请输入 y(是) 或 n(否)")
                     continue
 
-                print(f"✅ 找到 {len(results)} 个匹配结果 (搜索耗时: {search_time:.3f}s)")
+                hot = results[0].get('hot', False)
+                if hot:
+                    print(f"⚡ 上次为该查询选中的文件夹 (耗时: {search_time:.3f}s)，完整搜索在后台进行")
+                else:
+                    print(f"✅ 找到 {len(results)} 个匹配结果 (搜索耗时: {search_time:.3f}s)")
                 print()
-
-                # 显示搜索结果
-                for i, result in enumerate(results, 1):
-                    status = "✅" if result['readable'] else "❌"
-                    print(f"  {i:2d}. {status} {result['name']}")
-                    print(f"      📊 匹配度: {result['score']}% | 📁 文件: {result['file_count']}个 | 💾 大小: {result['size']}")
-                    if result['episodes']:
-                        print(f"      🎬 剧集: {result['episodes']}")
-                    # 显示文件夹路径
-                    folder_path = result['path']
-                    # 如果路径太长，显示相对路径或缩短路径
-                    if len(folder_path) > 80:
-                        # 尝试显示相对于资源文件夹的路径
-                        resource_folder = self.config.get_resource_folder()
-                        if folder_path.startswith(resource_folder):
-                            relative_path = os.path.relpath(folder_path, resource_folder)
-                            print(f"      📂 路径: .../{relative_path}")
-                        else:
-                            # 如果路径太长，显示开头和结尾
-                            print(f"      📂 路径: {folder_path[:30]}...{folder_path[-30:]}")
-                    else:
-                        print(f"      📂 路径: {folder_path}")
-                    print()
+                self._print_match_results(results)
 
                 # 选择文件夹
-                choice = input("请选择要制作种子的文件夹编号 (支持多选，如: 1,3,5，回车跳过): ").strip()
+                if hot:
+                    choice = input("请选择要制作种子的文件夹编号 (支持多选，输入 a 查看完整搜索结果，回车跳过): ").strip()
+                    if choice.lower() == 'a':
+                        results = self.matcher.match_folders(search_name, use_hot=False)
+                        print(f"\n✅ 完整搜索找到 {len(results)} 个匹配结果\n")
+                        self._print_match_results(results)
+                        choice = input("请选择要制作种子的文件夹编号 (支持多选，如: 1,3,5，回车跳过): ").strip()
+                else:
+                    choice = input("请选择要制作种子的文件夹编号 (支持多选，如: 1,3,5，回车跳过): ").strip()
                 if not choice:
                     # 询问是否继续搜索
                     while True:
@@ -6323,6 +10965,7 @@ class TorrentMakerApp:
                 # 解析选择并执行批量制种
                 selected_results = self._parse_selection(choice, results)
                 if selected_results:
+                    self._record_selection(search_name, selected_results)
                     self._execute_batch_creation(selected_results)
                 else:
                     print("❌ 无效的选择格式")
@@ -6356,12 +10999,10 @@ class TorrentMakerApp:
                 clear_cache = input("是否清理缓存并重试？(y/n): ").strip().lower()
                 if clear_cache in ['y', 'yes', '是']:
                     try:
-                        if hasattr(self.matcher, 'cache') and self.matcher.cache:
-                            self.matcher.cache._cache.clear()
-                            print("✅ 缓存已清理")
-                        if hasattr(self.matcher, 'folder_info_cache') and self.matcher.folder_info_cache:
-                            self.matcher.folder_info_cache._cache.clear()
-                            print("✅ 文件夹信息缓存已清理")
+                        self.matcher.clear_caches()
+                        get_directory_store().clear('info')
+                        print("✅ 搜索缓存与文件夹信息缓存已清理")
+                        self.matcher.clear_search_index()
                         continue  # 重新尝试搜索
                     except Exception as cache_e:
                         print(f"⚠️ 清理缓存时出错: {cache_e}")
@@ -6548,8 +11189,10 @@ class TorrentMakerApp:
         start_time = time.time()
 
         try:
-            results = self.matcher.match_folders(search_name)
+            # 批量制种需要完整的候选列表，不走历史选择的快速路径
+            results = self.matcher.match_folders(search_name, use_hot=False)
             search_time = time.time() - start_time
+            self._warn_skipped_roots()
 
             if not results:
                 print(f"❌ 未找到匹配的文件夹 (搜索耗时: {search_time:.3f}s)")
@@ -6579,6 +11222,7 @@ class TorrentMakerApp:
             if not selected_results:
                 print("❌ 无效的选择")
                 return
+            self._record_selection(search_name, selected_results)
 
             # 执行批量制种
             self._execute_batch_creation(selected_results)
@@ -6649,6 +11293,36 @@ class TorrentMakerApp:
         else:
             return folder_path
 
+    def _print_match_results(self, results: list) -> None:
+        """显示匹配结果列表"""
+        for i, result in enumerate(results, 1):
+            status = "✅" if result['readable'] else "❌"
+            print(f"  {i:2d}. {status} {result['name']}")
+            print(f"      📊 匹配度: {result['score']}% | 📁 文件: {result['file_count']}个 | 💾 大小: {result['size']}")
+            if result['episodes']:
+                print(f"      🎬 剧集: {result['episodes']}")
+            # 显示文件夹路径
+            folder_path = result['path']
+            # 如果路径太长，显示相对路径或缩短路径
+            if len(folder_path) > 80:
+                # 尝试显示相对于资源文件夹的路径
+                resource_folder = self.config.get_resource_folder()
+                if folder_path.startswith(resource_folder):
+                    relative_path = os.path.relpath(folder_path, resource_folder)
+                    print(f"      📂 路径: .../{relative_path}")
+                else:
+                    # 如果路径太长，显示开头和结尾
+                    print(f"      📂 路径: {folder_path[:30]}...{folder_path[-30:]}")
+            else:
+                print(f"      📂 路径: {folder_path}")
+            print()
+
+    def _record_selection(self, search_name: str, selected_results: list) -> None:
+        """记录选择：更新匹配器的热缓存并写入搜索历史"""
+        selections = self.matcher.record_selection(search_name, selected_results)
+        if self.search_history and selections:
+            self.search_history.record_selection(search_name, selections)
+
     def _parse_selection(self, choice: str, results: list) -> list:
         """解析用户选择的文件夹"""
         selected_results = []
@@ -6727,7 +11401,10 @@ class TorrentMakerApp:
             queue_manager = TorrentQueueManager(
                 torrent_creator=self.creator,
                 max_concurrent=max_concurrent,
-                save_file=queue_file
+                save_file=queue_file,
+                policy=self.config.settings.get('queue_scheduling_policy', 'fifo'),
+                aging_interval=self.config.settings.get('queue_priority_aging', 0),
+                use_processes=self.config.settings.get('queue_process_isolation', True)
             )
             
             # 设置回调函数
@@ -7374,6 +12051,19 @@ class TorrentMakerApp:
 
         print(f"📁 资源文件夹: {resource_folder}")
         print(f"   {'✅ 存在' if os.path.exists(resource_folder) else '❌ 不存在'}")
+        for root in self.config.get_resource_roots()[1:]:
+            print(f"📁 资源根目录 [{root['name']}]: {root['path']}")
+            print(f"   {'✅ 存在' if os.path.exists(root['path']) else '❌ 不存在'}")
+        if isinstance(self.matcher, MultiRootMatcher):
+            status_icons = {'ok': '✅', 'slow': '🐢', 'unavailable': '❌', 'error': '⚠️', 'unknown': '❔'}
+            print("🗄️ 根目录状态:")
+            for status in self.matcher.get_root_status():
+                line = f"   {status_icons.get(status['status'], '❔')} {status['name']}: {status['status']}"
+                if status['searches']:
+                    line += f", 最近搜索 {status['last_search_ms']:.0f}ms"
+                if status['last_error']:
+                    line += f" ({status['last_error']})"
+                print(line)
 
         print(f"📂 输出文件夹: {output_folder}")
         print(f"   {'✅ 存在' if os.path.exists(output_folder) else '⚠️ 将自动创建'}")
@@ -7449,14 +12139,9 @@ class TorrentMakerApp:
                     cache_duration = self.config.settings.get('cache_duration', 3600)
                     max_workers = self.config.settings.get('max_concurrent_operations', 4)
 
-                # 使用新设置的路径直接创建 FileMatcher
+                # 使用新设置的路径重新创建匹配器
                 new_resource_folder = self.config.settings['resource_folder']
-                self.matcher = FileMatcher(
-                    new_resource_folder,
-                    enable_cache=enable_cache,
-                    cache_duration=cache_duration,
-                    max_workers=max_workers
-                )
+                self._replace_matcher(enable_cache, cache_duration, max_workers)
                 print(f"🔄 文件匹配器已重新初始化，使用路径: {new_resource_folder}")
             else:
                 print("❌ 设置失败，请检查路径是否存在")
@@ -7546,10 +12231,7 @@ class TorrentMakerApp:
             elif hasattr(self.config, 'settings'):
                 enable_cache = self.config.settings.get('enable_cache', True)
 
-            self.matcher = FileMatcher(
-                self.config.get_resource_folder(),
-                enable_cache=enable_cache
-            )
+            self._replace_matcher(enable_cache)
 
             self.creator = TorrentCreator(
                 self.config.get_trackers(),
@@ -7650,33 +12332,22 @@ class TorrentMakerApp:
         try:
             cleared_items = 0
 
-            # 清理搜索缓存
-            if hasattr(self.matcher, 'cache') and self.matcher.cache:
-                cache_stats = self.matcher.cache.get_stats()
-                if cache_stats:
-                    cleared_items += cache_stats.get('total_items', 0)
-                self.matcher.cache._cache.clear()
-                print("✅ 搜索缓存已清理")
-
-            # 清理文件夹信息缓存
-            if hasattr(self.matcher, 'folder_info_cache') and self.matcher.folder_info_cache:
-                cache_stats = self.matcher.folder_info_cache.get_stats()
-                if cache_stats:
-                    cleared_items += cache_stats.get('total_items', 0)
-                self.matcher.folder_info_cache._cache.clear()
-                print("✅ 文件夹信息缓存已清理")
-
-            # 清理大小缓存
-            if hasattr(self.matcher, 'size_cache') and self.matcher.size_cache:
-                if hasattr(self.matcher.size_cache, '_cache'):
-                    self.matcher.size_cache._cache.clear()
-                    print("✅ 大小缓存已清理")
+            # 清理搜索缓存与文件夹信息缓存（所有资源根目录）
+            cleared_items += self.matcher.clear_caches()
+            print("✅ 搜索缓存与文件夹信息缓存已清理")
+
+            # 清理磁盘上的目录统计缓存（CLI 与 Web 共享）
+            cleared_items += get_directory_store().clear()
+            print("✅ 磁盘目录缓存已清理")
+
+            # 清理大小缓存（目录大小缓存在种子创建器上，匹配器没有）
+            if self.creator is not None:
+                self.creator.size_cache.clear_cache()
+                print("✅ 大小缓存已清理")
 
             # 清理智能索引缓存
-            if hasattr(self.matcher, 'smart_index') and self.matcher.smart_index:
-                if hasattr(self.matcher.smart_index, '_word_index'):
-                    self.matcher.smart_index._word_index.clear()
-                    print("✅ 智能索引缓存已清理")
+            cleared_items += self.matcher.clear_search_index()
+            print("✅ 智能索引缓存已清理（含磁盘索引）")
 
             print(f"✅ 缓存清理完成，共清理 {cleared_items} 个缓存项")
             print("💡 建议: 清理缓存后首次搜索可能会稍慢，但可以解决编码问题")
@@ -7705,7 +12376,7 @@ class TorrentMakerApp:
                     print("❌ 重置失败")
             else:
                 # 手动重置配置
-                self.config.settings = self.config.DEFAULT_SETTINGS.copy()
+                self.config.settings = copy.deepcopy(self.config.DEFAULT_SETTINGS)
                 self.config.trackers = self.config.DEFAULT_TRACKERS.copy()
 
                 # 展开用户目录路径
@@ -7908,19 +12579,19 @@ class TorrentMakerApp:
         print("\n📊 性能统计信息")
         print("=" * 60)
 
-        # 获取文件匹配器的性能统计
-        if hasattr(self.matcher, 'performance_monitor'):
-            matcher_stats = self.matcher.performance_monitor.get_all_stats()
-            if matcher_stats:
-                print("🔍 搜索性能:")
-                for name, stats in matcher_stats.items():
-                    if stats:
-                        print(f"  {name}:")
-                        print(f"    执行次数: {stats['count']}")
-                        print(f"    平均耗时: {stats['average']:.3f}s")
-                        print(f"    最大耗时: {stats['max']:.3f}s")
-                        print(f"    总耗时: {stats['total']:.3f}s")
-                print()
+        # 获取文件匹配器的性能统计（多个资源根目录时为合计）
+        matcher_stats = self.matcher.get_timing_stats()
+        if matcher_stats:
+            print("🔍 搜索性能:")
+            for name, stats in matcher_stats.items():
+                if stats:
+                    print(f"  {name}:")
+                    print(f"    执行次数: {stats['count']}")
+                    print(f"    平均耗时: {stats['average']:.3f}s")
+                    print(f"    最大耗时: {stats['max']:.3f}s")
+                    print(f"    总耗时: {stats['total']:.3f}s")
+            print()
+        performance_stats = self.matcher.get_performance_stats()
 
         # 获取种子创建器的性能统计
         if hasattr(self.creator, 'performance_monitor'):
@@ -7936,15 +12607,57 @@ class TorrentMakerApp:
                         print(f"    总耗时: {stats['total']:.3f}s")
                 print()
 
+        # 获取挂载点 I/O 延迟统计
+        mount_stats = performance_stats['mount_latency']
+        if mount_stats:
+            print("🌐 挂载点 I/O 延迟:")
+            for mount_point, stats in mount_stats.items():
+                kind = "网络" if stats['is_network'] else "本地"
+                print(f"  {mount_point} ({stats['fs_type']}, {kind}):")
+                print(f"    调用次数: {stats['calls']}")
+                print(f"    p50/p95: {stats['p50_ms']:.2f}ms / {stats['p95_ms']:.2f}ms")
+                print(f"    当前并发: {stats['concurrency']['limit']}")
+            print()
+
+        # 获取扫描排除规则的剪枝统计
+        prune_stats = get_scan_ignore_rules().get_stats()
+        if prune_stats['pruned_entries']:
+            print("✂️ 扫描剪枝:")
+            print(f"  跳过目录: {prune_stats['pruned_dirs']}")
+            print(f"  跳过文件: {prune_stats['pruned_files']}")
+            print()
+
+        # 拼写纠错统计
+        spell_stats = performance_stats['typo_correction']
+        if spell_stats.get('lookups'):
+            print("✏️ 拼写纠错:")
+            print(f"  查询词数: {spell_stats['lookups']}")
+            print(f"  纠正命中: {spell_stats['corrections']}")
+            print(f"  词表大小: {spell_stats['vocabulary_size']}")
+            print()
+
+        prefix_stats = performance_stats['prefix_search']
+        if prefix_stats.get('queries'):
+            print("⌨️ 输入即搜索:")
+            print(f"  查询次数: {prefix_stats['queries']}")
+            print(f"  平均耗时: {prefix_stats['avg_ms']}ms")
+            print(f"  复用候选集: {prefix_stats['session_reuses']} 次")
+            print()
+
         # 获取缓存统计
-        if hasattr(self.matcher, 'cache') and self.matcher.cache:
-            cache_stats = self.matcher.cache.get_stats()
-            if cache_stats:
-                print("💾 缓存统计:")
-                print(f"  总缓存项: {cache_stats['total_items']}")
-                print(f"  有效缓存项: {cache_stats['valid_items']}")
-                print(f"  过期缓存项: {cache_stats['expired_items']}")
-                print()
+        cache_stats = self.matcher.get_cache_stats()
+        if cache_stats:
+            print("💾 缓存统计:")
+            print(f"  总缓存项: {cache_stats['total_items']}")
+            print(f"  有效缓存项: {cache_stats['valid_items']}")
+            print(f"  过期缓存项: {cache_stats['expired_items']}")
+            print(f"  估算占用: {self.matcher.format_size(cache_stats['total_bytes'])}")
+            for namespace, ns_stats in cache_stats['namespaces'].items():
+                print(f"  [{namespace}] {ns_stats['items']} 项, "
+                      f"{self.matcher.format_size(ns_stats['bytes'])}/"
+                      f"{self.matcher.format_size(ns_stats['budget_bytes'])}, "
+                      f"命中率 {ns_stats['hit_rate']:.1%}, 淘汰 {ns_stats['evictions']}")
+            print()
 
         # 显示优化建议
         print("💡 性能优化建议:")
@@ -7962,10 +12675,9 @@ class TorrentMakerApp:
         suggestions = []
 
         # 检查搜索性能
-        if hasattr(self.matcher, 'performance_monitor'):
-            search_stats = self.matcher.performance_monitor.get_stats('fuzzy_search')
-            if search_stats and search_stats.get('average', 0) > 2.0:
-                suggestions.append("搜索耗时较长，建议增加缓存时间或减少搜索深度")
+        search_stats = self.matcher.get_timing_stats().get('fuzzy_search')
+        if search_stats and search_stats.get('average', 0) > 2.0:
+            suggestions.append("搜索耗时较长，建议增加缓存时间或减少搜索深度")
 
         # 检查种子创建性能
         if hasattr(self.creator, 'performance_monitor'):
@@ -7974,10 +12686,9 @@ class TorrentMakerApp:
                 suggestions.append("种子创建耗时较长，建议检查磁盘性能或减少文件数量")
 
         # 检查缓存使用情况
-        if hasattr(self.matcher, 'cache') and self.matcher.cache:
-            cache_stats = self.matcher.cache.get_stats()
-            if cache_stats and cache_stats.get('valid_items', 0) == 0:
-                suggestions.append("缓存未被有效利用，建议检查缓存配置")
+        cache_stats = self.matcher.get_cache_stats()
+        if cache_stats and cache_stats.get('valid_items', 0) == 0:
+            suggestions.append("缓存未被有效利用，建议检查缓存配置")
 
         return suggestions
 
@@ -8002,10 +12713,88 @@ class TorrentMakerApp:
         print("=" * 50)
 
 
+def read_batch_queries(input_path: str) -> List[str]:
+    """读取批量搜索文件：每行一个标题，忽略空行与 # 开头的注释"""
+    with open(input_path, 'r', encoding='utf-8', errors='replace') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def run_batch_search(app: 'TorrentMakerApp', input_path: str, output_path: Optional[str] = None,
+                     enqueue: bool = False, max_results: int = 5) -> int:
+    """批量搜索：结果按 JSON Lines 输出（每个标题一行），可把最佳匹配加入队列
+
+    输出到标准输出时，扫描进度等提示改写到标准错误，保证输出可直接解析。
+    有根目录没有返回结果时，每行的 skipped_roots 列出这些根目录，并在
+    标准错误给出警告、以退出码 2 结束，部分结果不会被当成"无匹配"。
+
+    Returns:
+        进程退出码
+    """
+    import contextlib
+
+    try:
+        queries = read_batch_queries(input_path)
+    except OSError as e:
+        print(f"❌ 无法读取批量搜索文件: {e}", file=sys.stderr)
+        return 1
+    if app.matcher is None:
+        print("❌ 文件匹配器未初始化", file=sys.stderr)
+        return 1
+    if enqueue and app.queue_manager is None:
+        print("❌ 队列管理器不可用，无法加入队列", file=sys.stderr)
+        return 1
+
+    start_time = time.time()
+    with contextlib.redirect_stdout(sys.stderr):
+        results = app.matcher.batch_match(queries, max_results)
+
+        queued_paths: Dict[str, str] = {}
+        if enqueue:
+            for entry in results:
+                if not entry['matches']:
+                    entry['queued'] = None
+                    continue
+                best = entry['matches'][0]
+                if best['path'] not in queued_paths:
+                    queued_paths[best['path']] = app.queue_manager.add_task(best['name'], best['path'])
+                entry['queued'] = queued_paths[best['path']]
+
+    output = open(output_path, 'w', encoding='utf-8') if output_path else sys.stdout
+    try:
+        for entry in results:
+            output.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    finally:
+        if output_path:
+            output.close()
+
+    matched = sum(1 for entry in results if entry['matches'])
+    print(f"✅ 批量搜索完成: {len(queries)} 个标题，{matched} 个有匹配，"
+          f"耗时 {time.time() - start_time:.2f}s", file=sys.stderr)
+    if enqueue:
+        print(f"📋 已加入队列: {len(queued_paths)} 个任务", file=sys.stderr)
+    skipped_roots = sorted({root for entry in results for root in entry['skipped_roots']})
+    if skipped_roots:
+        print(f"⚠️ 以下根目录没有返回结果，搜索结果不完整: {', '.join(skipped_roots)}", file=sys.stderr)
+        return 2
+    return 0
+
+
 def main():
     """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Torrent Maker - 种子制作工具")
+    parser.add_argument('--batch', metavar='FILE',
+                        help='批量搜索：从文件读取标题（每行一个），结果以 JSON Lines 输出')
+    parser.add_argument('--output', metavar='FILE', help='批量搜索结果写入文件（默认标准输出）')
+    parser.add_argument('--enqueue', action='store_true', help='把每个标题的最佳匹配加入制种队列')
+    parser.add_argument('--top', type=int, default=5, metavar='N', help='每个标题返回的结果数（默认 5）')
+    args = parser.parse_args()
+
     try:
         app = TorrentMakerApp()
+        if args.batch:
+            sys.exit(run_batch_search(app, args.batch, args.output, args.enqueue, max(1, args.top)))
         app.run()
     except Exception as e:
         print(f"❌ 程序启动失败: {e}")
@@ -10,6 +10,7 @@ class TorrentMakerApp {
         this.servers = {};
         this.tasks = {};
         this.systemInfo = {};
+        this.prefixSearchSeq = 0;
         
         this.init();
     }
@@ -44,6 +45,10 @@ class TorrentMakerApp {
         this.socket.on('system_update', (data) => {
             this.handleSystemUpdate(data);
         });
+        
+        this.socket.on('prefix_results', (data) => {
+            this.handlePrefixResults(data);
+        });
     }
     
     initEventListeners() {
@@ -97,6 +102,35 @@ class TorrentMakerApp {
         
         // 文件浏览器事件
         this.initFileBrowserEvents();
+        
+        // 源路径输入即搜索
+        document.getElementById('source-path').addEventListener('input', (e) => {
+            this.requestPrefixSearch(e.target.value);
+        });
+    }
+    
+    requestPrefixSearch(query) {
+        // 输入路径时不搜索，只对名称搜索
+        if (!query.trim() || query.includes('/') || !this.socket || !this.socket.connected) {
+            return;
+        }
+        this.prefixSearchSeq += 1;
+        this.socket.emit('prefix_search', { query: query, limit: 10, seq: this.prefixSearchSeq });
+    }
+    
+    handlePrefixResults(data) {
+        // 丢弃过期的响应，只显示最后一次击键的结果
+        if (!data.success || data.seq !== this.prefixSearchSeq) {
+            return;
+        }
+        const datalist = document.getElementById('source-suggestions');
+        datalist.innerHTML = '';
+        data.results.forEach(item => {
+            const option = document.createElement('option');
+            option.value = item.path;
+            option.label = item.name;
+            datalist.appendChild(option);
+        });
     }
     
     initUI() {
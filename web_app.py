@@ -28,11 +28,11 @@ from watchdog.events import FileSystemEventHandler
 
 # 导入核心torrent_maker模块
 try:
-    from torrent_maker import TorrentMakerApp, TaskStatus, TaskPriority
+    from torrent_maker import TorrentMakerApp, TaskStatus, TaskPriority, PrefixSearchSession
 except ImportError:
     # 如果无法导入，尝试从当前目录导入
     sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    from torrent_maker import TorrentMakerApp, TaskStatus, TaskPriority
+    from torrent_maker import TorrentMakerApp, TaskStatus, TaskPriority, PrefixSearchSession
 
 # 配置日志
 logging.basicConfig(
@@ -343,6 +343,8 @@ class WebTorrentMaker:
         self.core = TorrentMakerApp()
         self.ssh_manager = SSHServerManager()
         self.active_tasks: Dict[str, Dict] = {}
+        # 每个 WebSocket 连接一个输入即搜索会话
+        self.prefix_sessions: Dict[str, PrefixSearchSession] = {}
     
     def create_torrent_task(self, task_data: Dict) -> str:
         """创建种子制作任务"""
@@ -366,6 +368,21 @@ class WebTorrentMaker:
     def get_task_status(self, task_id: str) -> Optional[Dict]:
         """获取任务状态"""
         return self.active_tasks.get(task_id)
+
+    def prefix_search(self, query: str, limit: int = 10, sid: Optional[str] = None) -> Dict:
+        """本地资源目录的输入即搜索"""
+        matcher = self.core.matcher
+        if matcher is None:
+            return {'results': [], 'more': False}
+        session = None
+        if sid is not None:
+            session = self.prefix_sessions.setdefault(sid, PrefixSearchSession())
+        # 多取一个用于判断是否还有更多结果
+        paths = matcher.prefix_search(query, limit + 1, session)
+        return {
+            'results': [{'name': os.path.basename(path), 'path': path} for path in paths[:limit]],
+            'more': len(paths) > limit
+        }
     
     def get_system_info(self) -> Dict:
         """获取系统信息"""
@@ -584,6 +601,18 @@ def get_directory_stats():
         logger.error(f"获取目录统计失败: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/search/prefix', methods=['GET'])
+def prefix_search():
+    """输入即搜索（逐字输入时建议使用 WebSocket 的 prefix_search 事件）"""
+    try:
+        query = request.args.get('q', '')
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        result = web_torrent_maker.prefix_search(query, limit)
+        return jsonify({'success': True, 'query': query, **result})
+    except Exception as e:
+        logger.error(f"前缀搜索失败: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # WebSocket事件
 @socketio.on('connect')
 def handle_connect():
@@ -595,6 +624,20 @@ def handle_connect():
 def handle_disconnect():
     """客户端断开连接"""
     logger.info(f"客户端断开: {request.sid}")
+    web_torrent_maker.prefix_sessions.pop(request.sid, None)
+
+@socketio.on('prefix_search')
+def handle_prefix_search(data):
+    """逐字输入的前缀搜索，同一连接复用上一次击键的候选集"""
+    query = data.get('query', '')
+    seq = data.get('seq')
+    try:
+        limit = min(max(int(data.get('limit', 10)), 1), 50)
+        result = web_torrent_maker.prefix_search(query, limit, request.sid)
+        emit('prefix_results', {'success': True, 'query': query, 'seq': seq, **result})
+    except Exception as e:
+        logger.error(f"前缀搜索失败: {e}")
+        emit('prefix_results', {'success': False, 'query': query, 'seq': seq, 'error': str(e)})
 
 @socketio.on('join_task')
 def handle_join_task(data):